@@ -0,0 +1,124 @@
+"""
+Fact extraction benchmark: model instances (select_related, as facts were
+extracted before) against values_list() tuples of just RENTAL_COLUMNS and
+PAYMENT_COLUMNS, on a generated Sakila source.
+
+For each table and mode it reports the CPU time to stream the whole table
+through stream_chunks(), the peak traced memory while doing so, and the
+memory held by one materialized chunk, all scaled to a million rows. Both
+modes are checked to yield the same values first.
+
+    python -m benchmarks.extract --scale 10
+"""
+import argparse
+import gc
+import os
+import time
+import tracemalloc
+
+import django
+
+from benchmarks.generate import generate
+from benchmarks.run import BENCH_DIR
+
+
+MILLION = 1_000_000
+
+
+def rental_values(rental):
+    return (
+        rental.rental_id, rental.rental_date, rental.return_date, rental.inventory_id,
+        rental.customer_id, rental.staff_id, rental.last_update,
+    )
+
+
+def payment_values(payment):
+    return (
+        payment.payment_id, payment.payment_date, payment.customer_id,
+        payment.rental.inventory_id if payment.rental else None,
+        payment.staff_id, payment.amount, payment.last_update,
+    )
+
+
+def cpu_pass(queryset, table):
+    """CPU seconds to stream every row of queryset, and the row count"""
+    from sakilaorm.extract import stream_chunks
+
+    gc.collect()
+    started = time.process_time()
+    rows = sum(len(chunk) for chunk in stream_chunks(queryset, table))
+    return time.process_time() - started, rows
+
+
+def memory_pass(queryset, table):
+    """(peak traced bytes while streaming, traced bytes held by one chunk, chunk length)"""
+    from sakilaorm.extract import stream_chunks
+
+    gc.collect()
+    tracemalloc.start()
+    chunk_bytes = chunk_rows = 0
+    for chunk in stream_chunks(queryset, table):
+        if not chunk_rows:
+            # Everything allocated so far is this first chunk
+            chunk_bytes, chunk_rows = tracemalloc.get_traced_memory()[0], len(chunk)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak, chunk_bytes, chunk_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=int, default=10, choices=[1, 10, 100, 1000])
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--regenerate', action='store_true', help='rebuild the source even if it exists')
+    args = parser.parse_args()
+
+    BENCH_DIR.mkdir(exist_ok=True)
+    source = BENCH_DIR / f'sakila_{args.scale}x_{args.seed}.sqlite3'
+    if args.regenerate or not source.exists():
+        print(f"Generating {args.scale}x source at {source}")
+        generate(str(source), args.scale, args.seed)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+    os.environ.setdefault('BENCH_SOURCE_DB', str(source))
+    django.setup()
+    from sakilaorm.models import Payment, Rental
+    from sakilaorm.transform import PAYMENT_COLUMNS, RENTAL_COLUMNS
+
+    cases = {
+        'rental': (
+            Rental.objects.using('sakila').select_related('inventory__film', 'inventory__store', 'customer'),
+            Rental.objects.using('sakila').values_list(*RENTAL_COLUMNS),
+            rental_values,
+        ),
+        'payment': (
+            Payment.objects.using('sakila').select_related('customer', 'rental__inventory__store'),
+            Payment.objects.using('sakila').values_list(*PAYMENT_COLUMNS),
+            payment_values,
+        ),
+    }
+
+    print(f"Source {source}, figures per million rows")
+    for table, (models, tuples, values) in cases.items():
+        if [values(row) for row in models.order_by('pk')[:1000]] != list(tuples.order_by('pk')[:1000]):
+            raise SystemExit(f"{table}: tuple extraction differs from the model path")
+
+        results = {}
+        for mode, queryset in (('models', models), ('tuples', tuples)):
+            cpu, rows = cpu_pass(queryset, table)
+            peak, chunk_bytes, chunk_rows = memory_pass(queryset, table)
+            results[mode] = (cpu, peak, chunk_bytes / chunk_rows if chunk_rows else 0)
+            print(
+                f"  {table} {mode}: {rows} rows, {cpu * MILLION / rows:.2f}s CPU, "
+                f"{peak / 2 ** 20:.1f} MB peak while streaming, "
+                f"{results[mode][2] * MILLION / 2 ** 20:.0f} MB held as rows"
+            )
+        (model_cpu, model_peak, model_row), (tuple_cpu, tuple_peak, tuple_row) = results['models'], results['tuples']
+        print(
+            f"  {table}: tuples use {model_cpu / tuple_cpu:.1f}x less CPU, "
+            f"{model_peak / tuple_peak:.1f}x less peak memory, {model_row / tuple_row:.1f}x less per row"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,357 @@
+"""
+Deterministic synthetic Sakila source.
+
+Writes a SQLite file with the tables and columns of the unmanaged Sakila
+models in sakilaorm/models.py, scaled from the stock Sakila row counts.
+The same scale and seed always produce the same rows.
+
+    python -m benchmarks.generate --scale 10 bench_data/sakila_10x.sqlite3
+"""
+import argparse
+import os
+import random
+import sqlite3
+import time
+from array import array
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+
+
+# Stock Sakila row counts, multiplied by the scale factor
+BASE_COUNTS = {
+    'film': 1000,
+    'actor': 200,
+    'store': 2,
+    'customer': 599,
+    'inventory': 4581,
+    'rental': 16044,
+}
+
+COUNTRY_COUNT = 109
+CITY_COUNT = 600
+LANGUAGES = ['English', 'Italian', 'Japanese', 'Mandarin', 'French', 'German']
+CATEGORIES = [
+    'Action', 'Animation', 'Children', 'Classics', 'Comedy', 'Documentary', 'Drama', 'Family',
+    'Foreign', 'Games', 'Horror', 'Music', 'New', 'Sci-Fi', 'Sports', 'Travel',
+]
+RATINGS = ['G', 'PG', 'PG-13', 'R', 'NC-17']
+AMOUNTS = ['0.99', '1.99', '2.99', '3.99', '4.99', '5.99', '6.99', '7.99', '8.99', '9.99']
+ACTORS_PER_FILM = 5
+
+FIRST_RENTAL = datetime(2005, 5, 24, 22, 53, 30)
+LAST_UPDATE = datetime(2006, 2, 15, 5, 3, 42)
+BATCH_SIZE = 10000
+
+SCHEMA = """
+CREATE TABLE country (
+    country_id INTEGER PRIMARY KEY,
+    country VARCHAR(50) NOT NULL,
+    last_update DATETIME NOT NULL
+);
+CREATE TABLE city (
+    city_id INTEGER PRIMARY KEY,
+    city VARCHAR(50) NOT NULL,
+    country_id INTEGER NOT NULL REFERENCES country (country_id),
+    last_update DATETIME NOT NULL
+);
+CREATE TABLE address (
+    address_id INTEGER PRIMARY KEY,
+    address VARCHAR(50) NOT NULL,
+    address2 VARCHAR(50),
+    district VARCHAR(20) NOT NULL,
+    city_id INTEGER NOT NULL REFERENCES city (city_id),
+    postal_code VARCHAR(10),
+    phone VARCHAR(20) NOT NULL,
+    last_update DATETIME NOT NULL
+);
+CREATE TABLE language (
+    language_id INTEGER PRIMARY KEY,
+    name VARCHAR(20) NOT NULL,
+    last_update DATETIME NOT NULL
+);
+CREATE TABLE film (
+    film_id INTEGER PRIMARY KEY,
+    title VARCHAR(255) NOT NULL,
+    description TEXT,
+    release_year INTEGER,
+    language_id INTEGER NOT NULL REFERENCES language (language_id),
+    original_language_id INTEGER REFERENCES language (language_id),
+    rental_duration INTEGER NOT NULL,
+    rental_rate DECIMAL(4, 2) NOT NULL,
+    length INTEGER,
+    replacement_cost DECIMAL(5, 2) NOT NULL,
+    rating VARCHAR(10),
+    special_features VARCHAR(255),
+    last_update DATETIME NOT NULL
+);
+CREATE TABLE actor (
+    actor_id INTEGER PRIMARY KEY,
+    first_name VARCHAR(45) NOT NULL,
+    last_name VARCHAR(45) NOT NULL,
+    last_update DATETIME NOT NULL
+);
+CREATE TABLE category (
+    category_id INTEGER PRIMARY KEY,
+    name VARCHAR(25) NOT NULL,
+    last_update DATETIME NOT NULL
+);
+CREATE TABLE film_actor (
+    actor_id INTEGER NOT NULL REFERENCES actor (actor_id),
+    film_id INTEGER NOT NULL REFERENCES film (film_id),
+    last_update DATETIME NOT NULL,
+    PRIMARY KEY (actor_id, film_id)
+);
+CREATE TABLE film_category (
+    film_id INTEGER NOT NULL REFERENCES film (film_id),
+    category_id INTEGER NOT NULL REFERENCES category (category_id),
+    last_update DATETIME NOT NULL,
+    PRIMARY KEY (film_id, category_id)
+);
+CREATE TABLE store (
+    store_id INTEGER PRIMARY KEY,
+    manager_staff_id INTEGER NOT NULL,
+    address_id INTEGER NOT NULL REFERENCES address (address_id),
+    last_update DATETIME NOT NULL
+);
+CREATE TABLE staff (
+    staff_id INTEGER PRIMARY KEY,
+    first_name VARCHAR(45) NOT NULL,
+    last_name VARCHAR(45) NOT NULL,
+    address_id INTEGER NOT NULL REFERENCES address (address_id),
+    picture BLOB,
+    email VARCHAR(50),
+    store_id INTEGER NOT NULL REFERENCES store (store_id),
+    active INTEGER NOT NULL,
+    username VARCHAR(16) NOT NULL,
+    password VARCHAR(40),
+    last_update DATETIME NOT NULL
+);
+CREATE TABLE customer (
+    customer_id INTEGER PRIMARY KEY,
+    store_id INTEGER NOT NULL REFERENCES store (store_id),
+    first_name VARCHAR(45) NOT NULL,
+    last_name VARCHAR(45) NOT NULL,
+    email VARCHAR(50),
+    address_id INTEGER NOT NULL REFERENCES address (address_id),
+    active INTEGER NOT NULL,
+    create_date DATETIME NOT NULL,
+    last_update DATETIME NOT NULL
+);
+CREATE TABLE inventory (
+    inventory_id INTEGER PRIMARY KEY,
+    film_id INTEGER NOT NULL REFERENCES film (film_id),
+    store_id INTEGER NOT NULL REFERENCES store (store_id),
+    last_update DATETIME NOT NULL
+);
+CREATE TABLE rental (
+    rental_id INTEGER PRIMARY KEY,
+    rental_date DATETIME NOT NULL,
+    inventory_id INTEGER NOT NULL REFERENCES inventory (inventory_id),
+    customer_id INTEGER NOT NULL REFERENCES customer (customer_id),
+    return_date DATETIME,
+    staff_id INTEGER NOT NULL REFERENCES staff (staff_id),
+    last_update DATETIME NOT NULL
+);
+CREATE TABLE payment (
+    payment_id INTEGER PRIMARY KEY,
+    customer_id INTEGER NOT NULL REFERENCES customer (customer_id),
+    staff_id INTEGER NOT NULL REFERENCES staff (staff_id),
+    rental_id INTEGER REFERENCES rental (rental_id),
+    amount DECIMAL(5, 2) NOT NULL,
+    payment_date DATETIME NOT NULL,
+    last_update DATETIME NOT NULL
+);
+CREATE INDEX idx_rental_rental_date ON rental (rental_date);
+CREATE INDEX idx_payment_rental_id ON payment (rental_id);
+"""
+
+# Stand-ins for the last_update indexes incremental sync pages through
+SYNCED_TABLES = ['film', 'actor', 'category', 'store', 'customer', 'rental', 'payment']
+
+
+def fmt(dt):
+    return dt.strftime('%Y-%m-%d %H:%M:%S') if dt else None
+
+
+def scaled_counts(scale):
+    return {table: count * scale for table, count in BASE_COUNTS.items()}
+
+
+def insert(db, table, rows):
+    """Insert rows in batches and return how many were written"""
+    rows = iter(rows)
+    written = 0
+    while True:
+        batch = list(islice(rows, BATCH_SIZE))
+        if not batch:
+            return written
+        placeholders = ', '.join('?' * len(batch[0]))
+        db.executemany(f"INSERT INTO {table} VALUES ({placeholders})", batch)
+        written += len(batch)
+
+
+def generate(path, scale=1, seed=42):
+    """Write a synthetic Sakila source at path and return row counts per table"""
+    if os.path.exists(path):
+        os.remove(path)
+    rng = random.Random(f"{seed}:{scale}")
+    counts = scaled_counts(scale)
+    stamp = fmt(LAST_UPDATE)
+    # Longer rental history at larger scales, capped at a few years
+    span_seconds = int(timedelta(days=265).total_seconds() * min(scale, 8))
+
+    db = sqlite3.connect(path)
+    db.executescript(SCHEMA)
+    for table in SYNCED_TABLES:
+        db.execute(f"CREATE INDEX idx_{table}_last_update ON {table} (last_update)")
+
+    written = {}
+    written['country'] = insert(db, 'country', (
+        (i, f"Country {i}", stamp) for i in range(1, COUNTRY_COUNT + 1)
+    ))
+    written['city'] = insert(db, 'city', (
+        (i, f"City {i}", rng.randint(1, COUNTRY_COUNT), stamp) for i in range(1, CITY_COUNT + 1)
+    ))
+    written['language'] = insert(db, 'language', (
+        (i, name, stamp) for i, name in enumerate(LANGUAGES, 1)
+    ))
+    written['category'] = insert(db, 'category', (
+        (i, name, stamp) for i, name in enumerate(CATEGORIES, 1)
+    ))
+
+    # Stores take the first addresses, customers the rest
+    store_count = counts['store']
+    customer_count = counts['customer']
+    written['address'] = insert(db, 'address', (
+        (i, f"{i} Synthetic Way", None, 'District', rng.randint(1, CITY_COUNT),
+         f"{rng.randint(10000, 99999)}", f"{rng.randint(10 ** 9, 10 ** 10 - 1)}", stamp)
+        for i in range(1, store_count + customer_count + 1)
+    ))
+    written['store'] = insert(db, 'store', (
+        (i, i, i, stamp) for i in range(1, store_count + 1)
+    ))
+    written['staff'] = insert(db, 'staff', (
+        (i, f"Staff{i}", f"Member{i}", i, None, f"staff{i}@example.com", i, 1, f"staff{i}", None, stamp)
+        for i in range(1, store_count + 1)
+    ))
+    written['customer'] = insert(db, 'customer', (
+        (i, rng.randint(1, store_count), f"First{i}", f"Last{i}", f"customer{i}@example.com",
+         store_count + i, 1 if rng.random() < 0.97 else 0, fmt(FIRST_RENTAL - timedelta(days=90)), stamp)
+        for i in range(1, customer_count + 1)
+    ))
+
+    film_count = counts['film']
+    written['film'] = insert(db, 'film', (
+        (i, f"FILM {i}", f"Synthetic film {i}", 2006, 1, None, rng.randint(3, 7),
+         rng.choice(['0.99', '2.99', '4.99']), rng.randint(46, 185), rng.choice(['9.99', '19.99', '29.99']),
+         rng.choice(RATINGS), 'Trailers', stamp)
+        for i in range(1, film_count + 1)
+    ))
+    actor_count = counts['actor']
+    written['actor'] = insert(db, 'actor', (
+        (i, f"ACTOR{i}", f"SURNAME{i % 121}", stamp) for i in range(1, actor_count + 1)
+    ))
+    written['film_actor'] = insert(db, 'film_actor', (
+        (actor_id, film_id, stamp)
+        for film_id in range(1, film_count + 1)
+        for actor_id in sorted(rng.sample(range(1, actor_count + 1), ACTORS_PER_FILM))
+    ))
+    written['film_category'] = insert(db, 'film_category', (
+        (film_id, rng.randint(1, len(CATEGORIES)), stamp) for film_id in range(1, film_count + 1)
+    ))
+
+    inventory_count = counts['inventory']
+    # inventory_id -> store_id, index 0 unused
+    inventory_store = array('i', [0])
+
+    def inventory_rows():
+        for i in range(1, inventory_count + 1):
+            store_id = rng.randint(1, store_count)
+            inventory_store.append(store_id)
+            yield (i, rng.randint(1, film_count), store_id, stamp)
+
+    written['inventory'] = insert(db, 'inventory', inventory_rows())
+
+    rental_count = counts['rental']
+
+    def rental_rows():
+        for i in range(1, rental_count + 1):
+            rented = FIRST_RENTAL + timedelta(seconds=span_seconds * (i - 1) // rental_count)
+            returned = None
+            if rng.random() < 0.99:
+                returned = rented + timedelta(days=rng.randint(0, 9), seconds=rng.randint(0, 86399))
+            inventory_id = rng.randint(1, inventory_count)
+            yield (i, fmt(rented), inventory_id, rng.randint(1, customer_count), fmt(returned),
+                   inventory_store[inventory_id], fmt(returned or rented))
+
+    written['rental'] = insert(db, 'rental', rental_rows())
+
+    # One payment per rental, read back from the rental table
+    rentals = db.execute("SELECT rental_id, customer_id, staff_id, rental_date FROM rental ORDER BY rental_id")
+    written['payment'] = insert(db, 'payment', (
+        (rental_id, customer_id, staff_id, rental_id, rng.choice(AMOUNTS), paid, paid)
+        for rental_id, customer_id, staff_id, paid in rentals
+    ))
+
+    db.commit()
+    db.close()
+    return written
+
+
+def mutate(path, fraction=0.01, seed=42):
+    """
+    Simulate source activity for an incremental benchmark: touch a fraction
+    of the films, customers and rentals and append new rentals and
+    payments. Returns the number of source rows changed.
+    """
+    rng = random.Random(f"{seed}:mutate")
+    db = sqlite3.connect(path)
+    stamp = fmt(datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0))
+    changed = 0
+
+    for table, pk in (('film', 'film_id'), ('customer', 'customer_id'), ('rental', 'rental_id')):
+        count = db.execute(f"SELECT MAX({pk}) FROM {table}").fetchone()[0] or 0
+        ids = rng.sample(range(1, count + 1), max(1, int(count * fraction))) if count else []
+        db.executemany(f"UPDATE {table} SET last_update = ? WHERE {pk} = ?", ((stamp, i) for i in ids))
+        changed += len(ids)
+
+    last_rental, last_rented = db.execute("SELECT MAX(rental_id), MAX(rental_date) FROM rental").fetchone()
+    inventory_count = db.execute("SELECT COUNT(*) FROM inventory").fetchone()[0]
+    customer_count = db.execute("SELECT COUNT(*) FROM customer").fetchone()[0]
+    new_count = max(1, int(last_rental * fraction))
+    rented = datetime.strptime(last_rented, '%Y-%m-%d %H:%M:%S') + timedelta(days=1)
+
+    new_rentals = []
+    for i in range(last_rental + 1, last_rental + new_count + 1):
+        inventory_id = rng.randint(1, inventory_count)
+        store_id = db.execute("SELECT store_id FROM inventory WHERE inventory_id = ?", (inventory_id,)).fetchone()[0]
+        new_rentals.append((i, fmt(rented), inventory_id, rng.randint(1, customer_count), None, store_id, stamp))
+    insert(db, 'rental', new_rentals)
+    insert(db, 'payment', (
+        (rental_id, customer_id, staff_id, rental_id, rng.choice(AMOUNTS), paid, stamp)
+        for rental_id, paid, _, customer_id, _, staff_id, _ in new_rentals
+    ))
+    changed += 2 * len(new_rentals)
+
+    db.commit()
+    db.close()
+    return changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', help='SQLite file to write')
+    parser.add_argument('--scale', type=int, default=1, help='multiple of the stock Sakila size')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    written = generate(args.path, args.scale, args.seed)
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {sum(written.values())} rows to {args.path} in {elapsed:.1f}s")
+    for table, count in written.items():
+        print(f"  {table}: {count}")
+
+
+if __name__ == '__main__':
+    main()
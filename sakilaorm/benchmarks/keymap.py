@@ -0,0 +1,80 @@
+"""
+Key map benchmark: a dict of natural id -> surrogate key against the dense
+and sparse layouts of sakilaorm.keymap.KeyMap, for memory per mapped key
+and lookup throughput.
+
+Dense ids are 1..rows with a few gaps, as auto-increment ids end up; the
+sparse ids are spread over 20x the row count. Every map is checked to
+return the same keys first.
+
+    python -m benchmarks.keymap --rows 10000000
+"""
+import argparse
+import gc
+import os
+import random
+import time
+import tracemalloc
+from array import array
+
+import django
+
+
+def traced(build):
+    """(result, traced bytes it holds)"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, held
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--lookups', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+    django.setup()
+    from sakilaorm.keymap import KeyMap
+
+    rng = random.Random(args.seed)
+    layouts = {
+        'dense': [natural_id for natural_id in range(1, args.rows + 1) if rng.random() > 0.01],
+        'sparse': sorted(rng.sample(range(1, args.rows * 20), args.rows)),
+    }
+
+    print(f"{args.rows} ids, {args.lookups} lookups")
+    for layout, ids in layouts.items():
+        # Surrogate keys in load order, as the dimension hands them out.
+        # Pairs are read out of arrays so each map gets its own int
+        # objects, like rows fetched from the database.
+        id_column = array('q', ids)
+        key_column = array('q', range(1, len(ids) + 1))
+        probes = [rng.choice(ids) if rng.random() < 0.9 else rng.randrange(ids[-1]) for _ in range(args.lookups)]
+
+        results = {}
+        for name, build in (
+            ('dict', lambda: dict(zip(id_column, key_column))),
+            ('KeyMap', lambda: KeyMap.from_pairs(zip(id_column, key_column))),
+        ):
+            key_map, held = traced(build)
+            started = time.perf_counter()
+            found = [key_map.get(natural_id) for natural_id in probes]
+            elapsed = time.perf_counter() - started
+            results[name] = found
+            print(
+                f"  {layout} {name}: {held / len(ids):.1f} bytes per key, "
+                f"{args.lookups / elapsed:,.0f} lookups/sec"
+                + (f" ({'dense' if key_map.dense else 'sparse'} layout)" if name == 'KeyMap' else "")
+            )
+            del key_map
+        if results['dict'] != results['KeyMap']:
+            raise SystemExit(f"{layout}: KeyMap lookups differ from the dict")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""
+Fact extraction benchmark, extract and transform together: the ORM path
+that select_related() model instances and transforms them in Python, the
+values_list() tuple path, and the SQL path of sakilaorm.pushdown, where
+the source computes date keys and durations and Python only maps keys.
+
+Identity key maps stand in for the dimension keys. The tuple and SQL
+paths resolve film and store from a cached inventory map, the ORM path
+from its joins. Every path must produce the same fact rows before it is
+timed, also for returns logged part of a day before the rental, which
+the generated source doesn't have. Wall and CPU time are scaled to a
+million rows.
+
+    python -m benchmarks.pushdown --scale 10
+"""
+import argparse
+import gc
+import os
+import time
+
+import django
+
+from benchmarks.extract import MILLION, payment_values, rental_values
+from benchmarks.generate import generate
+from benchmarks.run import BENCH_DIR
+
+
+def joined_inventory(rentals):
+    """The inventory values select_related() already joined onto model instances"""
+    return {rental.inventory_id: (rental.inventory.film_id, rental.inventory.store_id) for rental in rentals}
+
+
+# Hours from rental to return checked on both rental paths
+RETURN_OFFSETS = (-1, -25, 23)
+
+
+def check_floored_durations(tuples_transform, sql_transform):
+    """
+    Run the tuple and SQL rental paths over copies of the first rentals,
+    their returns moved RETURN_OFFSETS hours from the rental, in a
+    temporary table that shadows rental on the source connection
+    """
+    from django.db import connections
+    from sakilaorm.models import Rental
+    from sakilaorm.pushdown import fact_chunks
+    from sakilaorm.transform import RENTAL_COLUMNS
+
+    with connections['sakila'].cursor() as cursor:
+        cursor.execute(
+            f"CREATE TEMP TABLE rental AS SELECT * FROM main.rental ORDER BY rental_id LIMIT {len(RETURN_OFFSETS)}"
+        )
+        try:
+            cursor.execute("SELECT rental_id FROM temp.rental ORDER BY rental_id")
+            for (rental_id,), hours in zip(cursor.fetchall(), RETURN_OFFSETS):
+                cursor.execute(
+                    "UPDATE temp.rental SET return_date = datetime(rental_date, %s) WHERE rental_id = %s",
+                    [f'{hours} hours', rental_id],
+                )
+            rentals = list(Rental.objects.using('sakila').values_list(*RENTAL_COLUMNS).order_by('pk'))
+            expected = tuples_transform(rentals)
+            actual = [row for chunk in fact_chunks('rental', using='sakila') for row in sql_transform(chunk)]
+        finally:
+            cursor.execute("DROP TABLE temp.rental")
+
+    durations = [row['rental_duration_days'] for row in expected]
+    if durations != [hours // 24 for hours in RETURN_OFFSETS] or actual != expected:
+        raise SystemExit(f"rental: sql durations differ from {durations} for returns before the rental")
+
+
+def timed_pass(chunks, transform):
+    """(wall seconds, CPU seconds, fact rows) to extract and transform every chunk"""
+    gc.collect()
+    wall, cpu = time.perf_counter(), time.process_time()
+    rows = [row for chunk in chunks() for row in transform(chunk)]
+    return time.perf_counter() - wall, time.process_time() - cpu, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=int, default=10, choices=[1, 10, 100, 1000])
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--regenerate', action='store_true', help='rebuild the source even if it exists')
+    args = parser.parse_args()
+
+    BENCH_DIR.mkdir(exist_ok=True)
+    source = BENCH_DIR / f'sakila_{args.scale}x_{args.seed}.sqlite3'
+    if args.regenerate or not source.exists():
+        print(f"Generating {args.scale}x source at {source}")
+        generate(str(source), args.scale, args.seed)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+    os.environ.setdefault('BENCH_SOURCE_DB', str(source))
+    django.setup()
+    from sakilaorm.extract import stream_chunks
+    from sakilaorm.models import Customer, FactPayment, Film, Inventory, Payment, Rental, Store
+    from sakilaorm.pushdown import fact_chunks
+    from sakilaorm.transform import (
+        PAYMENT_COLUMNS, RENTAL_COLUMNS, keyed_payment_rows, keyed_rental_rows, payment_rows, rental_rows,
+    )
+
+    def identity(model):
+        return {pk: pk for pk in model.objects.using('sakila').values_list('pk', flat=True)}
+
+    film_keys, store_keys, customer_keys = identity(Film), identity(Store), identity(Customer)
+    inventory = {
+        inventory_id: (film_id, store_id)
+        for inventory_id, film_id, store_id in Inventory.objects.using('sakila').values_list(
+            'inventory_id', 'film_id', 'store_id',
+        )
+    }
+    # SQLite hands amounts back as floats; the fact column quantizes them
+    amount = FactPayment._meta.get_field('amount').to_python
+
+    def normalized(rows):
+        return [{**row, 'amount': amount(row['amount'])} if 'amount' in row else row for row in rows]
+
+    rentals = Rental.objects.using('sakila')
+    payments = Payment.objects.using('sakila')
+    cases = {
+        'rental': {
+            'orm': (
+                lambda: stream_chunks(
+                    rentals.select_related('inventory__film', 'inventory__store', 'customer').order_by('pk'),
+                    'rental',
+                ),
+                lambda chunk: rental_rows(
+                    [rental_values(rental) for rental in chunk], film_keys, store_keys, customer_keys,
+                    joined_inventory(chunk),
+                ),
+            ),
+            'tuples': (
+                lambda: stream_chunks(rentals.values_list(*RENTAL_COLUMNS).order_by('pk'), 'rental'),
+                lambda chunk: rental_rows(chunk, film_keys, store_keys, customer_keys, inventory),
+            ),
+            'sql': (
+                lambda: fact_chunks('rental'),
+                lambda chunk: keyed_rental_rows(chunk, film_keys, store_keys, customer_keys, inventory),
+            ),
+        },
+        'payment': {
+            'orm': (
+                lambda: stream_chunks(
+                    payments.select_related('customer', 'rental__inventory__store').order_by('pk'), 'payment',
+                ),
+                lambda chunk: payment_rows(
+                    [payment_values(payment) for payment in chunk], customer_keys, store_keys,
+                    joined_inventory(payment.rental for payment in chunk if payment.rental),
+                ),
+            ),
+            'tuples': (
+                lambda: stream_chunks(payments.values_list(*PAYMENT_COLUMNS).order_by('pk'), 'payment'),
+                lambda chunk: payment_rows(chunk, customer_keys, store_keys, inventory),
+            ),
+            'sql': (
+                lambda: fact_chunks('payment'),
+                lambda chunk: keyed_payment_rows(chunk, customer_keys, store_keys, inventory),
+            ),
+        },
+    }
+
+    check_floored_durations(cases['rental']['tuples'][1], cases['rental']['sql'][1])
+
+    print(f"Source {source}, figures per million rows")
+    for table, modes in cases.items():
+        results = {}
+        expected = None
+        for mode, (chunks, transform) in modes.items():
+            wall, cpu, rows = timed_pass(chunks, transform)
+            rows = normalized(rows)
+            if expected is None:
+                expected = rows
+            elif rows != expected:
+                raise SystemExit(f"{table}: {mode} fact rows differ from the orm path")
+            results[mode] = (wall, cpu)
+            print(
+                f"  {table} {mode}: {len(rows)} rows, {wall * MILLION / len(rows):.2f}s wall, "
+                f"{cpu * MILLION / len(rows):.2f}s CPU"
+            )
+        orm_wall, orm_cpu = results['orm']
+        for mode in ('tuples', 'sql'):
+            wall, cpu = results[mode]
+            print(f"  {table}: {mode} {orm_wall / wall:.1f}x faster than orm, {orm_cpu / cpu:.1f}x less CPU")
+
+
+if __name__ == '__main__':
+    main()
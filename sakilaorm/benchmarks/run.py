@@ -0,0 +1,187 @@
+"""
+ETL benchmark harness.
+
+Generates (or reuses) a synthetic Sakila source, then times init,
+full-load, incremental and validate against it. Each command runs in its
+own process so peak RSS is per command. Results are appended to a JSON
+file, one entry per run, so numbers can be compared between commits.
+
+    python -m benchmarks.run --scale 10
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import time
+from contextlib import ExitStack
+from pathlib import Path
+
+from benchmarks.generate import generate, mutate
+
+
+BENCH_DIR = Path(__file__).resolve().parent.parent / 'bench_data'
+STAGES = ['init', 'full-load', 'incremental', 'validate']
+
+
+class QueryCounter:
+    """connection.execute_wrapper that counts statements and DB time"""
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.time += time.perf_counter() - started
+            self.count += 1
+
+
+def run_stage(stage, env, options, results):
+    """Run one command in this (child) process and report its measurements"""
+    os.environ.update(env)
+    import django
+    django.setup()
+
+    from django.db import connections
+    import manage
+
+    commands = {
+        'init': manage.init_command,
+        'full-load': manage.full_load_command,
+        'incremental': manage.incremental_command,
+        'validate': manage.validate_command,
+    }
+    counters = {alias: QueryCounter() for alias in connections}
+    exit_code = 0
+
+    with ExitStack() as stack:
+        for alias, counter in counters.items():
+            stack.enter_context(connections[alias].execute_wrapper(counter))
+        started = time.perf_counter()
+        try:
+            commands[stage](**options)
+        except SystemExit as e:
+            exit_code = e.code or 0
+        elapsed = time.perf_counter() - started
+
+    results.put({
+        'wall_time': elapsed,
+        'exit_code': exit_code,
+        # ru_maxrss is in KiB on Linux
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'queries': {alias: counter.count for alias, counter in counters.items()},
+        'db_time': {alias: round(counter.time, 4) for alias, counter in counters.items()},
+    })
+
+
+def measure(stage, env, options=None):
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=run_stage, args=(stage, env, options or {}, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=int, default=1, choices=[1, 10, 100, 1000])
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workers', type=int, default=1, help='full-load --workers')
+    parser.add_argument('--defer-indexes', action='store_true', help='full-load --defer-indexes')
+    parser.add_argument('--load-profile', default='bulk-load',
+                        help="SQLite profile for writes, e.g. 'baseline' for the pre-tuning defaults")
+    parser.add_argument('--regenerate', action='store_true', help='rebuild the source even if it exists')
+    parser.add_argument('--output', default=str(BENCH_DIR / 'results.json'))
+    parser.add_argument('--label', default='', help='free-form note stored with the results')
+    args = parser.parse_args()
+
+    BENCH_DIR.mkdir(exist_ok=True)
+    source = BENCH_DIR / f'sakila_{args.scale}x_{args.seed}.sqlite3'
+    target = BENCH_DIR / f'analytics_{args.scale}x.sqlite3'
+
+    if args.regenerate or not source.exists():
+        print(f"Generating {args.scale}x source at {source}")
+        generate(str(source), args.scale, args.seed)
+    for path in (target, Path(f'{target}-wal'), Path(f'{target}-shm')):
+        if path.exists():
+            path.unlink()
+
+    import sqlite3
+    db = sqlite3.connect(source)
+    source_rows = sum(
+        db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        for table in ['film', 'actor', 'category', 'film_actor', 'film_category',
+                      'store', 'customer', 'rental', 'payment']
+    )
+    db.close()
+
+    env = {
+        'DJANGO_SETTINGS_MODULE': 'benchmarks.settings',
+        'BENCH_SOURCE_DB': str(source),
+        'BENCH_TARGET_DB': str(target),
+        'BENCH_LOAD_PROFILE': args.load_profile,
+    }
+
+    stages = {}
+    for stage in STAGES:
+        rows = source_rows if stage in ('full-load', 'validate') else 0
+        if stage == 'incremental':
+            # Work on a copy so the generated source stays reusable
+            mutated = BENCH_DIR / f'sakila_{args.scale}x_{args.seed}_mutated.sqlite3'
+            shutil.copyfile(source, mutated)
+            env['BENCH_SOURCE_DB'] = str(mutated)
+            rows = mutate(str(mutated), seed=args.seed)
+
+        print(f"Running {stage}")
+        options = {}
+        if stage == 'full-load':
+            options = {'workers': args.workers, 'defer_indexes': args.defer_indexes}
+        result = measure(stage, env, options)
+        result['rows'] = rows
+        result['rows_per_sec'] = rows / result['wall_time'] if rows and result['wall_time'] else None
+        stages[stage] = result
+        print(f"  {result['wall_time']:.2f}s, {result['peak_rss_mb']:.0f} MB peak RSS, "
+              f"queries {result['queries']}")
+
+    entry = {
+        'commit': git_commit(),
+        'label': args.label,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'scale': args.scale,
+        'seed': args.seed,
+        'workers': args.workers,
+        'defer_indexes': args.defer_indexes,
+        'load_profile': args.load_profile,
+        'python': platform.python_version(),
+        'stages': stages,
+    }
+
+    output = Path(args.output)
+    history = json.loads(output.read_text()) if output.exists() else []
+    history.append(entry)
+    output.write_text(json.dumps(history, indent=2))
+    print(f"Results appended to {output}")
+
+    if any(result['exit_code'] for result in stages.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""
+Settings for ETL benchmarks: the analytics db and a synthetic Sakila
+source are both local SQLite files, chosen through BENCH_TARGET_DB and
+BENCH_SOURCE_DB.
+"""
+import os
+from pathlib import Path
+
+from sakilaorm.settings import *  # noqa: F401,F403
+from sakilaorm.settings import BASE_DIR, DATABASES, ETL_LOAD_PROFILE, SQLITE_PROFILES
+
+BENCH_DIR = Path(os.getenv('BENCH_DIR', BASE_DIR / 'bench_data'))
+
+SOURCE_DB = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    'NAME': os.getenv('BENCH_SOURCE_DB', BENCH_DIR / 'sakila.sqlite3'),
+}
+
+DATABASES = {
+    'default': {
+        **DATABASES['default'],
+        'NAME': os.getenv('BENCH_TARGET_DB', BENCH_DIR / 'analytics.sqlite3'),
+    },
+    'sakila': dict(SOURCE_DB),
+    'sakila_stream': dict(SOURCE_DB),
+}
+
+# SQLite defaults before load profiles existed, to benchmark against
+SQLITE_PROFILES = {
+    **SQLITE_PROFILES,
+    'baseline': {
+        'journal_mode': 'DELETE',
+        'synchronous': 'FULL',
+        'cache_size': -2000,
+        'temp_store': 'DEFAULT',
+        'mmap_size': 0,
+    },
+}
+ETL_LOAD_PROFILE = os.getenv('BENCH_LOAD_PROFILE', ETL_LOAD_PROFILE)
@@ -0,0 +1,178 @@
+"""
+Fact transform benchmark: the old per-row rental_row/payment_row against
+the batch rental_rows/payment_rows, on synthetic in-memory source rows,
+plus the date key and duration computation on its own.
+
+Both paths are checked to produce identical rows before timing.
+
+    python -m benchmarks.transform --rows 1000000
+"""
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import django
+
+
+INVENTORY_SIZE = 4581
+
+
+def synthetic_inventory(seed):
+    """inventory_id -> (film_id, store_id)"""
+    rng = random.Random(seed)
+    return {inventory_id: (rng.randint(1, 1000), rng.randint(1, 2)) for inventory_id in range(1, INVENTORY_SIZE + 1)}
+
+
+def synthetic_rows(count, seed):
+    """Rental and payment source tuples, laid out as RENTAL_COLUMNS and PAYMENT_COLUMNS"""
+    rng = random.Random(seed)
+    start = datetime(2005, 5, 24, tzinfo=timezone.utc)
+    rentals, payments = [], []
+    for rental_id in range(1, count + 1):
+        rental_date = start + timedelta(seconds=rng.randrange(300 * 86400))
+        # About 1% of rentals are still out
+        return_date = None if rng.random() < 0.01 else rental_date + timedelta(seconds=rng.randrange(10 * 86400))
+        inventory_id = rng.randint(1, INVENTORY_SIZE)
+        customer_id = rng.randint(1, 599)
+        staff_id = rng.randint(1, 2)
+        rentals.append((
+            rental_id, rental_date, return_date, inventory_id, customer_id, staff_id, rental_date,
+        ))
+        payment_date = rental_date + timedelta(seconds=rng.randrange(3600))
+        payments.append((
+            rental_id, payment_date, customer_id, inventory_id, staff_id, Decimal('2.99'), payment_date,
+        ))
+    return rentals, payments
+
+
+def calculate_rental_duration(rental_date, return_date):
+    if rental_date and return_date:
+        return (return_date - rental_date).days
+    return None
+
+
+def timed(function, repeat):
+    """Best wall time of repeat calls, and the last result"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--chunk-size', type=int, default=10000, help='rows per batch transform call')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+    django.setup()
+    from sakilaorm.dates import get_date_key
+    from sakilaorm.transform import NO_INVENTORY, payment_rows, rental_rows
+    from sakilaorm.vectorized import DateColumn, date_keys, duration_days, with_nulls
+
+    # The per-row transforms the batch ones replaced, kept as the baseline
+    def rental_row(rental, film_keys, store_keys, customer_keys, inventory):
+        """Map a source rental tuple to fact_rental values, or None if a dimension is missing"""
+        rental_id, rental_date, return_date, inventory_id, customer_id, staff_id, _ = rental
+        film_id, store_id = inventory.get(inventory_id, NO_INVENTORY)
+        film_key = film_keys.get(film_id)
+        store_key = store_keys.get(store_id)
+        customer_key = customer_keys.get(customer_id)
+
+        if not (film_key and store_key and customer_key):
+            return None
+        return {
+            'rental_id': rental_id,
+            'date_key_rented': get_date_key(rental_date),
+            'date_key_returned': get_date_key(return_date),
+            'film_key': film_key,
+            'store_key': store_key,
+            'customer_key': customer_key,
+            'staff_id': staff_id,
+            'rental_duration_days': calculate_rental_duration(rental_date, return_date),
+        }
+
+    def payment_row(payment, customer_keys, store_keys, inventory):
+        """Map a source payment tuple to fact_payment values, or None if a dimension is missing"""
+        payment_id, payment_date, customer_id, inventory_id, staff_id, amount, _ = payment
+        _, store_id = inventory.get(inventory_id, NO_INVENTORY)
+        customer_key = customer_keys.get(customer_id)
+        store_key = store_keys.get(store_id)
+
+        if not (customer_key and store_key):
+            return None
+        return {
+            'payment_id': payment_id,
+            'date_key_paid': get_date_key(payment_date),
+            'customer_key': customer_key,
+            'store_key': store_key,
+            'staff_id': staff_id,
+            'amount': amount,
+        }
+
+    def batch_dates(chunk):
+        rented = DateColumn([rental[1] for rental in chunk])
+        returned = DateColumn([rental[2] for rental in chunk])
+        return zip(
+            with_nulls(*date_keys(rented)),
+            with_nulls(*date_keys(returned)),
+            with_nulls(*duration_days(rented, returned)),
+        )
+
+    rentals, payments = synthetic_rows(args.rows, args.seed)
+    film_keys = {film_id: film_id for film_id in range(1, 1001)}
+    store_keys = {1: 1, 2: 2}
+    customer_keys = {customer_id: customer_id for customer_id in range(1, 600)}
+    inventory = synthetic_inventory(args.seed)
+    chunks = range(0, args.rows, args.chunk_size)
+
+    cases = {
+        # Just the date keys and durations
+        'rental dates': (
+            lambda: [
+                (get_date_key(rental[1]), get_date_key(rental[2]),
+                 calculate_rental_duration(rental[1], rental[2]))
+                for rental in rentals
+            ],
+            lambda: [values for low in chunks for values in batch_dates(rentals[low:low + args.chunk_size])],
+        ),
+        'rental': (
+            lambda: [row for rental in rentals
+                     if (row := rental_row(rental, film_keys, store_keys, customer_keys, inventory))],
+            lambda: [row for low in chunks
+                     for row in rental_rows(
+                         rentals[low:low + args.chunk_size], film_keys, store_keys, customer_keys, inventory,
+                     )],
+        ),
+        'payment': (
+            lambda: [row for payment in payments
+                     if (row := payment_row(payment, customer_keys, store_keys, inventory))],
+            lambda: [row for low in chunks
+                     for row in payment_rows(payments[low:low + args.chunk_size], customer_keys, store_keys, inventory)],
+        ),
+    }
+
+    print(f"{args.rows} rows, batch chunks of {args.chunk_size}, best of {args.repeat}")
+    for table, (per_row, batch) in cases.items():
+        per_row_time, expected = timed(per_row, args.repeat)
+        batch_time, actual = timed(batch, args.repeat)
+        if actual != expected:
+            raise SystemExit(f"{table}: batch transform rows differ from the per-row path")
+        print(
+            f"  {table}: per-row {per_row_time:.3f}s ({args.rows / per_row_time:,.0f} rows/sec), "
+            f"batch {batch_time:.3f}s ({args.rows / batch_time:,.0f} rows/sec), "
+            f"{per_row_time / batch_time:.2f}x"
+        )
+
+
+if __name__ == '__main__':
+    main()
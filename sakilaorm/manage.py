@@ -1,4 +1,5 @@
 
+import argparse
 import os
 import sys
 import django
@@ -15,15 +16,30 @@ def init_command():
         # Verify MySQL connection
         print("Connecting to Sakila")
         sakila_conn = connections['sakila']
-        with sakila_conn.cursor() as cursor:
-            cursor.execute("SELECT DATABASE()")
-            db_name = cursor.fetchone()[0]
-            print(f"Connected to MySQL database: {db_name}")
+        if sakila_conn.vendor == 'mysql':
+            with sakila_conn.cursor() as cursor:
+                cursor.execute("SELECT DATABASE()")
+                db_name = cursor.fetchone()[0]
+                print(f"Connected to MySQL database: {db_name}")
+        else:
+            # Local stand-in source, e.g. the benchmark SQLite file
+            sakila_conn.ensure_connection()
+            print(f"Connected to {sakila_conn.vendor} database: {sakila_conn.settings_dict['NAME']}")
 
         # Create SQLite tables for analytics models
         print("Creating analytics tables")
         call_command('migrate', '--database=default', '--run-syncdb', verbosity=1)
 
+        # syncdb only creates missing tables; add columns newer than them
+        from sakilaorm.rowhash import add_row_hash_columns
+        upgraded = add_row_hash_columns()
+        if upgraded:
+            print(f"Added row_hash to {', '.join(upgraded)}")
+        from sakilaorm.watermark import add_watermark_columns
+        upgraded = add_watermark_columns()
+        if upgraded:
+            print(f"Added {', '.join(upgraded)} to sync_state")
+
         print("Analytics db initialized")
 
     except Exception as e:
@@ -31,257 +47,398 @@ def init_command():
         sys.exit(1)
 
 
-def full_load_command():
-    """Load all source data from Sakila to SQLite analytics"""
+def full_load_command(workers=1, defer_indexes=False, shadow=False, profile=False, resume=False):
+    """
+    Load all source data from Sakila to SQLite analytics. Tables and fact
+    chunks commit as they load; resume continues an interrupted load.
+    """
     print("Starting full load from Sakila to analytics db")
+    from sakilaorm.profiling import start_profile
+    profiler = start_profile('full-load', profile)
 
     try:
-        from django.db import transaction, connections
+        from django.db import transaction
         from sakilaorm.models import (
             # Source models
             Film, Actor, Category, FilmActor, FilmCategory,
-            Store, Customer, Rental, Payment, Language,
-            # Analytics models
-            DimDate, DimFilm, DimActor, DimCategory, DimStore, DimCustomer,
-            BridgeFilmActor, BridgeFilmCategory,
-            FactRental, FactPayment, SyncState
+            Store, Customer, Rental, Payment,
         )
-        from datetime import datetime, date
-        from django.utils import timezone
-
-        # Helper function to generate date_key from date
-        def get_date_key(dt):
-            if dt is None:
-                return None
-            if isinstance(dt, datetime):
-                dt = dt.date()
-            return int(dt.strftime('%Y%m%d'))
-
-        # Helper function to calculate rental duration
-        def calculate_rental_duration(rental_date, return_date):
-            if rental_date and return_date:
-                return (return_date - rental_date).days
-            return None
-
-        with transaction.atomic(using='default'):
+        from sakilaorm.loader import BulkUpserter
+        from sakilaorm.extract import stream_chunks
+        from sakilaorm.dates import source_date_range, extend_dim_date
+        from sakilaorm.transform import (
+            RENTAL_COLUMNS, PAYMENT_COLUMNS, rental_rows, payment_rows, keyed_rental_rows, keyed_payment_rows,
+        )
+        from sakilaorm.pushdown import fact_chunks, pushdown_enabled
+        from sakilaorm.sourcecache import SourceLookups
+        from sakilaorm.keymap import KeyMap
+        from sakilaorm.parallel import extract_parallel
+        from sakilaorm.watermark import source_watermark, save_watermark
+        from sakilaorm.profiles import load_profile
+        from sakilaorm.indexes import drop_secondary_indexes, rebuild_secondary_indexes
+        from sakilaorm.shadow import LoadTarget, create_staging_tables, swap_in_staging_tables
+        from sakilaorm.rollups import rebuild_rollups
+        from sakilaorm.pipeline import Pipeline
+        from sakilaorm.checkpoint import LoadProgress
+
+        # Rows changed while the load runs are past these watermarks and
+        # get picked up again by the next incremental sync
+        source_watermarks = {
+            'film': source_watermark(Film),
+            'actor': source_watermark(Actor),
+            'category': source_watermark(Category),
+            'store': source_watermark(Store),
+            'customer': source_watermark(Customer),
+            'rental': source_watermark(Rental),
+            'payment': source_watermark(Payment),
+        }
+
+        # Each table, and each chunk of a fact table, commits with a
+        # checkpoint, so an interrupted load can be resumed where it stopped
+        progress = LoadProgress(shadow=shadow)
+        if progress.start(source_watermarks, resume=resume):
+            print("Resuming the unfinished full load")
+            source_watermarks = progress.source_watermarks()
+        elif resume:
+            print("No unfinished full load to resume, starting from the beginning")
+
+        if shadow:
+            # Build a new generation in *_staging tables with plain inserts,
+            # so readers keep the live tables
+            if not progress.completed('staging_tables'):
+                print("Creating staging tables")
+                with progress.stage('staging_tables'):
+                    create_staging_tables()
+        # The analytics models to write through, over the staging tables
+        # for a shadow load
+        target = LoadTarget(staging=shadow)
+        # Staging tables start empty, and a resumed load skips what it
+        # already committed, so there is nothing to upsert
+        upsert = not shadow
+
+        with load_profile():
             print("Loading dimensions")
 
-            # Load dim_date
+            # Load dim_date as one contiguous calendar covering the source
+            profiler.stage('dim_date')
             print("  Loading dim_date")
-            dates_to_create = set()
-
-            # Collect all unique dates from rentals and payments
-            for rental in Rental.objects.using('sakila').all():
-                if rental.rental_date:
-                    dates_to_create.add(rental.rental_date.date())
-                if rental.return_date:
-                    dates_to_create.add(rental.return_date.date())
-
-            for payment in Payment.objects.using('sakila').all():
-                if payment.payment_date:
-                    dates_to_create.add(payment.payment_date.date())
-
-            # Create dim_date records
-            for dt in dates_to_create:
-                date_key = get_date_key(dt)
-                DimDate.objects.using('default').update_or_create(
-                    date_key=date_key,
-                    defaults={
-                        'date': dt,
-                        'year': dt.year,
-                        'quarter': (dt.month - 1) // 3 + 1,
-                        'month': dt.month,
-                        'day_of_month': dt.day,
-                        'day_of_week': dt.weekday(),
-                        'is_weekend': 1 if dt.weekday() >= 5 else 0,
-                    }
-                )
-            print(f"    Loaded {len(dates_to_create)} dates")
+            first_date, last_date = source_date_range()
+            date_count = extend_dim_date(first_date, last_date, model=target.DimDate)
+            print(f"    Loaded {date_count} dates ({first_date} to {last_date})")
+
+            # Read inventory and address geography once, so dimensions and
+            # facts are extracted without joining them
+            profiler.stage('source_lookups')
+            source = SourceLookups().load()
+            # inventory_id -> (film_id, store_id)
+            inventory = source.inventory.values
+            print(f"  Cached source lookups ({source.summary()})")
 
             # Load dim_film
-            print("  Loading dim_film")
-            film_count = 0
-            film_key_mapping = {}  # film_id -> film_key
-
-            for film in Film.objects.using('sakila').select_related('language').all():
-                dim_film, created = DimFilm.objects.using('default').update_or_create(
-                    film_id=film.film_id,
-                    defaults={
-                        'title': film.title,
-                        'rating': film.rating,
-                        'length': film.length,
-                        'language': film.language.name,
-                        'release_year': film.release_year,
-                        'last_update': film.last_update,
-                    }
-                )
-                film_key_mapping[film.film_id] = dim_film.film_key
-                film_count += 1
-            print(f"    Loaded {film_count} films")
+            profiler.stage('dim_film')
+            if progress.completed('dim_film'):
+                print("  dim_film already loaded")
+            else:
+                print("  Loading dim_film")
+                with progress.stage('dim_film'):
+                    film_writer = BulkUpserter(
+                        target.DimFilm, ['film_id'],
+                        ['title', 'rating', 'length', 'language', 'release_year', 'last_update'],
+                        upsert=upsert,
+                    )
+                    for film in Film.objects.using('sakila').select_related('language').all():
+                        film_writer.add(
+                            film_id=film.film_id,
+                            title=film.title,
+                            rating=film.rating,
+                            length=film.length,
+                            language=film.language.name,
+                            release_year=film.release_year,
+                            last_update=film.last_update,
+                        )
+                    film_count = film_writer.close()
+                print(f"    Loaded {film_count} films: {film_writer.summary()}")
+            # film_id -> film_key
+            film_key_mapping = KeyMap.from_pairs(
+                target.DimFilm.objects.using('default').values_list('film_id', 'film_key')
+            )
 
             # Load dim_actor
-            print("  Loading dim_actor")
-            actor_count = 0
-            actor_key_mapping = {}  # actor_id -> actor_key
-
-            for actor in Actor.objects.using('sakila').all():
-                dim_actor, created = DimActor.objects.using('default').update_or_create(
-                    actor_id=actor.actor_id,
-                    defaults={
-                        'first_name': actor.first_name,
-                        'last_name': actor.last_name,
-                        'last_update': actor.last_update,
-                    }
-                )
-                actor_key_mapping[actor.actor_id] = dim_actor.actor_key
-                actor_count += 1
-            print(f"    Loaded {actor_count} actors")
+            profiler.stage('dim_actor')
+            if progress.completed('dim_actor'):
+                print("  dim_actor already loaded")
+            else:
+                print("  Loading dim_actor")
+                with progress.stage('dim_actor'):
+                    actor_writer = BulkUpserter(
+                        target.DimActor, ['actor_id'], ['first_name', 'last_name', 'last_update'], upsert=upsert,
+                    )
+                    for actor in Actor.objects.using('sakila').all():
+                        actor_writer.add(
+                            actor_id=actor.actor_id,
+                            first_name=actor.first_name,
+                            last_name=actor.last_name,
+                            last_update=actor.last_update,
+                        )
+                    actor_count = actor_writer.close()
+                print(f"    Loaded {actor_count} actors: {actor_writer.summary()}")
+            # actor_id -> actor_key
+            actor_key_mapping = KeyMap.from_pairs(
+                target.DimActor.objects.using('default').values_list('actor_id', 'actor_key')
+            )
 
             # Load dim_category
-            print("  Loading dim_category")
-            category_count = 0
-            category_key_mapping = {}  # category_id -> category_key
-
-            for category in Category.objects.using('sakila').all():
-                dim_category, created = DimCategory.objects.using('default').update_or_create(
-                    category_id=category.category_id,
-                    defaults={
-                        'name': category.name,
-                        'last_update': category.last_update,
-                    }
-                )
-                category_key_mapping[category.category_id] = dim_category.category_key
-                category_count += 1
-            print(f"    Loaded {category_count} categories")
+            profiler.stage('dim_category')
+            if progress.completed('dim_category'):
+                print("  dim_category already loaded")
+            else:
+                print("  Loading dim_category")
+                with progress.stage('dim_category'):
+                    category_writer = BulkUpserter(
+                        target.DimCategory, ['category_id'], ['name', 'last_update'], upsert=upsert,
+                    )
+                    for category in Category.objects.using('sakila').all():
+                        category_writer.add(
+                            category_id=category.category_id,
+                            name=category.name,
+                            last_update=category.last_update,
+                        )
+                    category_count = category_writer.close()
+                print(f"    Loaded {category_count} categories: {category_writer.summary()}")
+            # category_id -> category_key
+            category_key_mapping = KeyMap.from_pairs(
+                target.DimCategory.objects.using('default').values_list('category_id', 'category_key')
+            )
 
             # Load dim_store
-            print("  Loading dim_store")
-            store_count = 0
-            store_key_mapping = {}  # store_id -> store_key
-
-            for store in Store.objects.using('sakila').select_related('address__city__country').all():
-                dim_store, created = DimStore.objects.using('default').update_or_create(
-                    store_id=store.store_id,
-                    defaults={
-                        'city': store.address.city.city,
-                        'country': store.address.city.country.country,
-                        'last_update': store.last_update,
-                    }
-                )
-                store_key_mapping[store.store_id] = dim_store.store_key
-                store_count += 1
-            print(f"    Loaded {store_count} stores")
+            profiler.stage('dim_store')
+            if progress.completed('dim_store'):
+                print("  dim_store already loaded")
+            else:
+                print("  Loading dim_store")
+                with progress.stage('dim_store'):
+                    store_writer = BulkUpserter(
+                        target.DimStore, ['store_id'], ['city', 'country', 'last_update'], upsert=upsert,
+                    )
+                    for store_id, address_id, last_update in Store.objects.using('sakila').values_list(
+                        'store_id', 'address_id', 'last_update',
+                    ):
+                        city, country = source.place(address_id)
+                        store_writer.add(store_id=store_id, city=city, country=country, last_update=last_update)
+                    store_count = store_writer.close()
+                print(f"    Loaded {store_count} stores: {store_writer.summary()}")
+            # store_id -> store_key
+            store_key_mapping = KeyMap.from_pairs(
+                target.DimStore.objects.using('default').values_list('store_id', 'store_key')
+            )
 
             # Load dim_customer
-            print("  Loading dim_customer")
-            customer_count = 0
-            customer_key_mapping = {}  # customer_id -> customer_key
-
-            for customer in Customer.objects.using('sakila').select_related('address__city__country').all():
-                dim_customer, created = DimCustomer.objects.using('default').update_or_create(
-                    customer_id=customer.customer_id,
-                    defaults={
-                        'first_name': customer.first_name,
-                        'last_name': customer.last_name,
-                        'active': customer.active,
-                        'city': customer.address.city.city,
-                        'country': customer.address.city.country.country,
-                        'last_update': customer.last_update,
-                    }
-                )
-                customer_key_mapping[customer.customer_id] = dim_customer.customer_key
-                customer_count += 1
-            print(f"    Loaded {customer_count} customers")
+            profiler.stage('dim_customer')
+            if progress.completed('dim_customer'):
+                print("  dim_customer already loaded")
+            else:
+                print("  Loading dim_customer")
+                with progress.stage('dim_customer'):
+                    customer_writer = BulkUpserter(
+                        target.DimCustomer, ['customer_id'],
+                        ['first_name', 'last_name', 'active', 'city', 'country', 'last_update'],
+                        upsert=upsert,
+                    )
+                    customers = Customer.objects.using('sakila').values_list(
+                        'customer_id', 'first_name', 'last_name', 'active', 'address_id', 'last_update',
+                    )
+                    for customer_id, first_name, last_name, active, address_id, last_update in customers:
+                        city, country = source.place(address_id)
+                        customer_writer.add(
+                            customer_id=customer_id,
+                            first_name=first_name,
+                            last_name=last_name,
+                            active=active,
+                            city=city,
+                            country=country,
+                            last_update=last_update,
+                        )
+                    customer_count = customer_writer.close()
+                print(f"    Loaded {customer_count} customers: {customer_writer.summary()}")
+            # customer_id -> customer_key
+            customer_key_mapping = KeyMap.from_pairs(
+                target.DimCustomer.objects.using('default').values_list('customer_id', 'customer_key')
+            )
+
+            if defer_indexes and not shadow:
+                # Bridges and facts load without their secondary indexes,
+                # which are rebuilt in one pass at the end
+                dropped = drop_secondary_indexes()
+                print(f"Dropped {dropped} secondary indexes on bridges and facts")
 
             # Load bridges
             print("Loading bridges")
 
             # Load bridge_film_actor
-            print("  Loading bridge_film_actor")
-            bridge_fa_count = 0
-            for film_actor in FilmActor.objects.using('sakila').values('actor_id', 'film_id'):
-                film_key = film_key_mapping.get(film_actor['film_id'])
-                actor_key = actor_key_mapping.get(film_actor['actor_id'])
-                if film_key and actor_key:
-                    BridgeFilmActor.objects.using('default').update_or_create(
-                        film_key=film_key,
-                        actor_key=actor_key,
-                    )
-                    bridge_fa_count += 1
-            print(f"    Loaded {bridge_fa_count} film-actor relationships")
+            profiler.stage('bridge_film_actor')
+            if progress.completed('bridge_film_actor'):
+                print("  bridge_film_actor already loaded")
+            else:
+                print("  Loading bridge_film_actor")
+                with progress.stage('bridge_film_actor'):
+                    bridge_fa_writer = BulkUpserter(target.BridgeFilmActor, ['film_key', 'actor_key'], upsert=upsert)
+                    for film_actor in FilmActor.objects.using('sakila').values('actor_id', 'film_id'):
+                        film_key = film_key_mapping.get(film_actor['film_id'])
+                        actor_key = actor_key_mapping.get(film_actor['actor_id'])
+                        if film_key and actor_key:
+                            bridge_fa_writer.add(film_key=film_key, actor_key=actor_key)
+                    bridge_fa_count = bridge_fa_writer.close()
+                print(f"    Loaded {bridge_fa_count} film-actor relationships: {bridge_fa_writer.summary()}")
 
             # Load bridge_film_category
-            print("  Loading bridge_film_category")
-            bridge_fc_count = 0
-            for film_category in FilmCategory.objects.using('sakila').values('film_id', 'category_id'):
-                film_key = film_key_mapping.get(film_category['film_id'])
-                category_key = category_key_mapping.get(film_category['category_id'])
-                if film_key and category_key:
-                    BridgeFilmCategory.objects.using('default').update_or_create(
-                        film_key=film_key,
-                        category_key=category_key,
-                    )
-                    bridge_fc_count += 1
-            print(f"    Loaded {bridge_fc_count} film-category relationships")
+            profiler.stage('bridge_film_category')
+            if progress.completed('bridge_film_category'):
+                print("  bridge_film_category already loaded")
+            else:
+                print("  Loading bridge_film_category")
+                with progress.stage('bridge_film_category'):
+                    bridge_fc_writer = BulkUpserter(target.BridgeFilmCategory, ['film_key', 'category_key'], upsert=upsert)
+                    for film_category in FilmCategory.objects.using('sakila').values('film_id', 'category_id'):
+                        film_key = film_key_mapping.get(film_category['film_id'])
+                        category_key = category_key_mapping.get(film_category['category_id'])
+                        if film_key and category_key:
+                            bridge_fc_writer.add(film_key=film_key, category_key=category_key)
+                    bridge_fc_count = bridge_fc_writer.close()
+                print(f"    Loaded {bridge_fc_count} film-category relationships: {bridge_fc_writer.summary()}")
 
             # Load facts
             print("Loading facts")
+            if workers > 1:
+                print(f"  Extracting facts with {workers} workers")
+                key_maps = {
+                    'film': film_key_mapping,
+                    'store': store_key_mapping,
+                    'customer': customer_key_mapping,
+                    'inventory': inventory,
+                }
 
             # Load fact_rental
-            print("  Loading fact_rental")
-            rental_count = 0
-            for rental in Rental.objects.using('sakila').select_related('inventory__film', 'inventory__store', 'customer').all():
-                film_key = film_key_mapping.get(rental.inventory.film_id)
-                store_key = store_key_mapping.get(rental.inventory.store_id)
-                customer_key = customer_key_mapping.get(rental.customer_id)
-
-                if film_key and store_key and customer_key:
-                    FactRental.objects.using('default').update_or_create(
-                        rental_id=rental.rental_id,
-                        defaults={
-                            'date_key_rented': get_date_key(rental.rental_date),
-                            'date_key_returned': get_date_key(rental.return_date),
-                            'film_key': film_key,
-                            'store_key': store_key,
-                            'customer_key': customer_key,
-                            'staff_id': rental.staff_id,
-                            'rental_duration_days': calculate_rental_duration(rental.rental_date, rental.return_date),
-                        }
-                    )
-                    rental_count += 1
-            print(f"    Loaded {rental_count} rentals")
+            profiler.stage('fact_rental')
+            if progress.completed('fact_rental'):
+                print("  fact_rental already loaded")
+            else:
+                # Rows are written in rental_id order, so the last one
+                # committed marks where a resumed load picks up
+                rentals_after = progress.last_pk('fact_rental')
+                if rentals_after is None:
+                    print("  Loading fact_rental")
+                else:
+                    print(f"  Loading fact_rental after rental_id {rentals_after}")
+                rental_writer = BulkUpserter(
+                    target.FactRental, ['rental_id'],
+                    ['date_key_rented', 'date_key_returned', 'film_key', 'store_key',
+                     'customer_key', 'staff_id', 'rental_duration_days'],
+                    upsert=upsert,
+                    checkpoint=progress.chunk_saver('fact_rental', 'rental_id'),
+                )
+                if workers > 1:
+                    rental_writer.extend(extract_parallel('rental', workers, key_maps, after=rentals_after))
+                else:
+                    # Fetch, transform and write chunks concurrently
+                    if pushdown_enabled('rental'):
+                        # The source computes date keys and durations; only the
+                        # surrogate keys are looked up here
+                        rental_chunks = fact_chunks('rental', after=rentals_after)
+                        transform_rentals = lambda chunk: keyed_rental_rows(
+                            chunk, film_key_mapping, store_key_mapping, customer_key_mapping, inventory,
+                        )
+                    else:
+                        # Flat tuples of just the columns the transform reads
+                        rentals = Rental.objects.using('sakila').order_by('rental_id')
+                        if rentals_after is not None:
+                            rentals = rentals.filter(rental_id__gt=rentals_after)
+                        rental_chunks = stream_chunks(rentals.values_list(*RENTAL_COLUMNS), 'rental')
+                        transform_rentals = lambda chunk: rental_rows(
+                            chunk, film_key_mapping, store_key_mapping, customer_key_mapping, inventory,
+                        )
+                    rental_pipeline = Pipeline(rental_chunks, transform_rentals, rental_writer.extend).run()
+                    print(f"    Pipeline: {rental_pipeline.summary()}")
+                rental_count = rental_writer.close()
+                progress.save('fact_rental', completed=True)
+                print(f"    Loaded {rental_count} rentals: {rental_writer.summary()}")
 
             # Load fact_payment
-            print("  Loading fact_payment")
-            payment_count = 0
-            for payment in Payment.objects.using('sakila').select_related('customer', 'rental__inventory__store').all():
-                customer_key = customer_key_mapping.get(payment.customer_id)
-                store_key = None
-                if payment.rental and payment.rental.inventory:
-                    store_key = store_key_mapping.get(payment.rental.inventory.store_id)
-
-                if customer_key and store_key:
-                    FactPayment.objects.using('default').update_or_create(
-                        payment_id=payment.payment_id,
-                        defaults={
-                            'date_key_paid': get_date_key(payment.payment_date),
-                            'customer_key': customer_key,
-                            'store_key': store_key,
-                            'staff_id': payment.staff_id,
-                            'amount': payment.amount,
-                        }
-                    )
-                    payment_count += 1
-            print(f"    Loaded {payment_count} payments")
-
-            # Initialize sync_state
-            print("Initializing sync state")
-            current_time = timezone.now()
-            for table_name in ['film', 'actor', 'category', 'store', 'customer', 'rental', 'payment']:
-                SyncState.objects.using('default').update_or_create(
-                    table_name=table_name,
-                    defaults={'last_sync_timestamp': current_time}
+            profiler.stage('fact_payment')
+            if progress.completed('fact_payment'):
+                print("  fact_payment already loaded")
+            else:
+                payments_after = progress.last_pk('fact_payment')
+                if payments_after is None:
+                    print("  Loading fact_payment")
+                else:
+                    print(f"  Loading fact_payment after payment_id {payments_after}")
+                payment_writer = BulkUpserter(
+                    target.FactPayment, ['payment_id'],
+                    ['date_key_paid', 'customer_key', 'store_key', 'staff_id', 'amount'],
+                    upsert=upsert,
+                    checkpoint=progress.chunk_saver('fact_payment', 'payment_id'),
                 )
+                if workers > 1:
+                    payment_writer.extend(extract_parallel('payment', workers, key_maps, after=payments_after))
+                else:
+                    if pushdown_enabled('payment'):
+                        payment_chunks = fact_chunks('payment', after=payments_after)
+                        transform_payments = lambda chunk: keyed_payment_rows(
+                            chunk, customer_key_mapping, store_key_mapping, inventory,
+                        )
+                    else:
+                        payments = Payment.objects.using('sakila').order_by('payment_id')
+                        if payments_after is not None:
+                            payments = payments.filter(payment_id__gt=payments_after)
+                        payment_chunks = stream_chunks(payments.values_list(*PAYMENT_COLUMNS), 'payment')
+                        transform_payments = lambda chunk: payment_rows(
+                            chunk, customer_key_mapping, store_key_mapping, inventory,
+                        )
+                    payment_pipeline = Pipeline(payment_chunks, transform_payments, payment_writer.extend).run()
+                    print(f"    Pipeline: {payment_pipeline.summary()}")
+                payment_count = payment_writer.close()
+                progress.save('fact_payment', completed=True)
+                print(f"    Loaded {payment_count} payments: {payment_writer.summary()}")
+
+            # Rebuild the rollups from the loaded facts
+            profiler.stage('rollups')
+            if progress.completed('rollups'):
+                print("Rollups already built")
+            else:
+                print("Building rollups")
+                with progress.stage('rollups'):
+                    store_day_count, category_month_count = rebuild_rollups(target=target)
+                print(f"  Built {store_day_count} store-day and {category_month_count} category-month rows")
+
+            # Index builds are idempotent, so a resumed load just repeats them
+            profiler.stage('indexes')
+            if shadow:
+                print("Building staging indexes")
+                built, rebuild_time = rebuild_secondary_indexes(target.models)
+                print(f"  Built {built} indexes in {rebuild_time:.2f}s")
+            else:
+                # Without --defer-indexes this only finds work when an
+                # interrupted deferred load was resumed without the flag
+                built, rebuild_time = rebuild_secondary_indexes()
+                if built or defer_indexes:
+                    print(f"Rebuilt {built} secondary indexes in {rebuild_time:.2f}s")
+
+            # Initialize sync_state with the watermarks taken when the load
+            # first started
+            profiler.stage('sync_state')
+            print("Initializing sync state")
+            with transaction.atomic(using='default'):
+                for table_name, (last_update, last_pk) in source_watermarks.items():
+                    save_watermark(table_name, last_update, last_pk, model=target.SyncState)
+                if not shadow:
+                    progress.finish()
+
+        if shadow:
+            profiler.stage('swap')
+            print("Swapping staging tables into place")
+            with transaction.atomic(using='default'):
+                swap_in_staging_tables()
+                progress.finish()
 
         print("Full load completed successfully!")
 
@@ -290,286 +447,324 @@ def full_load_command():
         import traceback
         traceback.print_exc()
         sys.exit(1)
+    finally:
+        profiler.report()
+
+
+def rollback_command():
+    """Swap the analytics tables back to the generation before the last shadow load"""
+    print("Rolling back to the previous analytics generation")
+
+    try:
+        from sakilaorm.shadow import rollback_to_previous
+
+        rollback_to_previous()
+        print("Rollback completed successfully!")
+
+    except Exception as e:
+        print(f"Error during rollback: {e}")
+        sys.exit(1)
 
 
-def incremental_command():
-    """Load only new or changed data from Sakila"""
+def incremental_command(dimension_keys=None, pipeline=None, exit_on_error=True, profile=False, source_lookups=None):
+    """
+    Load only new or changed data from Sakila and return the number of
+    rows synced. A caller running repeated syncs can pass in warm key
+    caches and source lookups, and choose whether facts use the threaded
+    pipeline.
+    """
     print("Starting incremental sync from Sakila to analytics db")
+    from sakilaorm.profiling import start_profile
+    profiler = start_profile('incremental', profile)
 
     try:
         from django.db import transaction
         from sakilaorm.models import (
             # Source models
-            Film, Actor, Category, FilmActor, FilmCategory,
+            Film, Actor, Category,
             Store, Customer, Rental, Payment,
             # Analytics models
-            DimDate, DimFilm, DimActor, DimCategory, DimStore, DimCustomer,
-            BridgeFilmActor, BridgeFilmCategory,
-            FactRental, FactPayment, SyncState
+            DimFilm, DimActor, DimCategory, DimStore, DimCustomer,
+            FactRental, FactPayment
         )
-        from datetime import datetime
-        from django.utils import timezone
-
-        # Helper functions
-        def get_date_key(dt):
-            if dt is None:
-                return None
-            if isinstance(dt, datetime):
-                dt = dt.date()
-            return int(dt.strftime('%Y%m%d'))
-
-        def calculate_rental_duration(rental_date, return_date):
-            if rental_date and return_date:
-                return (return_date - rental_date).days
-            return None
-
-        with transaction.atomic(using='default'):
-            current_time = timezone.now()
+        from sakilaorm.dates import extend_dim_date
+        from sakilaorm.loader import BulkUpserter
+        from sakilaorm.keycache import DimensionKeys
+        from sakilaorm.sourcecache import SourceLookups
+        from sakilaorm.rollups import RollupDelta
+        from sakilaorm.watermark import keyset_pages, load_watermark, save_watermark, get_page_size, row_watermark
+        from sakilaorm.profiles import load_profile
+        from sakilaorm.transform import RENTAL_COLUMNS, PAYMENT_COLUMNS, rental_rows, payment_rows
+        from sakilaorm.pipeline import Pipeline
+
+        with load_profile():
+            # Load natural id -> surrogate key maps for fact resolution
+            if dimension_keys is None:
+                dimension_keys = DimensionKeys().load()
+            # Inventory and address geography, reloaded where the source
+            # changed them since the caller's last sync
+            if source_lookups is None:
+                source_lookups = SourceLookups().load()
+            else:
+                reloaded = source_lookups.refresh()
+                if reloaded:
+                    print(f"Reloaded cached {', '.join(reloaded)}")
+            # Rollup changes are applied with each fact page
+            rollups = RollupDelta()
+
+            # Each table is read in keyset pages after its (last_update, pk)
+            # watermark. A page and its watermark commit together, so an
+            # interrupted sync resumes from the last committed page. Rows
+            # whose row hash shows nothing mapped changed are not written.
 
             # Sync dim_film
+            profiler.stage('dim_film')
             print("Syncing dim_film")
-            last_sync = SyncState.objects.using('default').filter(table_name='film').first()
-            last_sync_time = last_sync.last_sync_timestamp if last_sync else datetime.min
-
-            updated_films = Film.objects.using('sakila').filter(last_update__gt=last_sync_time).select_related('language')
+            films = Film.objects.using('sakila').select_related('language')
+            film_writer = BulkUpserter(
+                DimFilm, ['film_id'], ['title', 'rating', 'length', 'language', 'release_year', 'last_update'],
+            )
             film_count = 0
-            for film in updated_films:
-                DimFilm.objects.using('default').update_or_create(
-                    film_id=film.film_id,
-                    defaults={
-                        'title': film.title,
-                        'rating': film.rating,
-                        'length': film.length,
-                        'language': film.language.name,
-                        'release_year': film.release_year,
-                        'last_update': film.last_update,
-                    }
-                )
-                film_count += 1
-            print(f"  Updated {film_count} films")
+            for page in keyset_pages(films, 'film_id', load_watermark('film'), get_page_size('film')):
+                with transaction.atomic(using='default'):
+                    film_writer.extend(
+                        {
+                            'film_id': film.film_id,
+                            'title': film.title,
+                            'rating': film.rating,
+                            'length': film.length,
+                            'language': film.language.name,
+                            'release_year': film.release_year,
+                            'last_update': film.last_update,
+                        }
+                        for film in page
+                    )
+                    film_writer.flush()
+                    # Pick up the keys of films inserted by the page
+                    dimension_keys.film.refresh(film.film_id for film in page)
+                    save_watermark('film', page[-1].last_update, page[-1].film_id)
+                film_count += len(page)
+            print(f"  Synced {film_count} films: {film_writer.changes()}")
 
             # Sync dim_actor
+            profiler.stage('dim_actor')
             print("Syncing dim_actor")
-            last_sync = SyncState.objects.using('default').filter(table_name='actor').first()
-            last_sync_time = last_sync.last_sync_timestamp if last_sync else datetime.min
-
-            updated_actors = Actor.objects.using('sakila').filter(last_update__gt=last_sync_time)
+            actors = Actor.objects.using('sakila')
+            actor_writer = BulkUpserter(DimActor, ['actor_id'], ['first_name', 'last_name', 'last_update'])
             actor_count = 0
-            for actor in updated_actors:
-                DimActor.objects.using('default').update_or_create(
-                    actor_id=actor.actor_id,
-                    defaults={
-                        'first_name': actor.first_name,
-                        'last_name': actor.last_name,
-                        'last_update': actor.last_update,
-                    }
-                )
-                actor_count += 1
-            print(f"  Updated {actor_count} actors")
+            for page in keyset_pages(actors, 'actor_id', load_watermark('actor'), get_page_size('actor')):
+                with transaction.atomic(using='default'):
+                    actor_writer.extend(
+                        {
+                            'actor_id': actor.actor_id,
+                            'first_name': actor.first_name,
+                            'last_name': actor.last_name,
+                            'last_update': actor.last_update,
+                        }
+                        for actor in page
+                    )
+                    actor_writer.flush()
+                    save_watermark('actor', page[-1].last_update, page[-1].actor_id)
+                actor_count += len(page)
+            print(f"  Synced {actor_count} actors: {actor_writer.changes()}")
 
             # Sync dim_category
+            profiler.stage('dim_category')
             print("Syncing dim_category")
-            last_sync = SyncState.objects.using('default').filter(table_name='category').first()
-            last_sync_time = last_sync.last_sync_timestamp if last_sync else datetime.min
-
-            updated_categories = Category.objects.using('sakila').filter(last_update__gt=last_sync_time)
+            categories = Category.objects.using('sakila')
+            category_writer = BulkUpserter(DimCategory, ['category_id'], ['name', 'last_update'])
             category_count = 0
-            for category in updated_categories:
-                DimCategory.objects.using('default').update_or_create(
-                    category_id=category.category_id,
-                    defaults={
-                        'name': category.name,
-                        'last_update': category.last_update,
-                    }
-                )
-                category_count += 1
-            print(f"  Updated {category_count} categories")
+            for page in keyset_pages(categories, 'category_id', load_watermark('category'), get_page_size('category')):
+                with transaction.atomic(using='default'):
+                    category_writer.extend(
+                        {
+                            'category_id': category.category_id,
+                            'name': category.name,
+                            'last_update': category.last_update,
+                        }
+                        for category in page
+                    )
+                    category_writer.flush()
+                    save_watermark('category', page[-1].last_update, page[-1].category_id)
+                category_count += len(page)
+            print(f"  Synced {category_count} categories: {category_writer.changes()}")
 
             # Sync dim_store
+            profiler.stage('dim_store')
             print("Syncing dim_store")
-            last_sync = SyncState.objects.using('default').filter(table_name='store').first()
-            last_sync_time = last_sync.last_sync_timestamp if last_sync else datetime.min
-
-            updated_stores = Store.objects.using('sakila').filter(last_update__gt=last_sync_time).select_related('address__city__country')
+            stores = Store.objects.using('sakila').values_list('store_id', 'address_id', 'last_update')
+            store_writer = BulkUpserter(DimStore, ['store_id'], ['city', 'country', 'last_update'])
             store_count = 0
-            for store in updated_stores:
-                DimStore.objects.using('default').update_or_create(
-                    store_id=store.store_id,
-                    defaults={
-                        'city': store.address.city.city,
-                        'country': store.address.city.country.country,
-                        'last_update': store.last_update,
-                    }
-                )
-                store_count += 1
-            print(f"  Updated {store_count} stores")
+            for page in keyset_pages(stores, 'store_id', load_watermark('store'), get_page_size('store')):
+                with transaction.atomic(using='default'):
+                    for store_id, address_id, last_update in page:
+                        city, country = source_lookups.place(address_id)
+                        store_writer.add(store_id=store_id, city=city, country=country, last_update=last_update)
+                    store_writer.flush()
+                    dimension_keys.store.refresh(store[0] for store in page)
+                    save_watermark('store', *row_watermark(page[-1], 'store_id'))
+                store_count += len(page)
+            print(f"  Synced {store_count} stores: {store_writer.changes()}")
 
             # Sync dim_customer
+            profiler.stage('dim_customer')
             print("Syncing dim_customer")
-            last_sync = SyncState.objects.using('default').filter(table_name='customer').first()
-            last_sync_time = last_sync.last_sync_timestamp if last_sync else datetime.min
-
-            updated_customers = Customer.objects.using('sakila').filter(last_update__gt=last_sync_time).select_related('address__city__country')
+            customers = Customer.objects.using('sakila').values_list(
+                'customer_id', 'first_name', 'last_name', 'active', 'address_id', 'last_update',
+            )
+            customer_writer = BulkUpserter(
+                DimCustomer, ['customer_id'], ['first_name', 'last_name', 'active', 'city', 'country', 'last_update'],
+            )
             customer_count = 0
-            for customer in updated_customers:
-                DimCustomer.objects.using('default').update_or_create(
-                    customer_id=customer.customer_id,
-                    defaults={
-                        'first_name': customer.first_name,
-                        'last_name': customer.last_name,
-                        'active': customer.active,
-                        'city': customer.address.city.city,
-                        'country': customer.address.city.country.country,
-                        'last_update': customer.last_update,
-                    }
-                )
-                customer_count += 1
-            print(f"  Updated {customer_count} customers")
-
-            # Sync fact_rental (using rental_date as timestamp)
+            for page in keyset_pages(customers, 'customer_id', load_watermark('customer'), get_page_size('customer')):
+                with transaction.atomic(using='default'):
+                    for customer_id, first_name, last_name, active, address_id, last_update in page:
+                        city, country = source_lookups.place(address_id)
+                        customer_writer.add(
+                            customer_id=customer_id,
+                            first_name=first_name,
+                            last_name=last_name,
+                            active=active,
+                            city=city,
+                            country=country,
+                            last_update=last_update,
+                        )
+                    customer_writer.flush()
+                    dimension_keys.customer.refresh(customer[0] for customer in page)
+                    save_watermark('customer', *row_watermark(page[-1], 'customer_id'))
+                customer_count += len(page)
+            print(f"  Synced {customer_count} customers: {customer_writer.changes()}")
+
+            # Sync fact_rental
+            profiler.stage('fact_rental')
             print("Syncing fact_rental")
-            last_sync = SyncState.objects.using('default').filter(table_name='rental').first()
-            last_sync_time = last_sync.last_sync_timestamp if last_sync else datetime.min
-
-            # Get new/updated rentals
-            updated_rentals = Rental.objects.using('sakila').filter(
-                rental_date__gt=last_sync_time
-            ).select_related('inventory__film', 'inventory__store', 'customer')
-
+            rentals = Rental.objects.using('sakila').values_list(*RENTAL_COLUMNS)
+            rental_writer = BulkUpserter(
+                FactRental, ['rental_id'],
+                ['date_key_rented', 'date_key_returned', 'film_key', 'store_key',
+                 'customer_key', 'staff_id', 'rental_duration_days'],
+            )
             rental_count = 0
-            new_dates = set()
-
-            for rental in updated_rentals:
-                # Collect dates for dim_date
-                if rental.rental_date:
-                    new_dates.add(rental.rental_date.date())
-                if rental.return_date:
-                    new_dates.add(rental.return_date.date())
-
-                # Get dimension keys
-                film_dim = DimFilm.objects.using('default').filter(film_id=rental.inventory.film_id).first()
-                store_dim = DimStore.objects.using('default').filter(store_id=rental.inventory.store_id).first()
-                customer_dim = DimCustomer.objects.using('default').filter(customer_id=rental.customer_id).first()
-
-                if film_dim and store_dim and customer_dim:
-                    FactRental.objects.using('default').update_or_create(
-                        rental_id=rental.rental_id,
-                        defaults={
-                            'date_key_rented': get_date_key(rental.rental_date),
-                            'date_key_returned': get_date_key(rental.return_date),
-                            'film_key': film_dim.film_key,
-                            'store_key': store_dim.store_key,
-                            'customer_key': customer_dim.customer_key,
-                            'staff_id': rental.staff_id,
-                            'rental_duration_days': calculate_rental_duration(rental.rental_date, rental.return_date),
-                        }
-                    )
-                    rental_count += 1
-
-            # Add new dates to dim_date
-            for dt in new_dates:
-                date_key = get_date_key(dt)
-                DimDate.objects.using('default').update_or_create(
-                    date_key=date_key,
-                    defaults={
-                        'date': dt,
-                        'year': dt.year,
-                        'quarter': (dt.month - 1) // 3 + 1,
-                        'month': dt.month,
-                        'day_of_month': dt.day,
-                        'day_of_week': dt.weekday(),
-                        'is_weekend': 1 if dt.weekday() >= 5 else 0,
-                    }
+            new_date_count = 0
+
+            # Pages are fetched, transformed and written concurrently;
+            # each page and its watermark still commit together
+            def transform_rentals(page):
+                # Track the date range dim_date has to cover
+                dates = [dt for rental in page for dt in rental[1:3] if dt]
+                # Inventory added since the lookups were loaded
+                source_lookups.inventory.include(rental[3] for rental in page)
+                rows = rental_rows(
+                    page, dimension_keys.film, dimension_keys.store, dimension_keys.customer,
+                    source_lookups.inventory,
                 )
-
-            print(f"  Updated {rental_count} rentals, added {len(new_dates)} new dates")
-
-            # Sync fact_payment (using payment_date as timestamp)
+                return page, rows, min(dates, default=None), max(dates, default=None)
+
+            def load_rentals(transformed):
+                nonlocal rental_count, new_date_count
+                page, rows, first_rented, last_rented = transformed
+                with transaction.atomic(using='default'):
+                    previous = rollups.previous_rentals([rental[0] for rental in page])
+                    for row in rows:
+                        # Replace the rental's old rollup contribution; for
+                        # an unchanged rental the two cancel out
+                        rental_id = row['rental_id']
+                        if rental_id in previous:
+                            rollups.add_rental(*previous[rental_id], sign=-1)
+                        rollups.add_rental(row['store_key'], row['date_key_rented'], row['film_key'])
+                    rental_writer.extend(rows)
+                    rental_writer.flush()
+                    rental_count += len(rows)
+
+                    rollups.apply()
+
+                    # Append any missing days to dim_date
+                    new_date_count += extend_dim_date(first_rented, last_rented)
+                    save_watermark('rental', *row_watermark(page[-1], 'rental_id'))
+
+            rental_pipeline = Pipeline(
+                keyset_pages(rentals, 'rental_id', load_watermark('rental'), get_page_size('rental')),
+                transform_rentals,
+                load_rentals,
+                threaded=pipeline,
+            ).run()
+
+            print(f"  Synced {rental_count} rentals: {rental_writer.changes()}, added {new_date_count} new dates")
+            print(f"  Pipeline: {rental_pipeline.summary()}")
+
+            # Sync fact_payment
+            profiler.stage('fact_payment')
             print("Syncing fact_payment")
-            last_sync = SyncState.objects.using('default').filter(table_name='payment').first()
-            last_sync_time = last_sync.last_sync_timestamp if last_sync else datetime.min
-
-            updated_payments = Payment.objects.using('sakila').filter(
-                payment_date__gt=last_sync_time
-            ).select_related('customer', 'rental__inventory__store')
-
+            payments = Payment.objects.using('sakila').values_list(*PAYMENT_COLUMNS)
+            payment_writer = BulkUpserter(
+                FactPayment, ['payment_id'], ['date_key_paid', 'customer_key', 'store_key', 'staff_id', 'amount'],
+            )
             payment_count = 0
-            new_dates_payment = set()
-
-            for payment in updated_payments:
-                # Collect dates for dim_date
-                if payment.payment_date:
-                    new_dates_payment.add(payment.payment_date.date())
-
-                # Get dimension keys
-                customer_dim = DimCustomer.objects.using('default').filter(customer_id=payment.customer_id).first()
-                store_dim = None
-                if payment.rental and payment.rental.inventory:
-                    store_dim = DimStore.objects.using('default').filter(store_id=payment.rental.inventory.store_id).first()
-
-                if customer_dim and store_dim:
-                    FactPayment.objects.using('default').update_or_create(
-                        payment_id=payment.payment_id,
-                        defaults={
-                            'date_key_paid': get_date_key(payment.payment_date),
-                            'customer_key': customer_dim.customer_key,
-                            'store_key': store_dim.store_key,
-                            'staff_id': payment.staff_id,
-                            'amount': payment.amount,
-                        }
-                    )
-                    payment_count += 1
-
-            # Add new dates to dim_date
-            for dt in new_dates_payment:
-                date_key = get_date_key(dt)
-                DimDate.objects.using('default').update_or_create(
-                    date_key=date_key,
-                    defaults={
-                        'date': dt,
-                        'year': dt.year,
-                        'quarter': (dt.month - 1) // 3 + 1,
-                        'month': dt.month,
-                        'day_of_month': dt.day,
-                        'day_of_week': dt.weekday(),
-                        'is_weekend': 1 if dt.weekday() >= 5 else 0,
-                    }
-                )
-
-            print(f"  Updated {payment_count} payments, added {len(new_dates_payment)} new dates")
-
-            # Update sync_state for all tables
-            print("Updating sync state")
-            for table_name in ['film', 'actor', 'category', 'store', 'customer', 'rental', 'payment']:
-                SyncState.objects.using('default').update_or_create(
-                    table_name=table_name,
-                    defaults={'last_sync_timestamp': current_time}
-                )
+            new_date_count = 0
+
+            def transform_payments(page):
+                # Track the date range dim_date has to cover
+                dates = [payment[1] for payment in page if payment[1]]
+                source_lookups.inventory.include(payment[3] for payment in page)
+                rows = payment_rows(page, dimension_keys.customer, dimension_keys.store, source_lookups.inventory)
+                return page, rows, min(dates, default=None), max(dates, default=None)
+
+            def load_payments(transformed):
+                nonlocal payment_count, new_date_count
+                page, rows, first_paid, last_paid = transformed
+                with transaction.atomic(using='default'):
+                    previous = rollups.previous_payments([payment[0] for payment in page])
+                    for row in rows:
+                        # Replace the payment's old rollup contribution
+                        payment_id = row['payment_id']
+                        if payment_id in previous:
+                            rollups.add_payment(*previous[payment_id], sign=-1)
+                        rollups.add_payment(row['store_key'], row['date_key_paid'], row['amount'])
+                    payment_writer.extend(rows)
+                    payment_writer.flush()
+                    payment_count += len(rows)
+
+                    rollups.apply()
+
+                    # Append any missing days to dim_date
+                    new_date_count += extend_dim_date(first_paid, last_paid)
+                    save_watermark('payment', *row_watermark(page[-1], 'payment_id'))
+
+            payment_pipeline = Pipeline(
+                keyset_pages(payments, 'payment_id', load_watermark('payment'), get_page_size('payment')),
+                transform_payments,
+                load_payments,
+                threaded=pipeline,
+            ).run()
+
+            print(f"  Synced {payment_count} payments: {payment_writer.changes()}, added {new_date_count} new dates")
+            print(f"  Pipeline: {payment_pipeline.summary()}")
+            print(f"  Key cache: {dimension_keys.summary()}")
+            print(f"  Source lookups: {source_lookups.summary()}")
 
         print("Incremental sync completed successfully!")
+        return film_count + actor_count + category_count + store_count + customer_count + rental_count + payment_count
 
     except Exception as e:
         print(f"Error during incremental sync: {e}")
         import traceback
         traceback.print_exc()
+        if not exit_on_error:
+            raise
         sys.exit(1)
+    finally:
+        profiler.report()
 
 
-def validate_command():
+def validate_command(deep=False, profile=False):
     """Verify data consistency between MySQL and SQLite"""
     print("Validating data consistency between Sakila and analytics db")
+    from sakilaorm.profiling import start_profile
+    profiler = start_profile('validate', profile)
 
     try:
-        from django.db.models import Sum, Count
-        from sakilaorm.models import (
-            # Source models
-            Film, Actor, Category, Store, Customer, Rental, Payment,
-            # Analytics models
-            DimFilm, DimActor, DimCategory, DimStore, DimCustomer,
-            FactRental, FactPayment
-        )
-        from datetime import datetime, timedelta
-        from django.utils import timezone
+        from sakilaorm.checksum import table_checks, find_divergent_rows
+        from sakilaorm.validation import collect_validation_totals
 
         validation_errors = []
         validation_warnings = []
@@ -577,64 +772,36 @@ def validate_command():
         print("Validating all data")
         print()
 
+        # One aggregate statement per database and table group, with the
+        # source and target sides running concurrently
+        profiler.stage('totals')
+        totals = collect_validation_totals()
+        source, target = totals['sakila'], totals['default']
+
+        profiler.stage('checks')
+
         # Validate dimensions
         print("Validating dimensions")
-
-        # Validate films
-        source_film_count = Film.objects.using('sakila').count()
-        target_film_count = DimFilm.objects.using('default').count()
-        print(f"  Films: Source={source_film_count}, Target={target_film_count}")
-        if source_film_count != target_film_count:
-            validation_warnings.append(f"Film count mismatch: {source_film_count} vs {target_film_count}")
-
-        # Validate actors
-        source_actor_count = Actor.objects.using('sakila').count()
-        target_actor_count = DimActor.objects.using('default').count()
-        print(f"  Actors: Source={source_actor_count}, Target={target_actor_count}")
-        if source_actor_count != target_actor_count:
-            validation_warnings.append(f"Actor count mismatch: {source_actor_count} vs {target_actor_count}")
-
-        # Validate categories
-        source_category_count = Category.objects.using('sakila').count()
-        target_category_count = DimCategory.objects.using('default').count()
-        print(f"  Categories: Source={source_category_count}, Target={target_category_count}")
-        if source_category_count != target_category_count:
-            validation_warnings.append(f"Category count mismatch: {source_category_count} vs {target_category_count}")
-
-        # Validate stores
-        source_store_count = Store.objects.using('sakila').count()
-        target_store_count = DimStore.objects.using('default').count()
-        print(f"  Stores: Source={source_store_count}, Target={target_store_count}")
-        if source_store_count != target_store_count:
-            validation_warnings.append(f"Store count mismatch: {source_store_count} vs {target_store_count}")
-
-        # Validate customers
-        source_customer_count = Customer.objects.using('sakila').count()
-        target_customer_count = DimCustomer.objects.using('default').count()
-        print(f"  Customers: Source={source_customer_count}, Target={target_customer_count}")
-        if source_customer_count != target_customer_count:
-            validation_warnings.append(f"Customer count mismatch: {source_customer_count} vs {target_customer_count}")
+        for key, label in [('film', 'Film'), ('actor', 'Actor'), ('category', 'Category'),
+                           ('store', 'Store'), ('customer', 'Customer')]:
+            source_count, target_count = source[key], target[key]
+            plural = 'Categories' if key == 'category' else f"{label}s"
+            print(f"  {plural}: Source={source_count}, Target={target_count}")
+            if source_count != target_count:
+                validation_warnings.append(f"{label} count mismatch: {source_count} vs {target_count}")
 
         print()
         print("Validating facts")
 
-        # Validate rentals
-        source_rental_count = Rental.objects.using('sakila').count()
-        target_rental_count = FactRental.objects.using('default').count()
-        print(f"  Rentals: Source={source_rental_count}, Target={target_rental_count}")
-        if abs(source_rental_count - target_rental_count) > 0:
-            validation_warnings.append(f"Rental count difference: {source_rental_count} vs {target_rental_count}")
-
-        # Validate payments
-        source_payment_count = Payment.objects.using('sakila').count()
-        target_payment_count = FactPayment.objects.using('default').count()
-        print(f"  Payments: Source={source_payment_count}, Target={target_payment_count}")
-        if abs(source_payment_count - target_payment_count) > 0:
-            validation_warnings.append(f"Payment count difference: {source_payment_count} vs {target_payment_count}")
+        for key, label in [('rental', 'Rental'), ('payment', 'Payment')]:
+            source_count, target_count = source[key], target[key]
+            print(f"  {label}s: Source={source_count}, Target={target_count}")
+            if abs(source_count - target_count) > 0:
+                validation_warnings.append(f"{label} count difference: {source_count} vs {target_count}")
 
         # Validate payment totals
-        source_payment_total = Payment.objects.using('sakila').aggregate(total=Sum('amount'))['total'] or 0
-        target_payment_total = FactPayment.objects.using('default').aggregate(total=Sum('amount'))['total'] or 0
+        source_payment_total = source['payment_total'] or 0
+        target_payment_total = target['payment_total'] or 0
 
         print(f"  Payment totals: Source=${source_payment_total:.2f}, Target=${target_payment_total:.2f}")
 
@@ -644,33 +811,43 @@ def validate_command():
                 f"Payment total mismatch: ${source_payment_total:.2f} vs ${target_payment_total:.2f}"
             )
 
+        # The rollups must add up to the facts they summarize
+        print(f"  Rollup rentals: {target['rollup_rentals']}, Rollup revenue: ${target['rollup_revenue'] or 0:.2f}")
+        if target['rollup_rentals'] != target['rental']:
+            validation_errors.append(
+                f"agg_store_day rentals {target['rollup_rentals']} vs {target['rental']} in fact_rental"
+            )
+        if abs(float(target['rollup_revenue'] or 0) - float(target_payment_total)) > 0.01:
+            validation_errors.append(
+                f"agg_store_day revenue ${target['rollup_revenue'] or 0:.2f} vs ${target_payment_total:.2f} in fact_payment"
+            )
+
         # Check for duplicates in analytics
         print()
         print("Checking for duplicates")
 
-        duplicate_films = DimFilm.objects.using('default').values('film_id').annotate(
-            count=Count('film_id')
-        ).filter(count__gt=1)
-        if duplicate_films.exists():
-            validation_errors.append(f"Found {duplicate_films.count()} duplicate film_ids in dim_film")
-        else:
-            print("  No duplicate films found")
-
-        duplicate_rentals = FactRental.objects.using('default').values('rental_id').annotate(
-            count=Count('rental_id')
-        ).filter(count__gt=1)
-        if duplicate_rentals.exists():
-            validation_errors.append(f"Found {duplicate_rentals.count()} duplicate rental_ids in fact_rental")
-        else:
-            print("  No duplicate rentals found")
-
-        duplicate_payments = FactPayment.objects.using('default').values('payment_id').annotate(
-            count=Count('payment_id')
-        ).filter(count__gt=1)
-        if duplicate_payments.exists():
-            validation_errors.append(f"Found {duplicate_payments.count()} duplicate payment_ids in fact_payment")
-        else:
-            print("  No duplicate payments found")
+        for key, label, column, table in [
+            ('duplicate_films', 'films', 'film_id', 'dim_film'),
+            ('duplicate_rentals', 'rentals', 'rental_id', 'fact_rental'),
+            ('duplicate_payments', 'payments', 'payment_id', 'fact_payment'),
+        ]:
+            if target[key]:
+                validation_errors.append(f"Found {target[key]} duplicate {column}s in {table}")
+            else:
+                print(f"  No duplicate {label} found")
+
+        if deep:
+            # Compare per-chunk row hashes and bisect down to divergent rows
+            print()
+            print("Comparing row checksums")
+            profiler.stage('checksums')
+            for check in table_checks():
+                divergent, chunks = find_divergent_rows(check)
+                print(f"  {check.name}: {len(divergent)} divergent rows ({chunks} chunks compared)")
+                if divergent:
+                    shown = ", ".join(str(pk) for pk in divergent[:20])
+                    more = f" and {len(divergent) - 20} more" if len(divergent) > 20 else ""
+                    validation_errors.append(f"{check.name} differ at ids {shown}{more}")
 
         # Summary
         print()
@@ -702,6 +879,139 @@ def validate_command():
         import traceback
         traceback.print_exc()
         sys.exit(1)
+    finally:
+        profiler.report()
+
+
+def export_columnar_command(directory=None, rebuild=False):
+    """Export the fact tables as memory-mappable column files"""
+    print("Exporting fact tables to columnar files")
+
+    try:
+        from sakilaorm.columnar import COLUMNAR_TABLES, export_table, get_export_directory
+
+        directory = directory or get_export_directory()
+        for table in COLUMNAR_TABLES:
+            written, total, rebuilt = export_table(directory, table, rebuild=rebuild)
+            action = "Wrote" if rebuilt else "Appended"
+            print(f"  {table}: {action} {written} rows, {total} rows in export")
+
+        print(f"Columnar export written to {directory}")
+
+    except Exception as e:
+        print(f"Error during columnar export: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+def sync_daemon_command(interval=None, adaptive=False):
+    """Run incremental syncs until stopped, reusing connections and key caches"""
+    print("Starting sync daemon")
+
+    try:
+        from django.db import connections
+        from sakilaorm.daemon import SyncDaemon
+        from sakilaorm.sourcecache import SourceLookups
+
+        # Kept across cycles and refreshed as the source tables change
+        source_lookups = SourceLookups().load()
+
+        # Stages run inline so each cycle reuses the persistent source
+        # connections instead of opening new ones on stage threads
+        daemon = SyncDaemon(
+            lambda dimension_keys: incremental_command(
+                dimension_keys, pipeline=False, exit_on_error=False, source_lookups=source_lookups,
+            ),
+            interval=interval,
+            adaptive=adaptive,
+        )
+        daemon.install_signal_handlers()
+        if daemon.adaptive:
+            print(f"Syncing every {daemon.min_interval}s to {daemon.max_interval}s, depending on changes")
+        else:
+            print(f"Syncing every {daemon.interval}s")
+        try:
+            daemon.run()
+        finally:
+            connections.close_all()
+        if daemon.gave_up:
+            sys.exit(1)
+
+    except Exception as e:
+        print(f"Error in sync daemon: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+def add_profile_argument(parser):
+    parser.add_argument(
+        '--profile', nargs='?', const=True, default=False, metavar='FILE',
+        help='report per-stage timings, queries, rows and memory, and write them as JSON '
+             '(to FILE, or under ETL_PROFILE_DIR)',
+    )
+
+
+def parse_command_args(argv):
+    """Parse the options of a custom command"""
+    parser = argparse.ArgumentParser(prog='manage.py')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('init')
+
+    full_load = commands.add_parser('full-load')
+    full_load.add_argument(
+        '--workers', type=int, default=1,
+        help='extract fact tables with this many worker processes',
+    )
+    full_load.add_argument(
+        '--defer-indexes', action='store_true',
+        help='drop bridge and fact secondary indexes during the load and rebuild them at the end',
+    )
+    full_load.add_argument(
+        '--shadow', action='store_true',
+        help='load into staging tables and swap them in, keeping the old tables for rollback',
+    )
+    full_load.add_argument(
+        '--resume', action='store_true',
+        help='continue an interrupted full load from its last committed table and chunk',
+    )
+    add_profile_argument(full_load)
+
+    commands.add_parser('rollback')
+
+    incremental = commands.add_parser('incremental')
+    add_profile_argument(incremental)
+
+    sync_daemon = commands.add_parser('sync-daemon')
+    sync_daemon.add_argument(
+        '--interval', type=float, default=None,
+        help='seconds between syncs (default ETL_DAEMON_INTERVAL)',
+    )
+    sync_daemon.add_argument(
+        '--adaptive', action='store_true',
+        help='sync more often while changes are arriving and back off while idle',
+    )
+
+    validate = commands.add_parser('validate')
+    validate.add_argument(
+        '--deep', action='store_true',
+        help='compare chunked row checksums and locate divergent rows',
+    )
+    add_profile_argument(validate)
+
+    export_columnar = commands.add_parser('export-columnar')
+    export_columnar.add_argument(
+        '--output', default=None,
+        help='export directory (default ANALYTICS_COLUMNAR_DIR)',
+    )
+    export_columnar.add_argument(
+        '--rebuild', action='store_true',
+        help='rewrite every column instead of appending new rows',
+    )
+
+    return parser.parse_args(argv)
 
 
 def main():
@@ -715,16 +1025,39 @@ def main():
             init_command()
             return
         elif sys.argv[1] == 'full-load':
+            options = parse_command_args(sys.argv[1:])
+            django.setup()
+            full_load_command(
+                workers=options.workers,
+                defer_indexes=options.defer_indexes,
+                shadow=options.shadow,
+                profile=options.profile,
+                resume=options.resume,
+            )
+            return
+        elif sys.argv[1] == 'rollback':
             django.setup()
-            full_load_command()
+            rollback_command()
             return
         elif sys.argv[1] == 'incremental':
+            options = parse_command_args(sys.argv[1:])
             django.setup()
-            incremental_command()
+            incremental_command(profile=options.profile)
+            return
+        elif sys.argv[1] == 'sync-daemon':
+            options = parse_command_args(sys.argv[1:])
+            django.setup()
+            sync_daemon_command(interval=options.interval, adaptive=options.adaptive)
             return
         elif sys.argv[1] == 'validate':
+            options = parse_command_args(sys.argv[1:])
+            django.setup()
+            validate_command(deep=options.deep, profile=options.profile)
+            return
+        elif sys.argv[1] == 'export-columnar':
+            options = parse_command_args(sys.argv[1:])
             django.setup()
-            validate_command()
+            export_columnar_command(directory=options.output, rebuild=options.rebuild)
             return
 
     try:
@@ -0,0 +1,133 @@
+"""
+Read-side queries over the analytics db.
+
+Each function returns a list of small frozen dataclasses and is cached by
+resultcache.cached_query, so repeated calls between syncs cost one read
+of sync_state. Date bounds are inclusive dates (or datetimes).
+"""
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+from typing import Optional
+
+from django.db.models import Count, F, Sum
+
+from sakilaorm.dates import get_date_key
+from sakilaorm.models import (
+    AggStoreDay, DimCustomer, DimFilm, DimStore, FactPayment, FactRental,
+)
+from sakilaorm.resultcache import cached_query
+
+
+CENT = Decimal('0.01')
+
+# Divisor turning a YYYYMMDD date_key into the period key
+PERIODS = {
+    'day': 1,
+    'month': 100,
+    'year': 10000,
+}
+
+
+@dataclass(frozen=True)
+class FilmRentals:
+    film_id: int
+    title: str
+    rentals: int
+
+
+@dataclass(frozen=True)
+class StoreRevenue:
+    store_id: int
+    period: int  # YYYYMMDD, YYYYMM or YYYY
+    rentals: int
+    revenue: Decimal
+
+
+@dataclass(frozen=True)
+class CustomerValue:
+    customer_id: int
+    first_name: str
+    last_name: str
+    payments: int
+    lifetime_value: Decimal
+
+
+def date_key_range(queryset, field, start, end):
+    if start is not None:
+        queryset = queryset.filter(**{f"{field}__gte": get_date_key(start)})
+    if end is not None:
+        queryset = queryset.filter(**{f"{field}__lte": get_date_key(end)})
+    return queryset
+
+
+@cached_query
+def top_films_by_rentals(
+    limit: int = 10, start: Optional[date] = None, end: Optional[date] = None, using: str = 'default',
+) -> list[FilmRentals]:
+    """The most rented films, optionally between two rental dates"""
+    rentals = date_key_range(FactRental.objects.using(using), 'date_key_rented', start, end)
+    counts = list(
+        rentals.values('film_key').annotate(rentals=Count('pk')).order_by('-rentals', 'film_key')[:limit]
+    )
+    films = DimFilm.objects.using(using).in_bulk([row['film_key'] for row in counts])
+    return [
+        FilmRentals(films[row['film_key']].film_id, films[row['film_key']].title, row['rentals'])
+        for row in counts
+        if row['film_key'] in films
+    ]
+
+
+@cached_query
+def revenue_by_store(
+    period: str = 'month', start: Optional[date] = None, end: Optional[date] = None, using: str = 'default',
+) -> list[StoreRevenue]:
+    """Rentals and revenue per store and day, month or year, from agg_store_day"""
+    if period not in PERIODS:
+        raise ValueError(f"Unknown period {period!r}, expected one of {', '.join(PERIODS)}")
+    days = date_key_range(AggStoreDay.objects.using(using), 'date_key', start, end)
+    totals = (
+        days.annotate(period_key=F('date_key') / PERIODS[period])
+        .values('store_key', 'period_key')
+        .annotate(rentals=Sum('rentals'), revenue=Sum('revenue'))
+        .order_by('store_key', 'period_key')
+    )
+    store_ids = dict(DimStore.objects.using(using).values_list('store_key', 'store_id'))
+    return [
+        StoreRevenue(
+            store_ids.get(row['store_key']), row['period_key'], row['rentals'], row['revenue'].quantize(CENT),
+        )
+        for row in totals
+    ]
+
+
+@cached_query
+def customer_lifetime_value(
+    limit: Optional[int] = 10, customer_ids: Optional[tuple] = None, using: str = 'default',
+) -> list[CustomerValue]:
+    """Total paid per customer, highest first; limit=None returns everyone"""
+    payments = FactPayment.objects.using(using)
+    customers = DimCustomer.objects.using(using)
+    if customer_ids is not None:
+        customers = customers.filter(customer_id__in=customer_ids)
+        payments = payments.filter(customer_key__in=customers.values('customer_key'))
+    totals = (
+        payments.values('customer_key')
+        .annotate(payments=Count('pk'), lifetime_value=Sum('amount'))
+        .order_by('-lifetime_value', 'customer_key')
+    )
+    if limit is not None:
+        totals = totals[:limit]
+    totals = list(totals)
+    names = customers.in_bulk([row['customer_key'] for row in totals])
+    return [
+        CustomerValue(
+            names[row['customer_key']].customer_id,
+            names[row['customer_key']].first_name,
+            names[row['customer_key']].last_name,
+            row['payments'],
+            row['lifetime_value'].quantize(CENT),
+        )
+        for row in totals
+        if row['customer_key'] in names
+    ]
@@ -0,0 +1,121 @@
+"""
+Checkpoints for resumable full-loads.
+
+A full-load commits each dimension, bridge and rollup table as it
+finishes it, and each fact chunk as it is written, recording its progress
+in load_checkpoint in the same transaction. full-load --resume then skips
+the completed stages and continues the fact tables after the last primary
+key committed, rather than starting again.
+
+The source watermarks taken when the load first started are kept with the
+checkpoints, so a resumed load still hands incremental every row changed
+since then. The checkpoints are deleted in the transaction that writes
+sync_state at the end of the load.
+"""
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.utils import timezone
+
+from sakilaorm.models import LoadCheckpoint
+
+
+# Stages that commit as a unit or chunk by chunk, in load order
+STAGES = [
+    'staging_tables',
+    'dim_film', 'dim_actor', 'dim_category', 'dim_store', 'dim_customer',
+    'bridge_film_actor', 'bridge_film_category',
+    'fact_rental', 'fact_payment',
+    'rollups',
+]
+
+# Source table -> the stage that holds its watermark
+WATERMARK_STAGES = {
+    'film': 'dim_film',
+    'actor': 'dim_actor',
+    'category': 'dim_category',
+    'store': 'dim_store',
+    'customer': 'dim_customer',
+    'rental': 'fact_rental',
+    'payment': 'fact_payment',
+}
+
+
+class LoadProgress:
+    def __init__(self, shadow=False, using='default'):
+        self.shadow = shadow
+        self.using = using
+        self.checkpoints = {}
+
+    def objects(self):
+        return LoadCheckpoint.objects.using(self.using)
+
+    def start(self, source_watermarks, resume=False):
+        """
+        Pick up the unfinished load if resume is set and there is one, or
+        else record a new one. Returns whether it is resuming.
+        """
+        checkpoints = {checkpoint.stage: checkpoint for checkpoint in self.objects()}
+        if resume and checkpoints:
+            shadows = {checkpoint.shadow for checkpoint in checkpoints.values()}
+            if shadows != {self.shadow}:
+                flag = 'with' if True in shadows else 'without'
+                raise RuntimeError(f"The unfinished load ran {flag} --shadow; resume it the same way")
+            self.checkpoints = checkpoints
+            return True
+
+        now = timezone.now()
+        watermarks = {WATERMARK_STAGES[table]: watermark for table, watermark in source_watermarks.items()}
+        with transaction.atomic(using=self.using):
+            self.objects().all().delete()
+            self.objects().bulk_create([
+                LoadCheckpoint(
+                    stage=stage,
+                    source_last_update=watermarks.get(stage, (None, None))[0],
+                    source_last_pk=watermarks.get(stage, (None, None))[1],
+                    shadow=self.shadow,
+                    updated_at=now,
+                )
+                for stage in STAGES
+            ])
+        self.checkpoints = {checkpoint.stage: checkpoint for checkpoint in self.objects()}
+        return False
+
+    def completed(self, stage):
+        return self.checkpoints[stage].completed
+
+    def last_pk(self, stage):
+        """Primary key of the last source row committed for a chunked stage, or None"""
+        return self.checkpoints[stage].last_pk
+
+    def save(self, stage, last_pk=None, completed=False):
+        """Record progress; call inside the transaction that wrote it"""
+        checkpoint = self.checkpoints[stage]
+        if last_pk is not None:
+            checkpoint.last_pk = last_pk
+        checkpoint.completed = completed
+        checkpoint.updated_at = timezone.now()
+        checkpoint.save(using=self.using, update_fields=['last_pk', 'completed', 'updated_at'])
+
+    @contextmanager
+    def stage(self, stage):
+        """Commit everything written in the block as a completed stage"""
+        with transaction.atomic(using=self.using):
+            yield
+            self.save(stage, completed=True)
+
+    def chunk_saver(self, stage, pk_field):
+        """A BulkUpserter checkpoint callback recording the last row of each chunk"""
+        return lambda row: self.save(stage, last_pk=getattr(row, pk_field))
+
+    def source_watermarks(self):
+        """The source watermarks from when the load first started"""
+        return {
+            table: (self.checkpoints[stage].source_last_update, self.checkpoints[stage].source_last_pk)
+            for table, stage in WATERMARK_STAGES.items()
+        }
+
+    def finish(self):
+        """Drop the checkpoints; call inside the transaction that ends the load"""
+        self.objects().all().delete()
+        self.checkpoints = {}
@@ -0,0 +1,272 @@
+"""
+Chunked checksum comparison between the Sakila source and the analytics db.
+
+Each table is described once as a row expression on both sides built from
+columns that survive the ETL unchanged (natural ids, date keys, amounts in
+cents). Rows are hashed with CRC32 and folded per primary key bucket with
+BIT_XOR, so only (bucket, count, hash) triples cross the wire. Buckets
+that disagree are split again until they are small enough to compare
+row hashes and name the divergent ids.
+"""
+import zlib
+from dataclasses import dataclass
+
+from django.db import connections
+
+
+NULL_MARKER = '~'
+DEFAULT_FANOUT = 64
+DEFAULT_LEAF_SIZE = 256
+
+
+def crc32(value):
+    if value is None:
+        return None
+    return zlib.crc32(value.encode('utf-8'))
+
+
+def days_between(vendor, start, end):
+    """
+    Whole 24-hour days from start to end, floored like timedelta.days, as
+    SQL for vendor. Percent signs are doubled for a parameterized statement.
+    """
+    if vendor == 'mysql':
+        # TIMESTAMPDIFF(DAY, ...) rounds toward zero, and FLOOR of the
+        # DECIMAL quotient is a DECIMAL
+        return f"CAST(FLOOR(TIMESTAMPDIFF(SECOND, {start}, {end}) / 86400) AS SIGNED)"
+    # So does SQLite's integer division
+    days = f"((CAST(strftime('%%s', {end}) AS INTEGER) - CAST(strftime('%%s', {start}) AS INTEGER)) / 86400.0)"
+    return f"(CAST({days} AS INTEGER) - ({days} < CAST({days} AS INTEGER)))"
+
+
+class BitXor:
+    """SQLite aggregate matching MySQL's BIT_XOR"""
+
+    def __init__(self):
+        self.value = 0
+
+    def step(self, value):
+        if value is not None:
+            self.value ^= value
+
+    def finalize(self):
+        return self.value
+
+
+class Dialect:
+    """SQL fragments that hash and bucket rows the same way on MySQL and SQLite"""
+
+    def __init__(self, alias):
+        self.connection = connections[alias]
+        self.vendor = self.connection.vendor
+
+    def prepare(self):
+        if self.vendor == 'sqlite':
+            self.connection.ensure_connection()
+            raw = self.connection.connection
+            raw.create_function('crc32', 1, crc32, deterministic=True)
+            raw.create_aggregate('bit_xor', 1, BitXor)
+
+    def text(self, expr):
+        cast = 'CHAR' if self.vendor == 'mysql' else 'TEXT'
+        return f"COALESCE(CAST({expr} AS {cast}), '{NULL_MARKER}')"
+
+    def concat(self, exprs):
+        parts = [self.text(expr) for expr in exprs]
+        if self.vendor == 'mysql':
+            return f"CONCAT_WS('|', {', '.join(parts)})"
+        return " || '|' || ".join(parts)
+
+    def date_key(self, expr):
+        if self.vendor == 'mysql':
+            return f"(DATE_FORMAT({expr}, '%%Y%%m%%d') + 0)"
+        return f"CAST(strftime('%%Y%%m%%d', {expr}) AS INTEGER)"
+
+    def days_between(self, start, end):
+        return days_between(self.vendor, start, end)
+
+    def cents(self, expr):
+        integer = 'SIGNED' if self.vendor == 'mysql' else 'INTEGER'
+        return f"CAST(ROUND({expr} * 100) AS {integer})"
+
+    def bucket(self, pk):
+        if self.vendor == 'mysql':
+            return f"(({pk} - %s) DIV %s)"
+        return f"(({pk} - %s) / %s)"
+
+    def row_hash(self, columns):
+        return f"CRC32({self.concat(columns)})"
+
+
+@dataclass
+class Side:
+    """One side of a table comparison"""
+    alias: str
+    from_clause: str
+    pk: str
+    columns: list
+
+    def __post_init__(self):
+        self.dialect = Dialect(self.alias)
+
+    def resolve(self):
+        # Column entries may be callables that need the dialect
+        return [column(self.dialect) if callable(column) else column for column in self.columns]
+
+    def execute(self, sql, params):
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def bounds(self):
+        row = self.execute(f"SELECT MIN({self.pk}), MAX({self.pk}) FROM {self.from_clause}", [])
+        return row[0]
+
+    def bucket_hashes(self, low, high, step):
+        """Return {bucket: (row count, xor of row hashes)} for low <= pk < high"""
+        bucket = self.dialect.bucket(self.pk)
+        sql = (
+            f"SELECT {bucket} AS bucket, COUNT(*), BIT_XOR({self.dialect.row_hash(self.resolve())}) "
+            f"FROM {self.from_clause} "
+            f"WHERE {self.pk} >= %s AND {self.pk} < %s "
+            f"GROUP BY bucket"
+        )
+        rows = self.execute(sql, [low, step, low, high])
+        return {int(b): (count, int(value or 0)) for b, count, value in rows}
+
+    def row_hashes(self, low, high):
+        """Return {pk: row hash} for low <= pk < high"""
+        sql = (
+            f"SELECT {self.pk}, {self.dialect.row_hash(self.resolve())} "
+            f"FROM {self.from_clause} "
+            f"WHERE {self.pk} >= %s AND {self.pk} < %s"
+        )
+        return {pk: int(value) for pk, value in self.execute(sql, [low, high])}
+
+
+@dataclass
+class TableCheck:
+    name: str
+    source: Side
+    target: Side
+
+
+def table_checks():
+    """Source/target row definitions for every dimension and fact"""
+    return [
+        TableCheck(
+            'Films',
+            Side('sakila', "film f JOIN language l ON l.language_id = f.language_id", 'f.film_id',
+                 ['f.film_id', 'f.title', 'f.rating', 'f.length', 'l.name', 'f.release_year']),
+            Side('default', "dim_film", 'film_id',
+                 ['film_id', 'title', 'rating', 'length', 'language', 'release_year']),
+        ),
+        TableCheck(
+            'Actors',
+            Side('sakila', "actor", 'actor_id', ['actor_id', 'first_name', 'last_name']),
+            Side('default', "dim_actor", 'actor_id', ['actor_id', 'first_name', 'last_name']),
+        ),
+        TableCheck(
+            'Categories',
+            Side('sakila', "category", 'category_id', ['category_id', 'name']),
+            Side('default', "dim_category", 'category_id', ['category_id', 'name']),
+        ),
+        TableCheck(
+            'Stores',
+            Side('sakila',
+                 "store s JOIN address a ON a.address_id = s.address_id "
+                 "JOIN city ci ON ci.city_id = a.city_id "
+                 "JOIN country co ON co.country_id = ci.country_id",
+                 's.store_id', ['s.store_id', 'ci.city', 'co.country']),
+            Side('default', "dim_store", 'store_id', ['store_id', 'city', 'country']),
+        ),
+        TableCheck(
+            'Customers',
+            Side('sakila',
+                 "customer cu JOIN address a ON a.address_id = cu.address_id "
+                 "JOIN city ci ON ci.city_id = a.city_id "
+                 "JOIN country co ON co.country_id = ci.country_id",
+                 'cu.customer_id',
+                 ['cu.customer_id', 'cu.first_name', 'cu.last_name', 'cu.active', 'ci.city', 'co.country']),
+            Side('default', "dim_customer", 'customer_id',
+                 ['customer_id', 'first_name', 'last_name', 'active', 'city', 'country']),
+        ),
+        TableCheck(
+            'Rentals',
+            Side('sakila', "rental r JOIN inventory i ON i.inventory_id = r.inventory_id", 'r.rental_id', [
+                'r.rental_id',
+                lambda d: d.date_key('r.rental_date'),
+                lambda d: d.date_key('r.return_date'),
+                'i.film_id', 'i.store_id', 'r.customer_id', 'r.staff_id',
+                lambda d: d.days_between('r.rental_date', 'r.return_date'),
+            ]),
+            Side('default',
+                 "fact_rental fr "
+                 "LEFT JOIN dim_film df ON df.film_key = fr.film_key "
+                 "LEFT JOIN dim_store ds ON ds.store_key = fr.store_key "
+                 "LEFT JOIN dim_customer dc ON dc.customer_key = fr.customer_key",
+                 'fr.rental_id', [
+                     'fr.rental_id', 'fr.date_key_rented', 'fr.date_key_returned',
+                     'df.film_id', 'ds.store_id', 'dc.customer_id', 'fr.staff_id', 'fr.rental_duration_days',
+                 ]),
+        ),
+        TableCheck(
+            'Payments',
+            Side('sakila',
+                 "payment p LEFT JOIN rental r ON r.rental_id = p.rental_id "
+                 "LEFT JOIN inventory i ON i.inventory_id = r.inventory_id",
+                 'p.payment_id', [
+                     'p.payment_id',
+                     lambda d: d.date_key('p.payment_date'),
+                     'p.customer_id', 'i.store_id', 'p.staff_id',
+                     lambda d: d.cents('p.amount'),
+                 ]),
+            Side('default',
+                 "fact_payment fp "
+                 "LEFT JOIN dim_customer dc ON dc.customer_key = fp.customer_key "
+                 "LEFT JOIN dim_store ds ON ds.store_key = fp.store_key",
+                 'fp.payment_id', [
+                     'fp.payment_id', 'fp.date_key_paid', 'dc.customer_id', 'ds.store_id', 'fp.staff_id',
+                     lambda d: d.cents('fp.amount'),
+                 ]),
+        ),
+    ]
+
+
+def diff_rows(check, low, high):
+    """Compare row hashes in a small pk range and return the divergent ids"""
+    source = check.source.row_hashes(low, high)
+    target = check.target.row_hashes(low, high)
+    return sorted(pk for pk in source.keys() | target.keys() if source.get(pk) != target.get(pk))
+
+
+def find_divergent_rows(check, fanout=DEFAULT_FANOUT, leaf_size=DEFAULT_LEAF_SIZE):
+    """
+    Return (divergent ids, number of chunks compared) for one table by
+    recursively bisecting the primary key ranges whose hashes differ.
+    """
+    check.source.dialect.prepare()
+    check.target.dialect.prepare()
+
+    bounds = [b for b in check.source.bounds() + check.target.bounds() if b is not None]
+    if not bounds:
+        return [], 0
+
+    ranges = [(min(bounds), max(bounds) + 1)]
+    divergent = []
+    chunks = 0
+    while ranges:
+        next_ranges = []
+        for low, high in ranges:
+            if high - low <= leaf_size:
+                divergent.extend(diff_rows(check, low, high))
+                continue
+            step = -(-(high - low) // fanout)
+            source = check.source.bucket_hashes(low, high, step)
+            target = check.target.bucket_hashes(low, high, step)
+            chunks += len(source.keys() | target.keys())
+            for bucket in sorted(source.keys() | target.keys()):
+                if source.get(bucket) != target.get(bucket):
+                    next_ranges.append((low + bucket * step, min(low + (bucket + 1) * step, high)))
+        ranges = next_ranges
+    return divergent, chunks
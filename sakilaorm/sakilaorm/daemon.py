@@ -0,0 +1,157 @@
+"""
+Long-running incremental sync.
+
+SyncDaemon runs incremental syncs in one process, keeping its database
+connections and dimension key caches between cycles instead of paying for
+them on every run. Connections are checked (and reopened if dead or past
+CONN_MAX_AGE) before each cycle. The key caches are reloaded when another
+process has written to the analytics db, since a full-load or rollback
+there hands out new surrogate keys.
+
+With adaptive scheduling the interval drops to the minimum while syncs
+find changes, and doubles up to the maximum while they don't. A failed
+cycle, including one that couldn't reach the analytics db to warm the
+key caches, is logged and retried after a back-off; after too many
+failures in a row the daemon gives up. SIGTERM or SIGINT finishes the
+current cycle and exits.
+"""
+import signal
+import threading
+import time
+import traceback
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+
+DEFAULT_INTERVAL = 60
+DEFAULT_MIN_INTERVAL = 5
+DEFAULT_MAX_INTERVAL = 600
+DEFAULT_MAX_FAILURES = 10
+
+
+def get_intervals():
+    """(interval, min interval, max interval) in seconds"""
+    return (
+        getattr(settings, 'ETL_DAEMON_INTERVAL', DEFAULT_INTERVAL),
+        getattr(settings, 'ETL_DAEMON_MIN_INTERVAL', DEFAULT_MIN_INTERVAL),
+        getattr(settings, 'ETL_DAEMON_MAX_INTERVAL', DEFAULT_MAX_INTERVAL),
+    )
+
+
+def data_version(using='default'):
+    """
+    (connection, PRAGMA data_version) for a SQLite connection. The version
+    changes when another connection commits to the database file, and is
+    only comparable on the same connection.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA data_version")
+        return id(connection.connection), cursor.fetchone()[0]
+
+
+def load_dimension_keys():
+    from sakilaorm.keycache import DimensionKeys
+
+    return DimensionKeys().load()
+
+
+class SyncDaemon:
+    def __init__(
+        self, sync, interval=None, adaptive=False, min_interval=None, max_interval=None, max_failures=None,
+        recycle_connections=close_old_connections, load_keys=None,
+    ):
+        """
+        sync(dimension_keys) runs one incremental sync and returns the
+        number of rows it changed. recycle_connections() runs before each
+        cycle and after a failed one, and load_keys() builds fresh key
+        caches.
+        """
+        default_interval, default_min, default_max = get_intervals()
+        self.sync = sync
+        self.recycle_connections = recycle_connections
+        self.load_keys = load_keys or load_dimension_keys
+        self.interval = interval or default_interval
+        self.adaptive = adaptive
+        self.min_interval = min_interval or min(default_min, self.interval)
+        self.max_interval = max_interval or max(default_max, self.interval)
+        self.max_failures = max_failures or getattr(settings, 'ETL_DAEMON_MAX_FAILURES', DEFAULT_MAX_FAILURES)
+        self.stopping = threading.Event()
+        self.dimension_keys = None
+        self.seen_version = None
+        self.cycles = 0
+        self.failures = 0
+        self.failures_in_row = 0
+
+    def install_signal_handlers(self):
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, self.handle_signal)
+
+    def handle_signal(self, signum, frame):
+        print(f"Received {signal.Signals(signum).name}, stopping after the current cycle")
+        self.stopping.set()
+
+    def stop(self):
+        self.stopping.set()
+
+    @property
+    def gave_up(self):
+        return self.failures_in_row >= self.max_failures
+
+    def warm_keys(self):
+        """The key caches, reloaded if another process wrote to the analytics db"""
+        version = data_version()
+        if self.dimension_keys is None or version is None or version != self.seen_version:
+            if self.dimension_keys is not None:
+                print("Analytics db changed outside the daemon, reloading key caches")
+            self.dimension_keys = self.load_keys()
+        # Our own writes don't move data_version, so the caches stay
+        # current until someone else writes
+        self.seen_version = version
+        return self.dimension_keys
+
+    def run_cycle(self):
+        """One sync; returns the rows changed, or None if it failed"""
+        self.cycles += 1
+        started = time.perf_counter()
+        try:
+            # Drop connections that errored, died or outlived CONN_MAX_AGE
+            self.recycle_connections()
+            changed = self.sync(self.warm_keys())
+        except Exception as e:
+            self.failures += 1
+            self.failures_in_row += 1
+            print(f"Sync cycle {self.cycles} failed: {e}")
+            traceback.print_exc()
+            # Don't reuse connections or caches that may be mid-failure
+            self.dimension_keys = None
+            self.recycle_connections()
+            return None
+        self.failures_in_row = 0
+        print(f"Sync cycle {self.cycles}: {changed} rows in {time.perf_counter() - started:.2f}s")
+        return changed
+
+    def next_interval(self, interval, changed):
+        if changed is None:
+            # Back off on failures, whether or not scheduling is adaptive
+            return min(interval * 2, self.max_interval)
+        if not self.adaptive:
+            return self.interval
+        if changed:
+            return self.min_interval
+        return min(interval * 2, self.max_interval)
+
+    def run(self):
+        interval = self.interval
+        while not self.stopping.is_set():
+            changed = self.run_cycle()
+            if self.gave_up:
+                print(f"Giving up after {self.failures_in_row} failed cycles in a row")
+                break
+            interval = self.next_interval(interval, changed)
+            if self.stopping.wait(interval):
+                break
+        print(f"Sync daemon stopped after {self.cycles} cycles ({self.failures} failed)")
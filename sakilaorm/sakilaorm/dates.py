@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta
+
+from django.db.models import Max, Min
+
+from sakilaorm.models import DimDate, Payment, Rental
+
+
+def to_date(dt):
+    if isinstance(dt, datetime):
+        return dt.date()
+    return dt
+
+
+def get_date_key(dt):
+    """Return the YYYYMMDD date_key for a date or datetime"""
+    if dt is None:
+        return None
+    dt = to_date(dt)
+    return dt.year * 10000 + dt.month * 100 + dt.day
+
+
+def make_dim_date(dt, model=DimDate):
+    return model(
+        date_key=get_date_key(dt),
+        date=dt,
+        year=dt.year,
+        quarter=(dt.month - 1) // 3 + 1,
+        month=dt.month,
+        day_of_month=dt.day,
+        day_of_week=dt.weekday(),
+        is_weekend=1 if dt.weekday() >= 5 else 0,
+    )
+
+
+def calendar(start, end):
+    """Yield every date from start to end inclusive"""
+    day = start
+    while day <= end:
+        yield day
+        day += timedelta(days=1)
+
+
+def source_date_range(using='sakila'):
+    """Return the (first, last) date referenced by any rental or payment"""
+    rental_bounds = Rental.objects.using(using).aggregate(
+        min_rented=Min('rental_date'),
+        max_rented=Max('rental_date'),
+        min_returned=Min('return_date'),
+        max_returned=Max('return_date'),
+    )
+    payment_bounds = Payment.objects.using(using).aggregate(
+        min_paid=Min('payment_date'),
+        max_paid=Max('payment_date'),
+    )
+    lows = [rental_bounds['min_rented'], rental_bounds['min_returned'], payment_bounds['min_paid']]
+    highs = [rental_bounds['max_rented'], rental_bounds['max_returned'], payment_bounds['max_paid']]
+    lows = [to_date(dt) for dt in lows if dt is not None]
+    highs = [to_date(dt) for dt in highs if dt is not None]
+    if not lows:
+        return None, None
+    return min(lows), max(highs)
+
+
+def extend_dim_date(start, end, using='default', model=DimDate):
+    """
+    Make dim_date cover every day from start to end and return the number
+    of days added.
+
+    dim_date is kept as one contiguous calendar, so normally only the days
+    before its first row and after its last row are inserted. A table with
+    gaps (e.g. one loaded from distinct fact dates) is filled in once.
+    model is DimDate or the staging model of a shadow load.
+    """
+    if start is None or end is None:
+        return 0
+    start, end = to_date(start), to_date(end)
+
+    existing = model.objects.using(using).aggregate(first=Min('date'), last=Max('date'))
+    first, last = existing['first'], existing['last']
+
+    existing_keys = set()
+    if first is None:
+        missing = [(start, end)]
+    else:
+        present = model.objects.using(using).count()
+        if present == (last - first).days + 1:
+            missing = []
+            if start < first:
+                missing.append((start, first - timedelta(days=1)))
+            if end > last:
+                missing.append((last + timedelta(days=1), end))
+        else:
+            missing = [(min(start, first), max(end, last))]
+            existing_keys = set(model.objects.using(using).values_list('date_key', flat=True))
+
+    rows = [
+        make_dim_date(day, model)
+        for low, high in missing
+        for day in calendar(low, high)
+        if get_date_key(day) not in existing_keys
+    ]
+    if rows:
+        model.objects.using(using).bulk_create(rows, ignore_conflicts=True)
+    return len(rows)
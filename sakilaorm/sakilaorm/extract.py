@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.db import connections
+
+
+STREAM_ALIAS = 'sakila_stream'
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def get_chunk_size(table_name):
+    """Return the configured extraction chunk size for a source table"""
+    chunk_sizes = getattr(settings, 'ETL_EXTRACT_CHUNK_SIZES', {})
+    return chunk_sizes.get(table_name, getattr(settings, 'ETL_EXTRACT_CHUNK_SIZE', DEFAULT_CHUNK_SIZE))
+
+
+def streaming_enabled():
+    return getattr(settings, 'ETL_STREAM_EXTRACT', False) and STREAM_ALIAS in connections.settings
+
+
+def stream(queryset, table_name):
+    """
+    Iterate a source queryset chunk by chunk without caching it.
+
+    When streaming is enabled the query runs on the sakila_stream alias,
+    whose connection uses an unbuffered server-side cursor (SSCursor), so
+    rows are fetched from MySQL as they are consumed. That connection must
+    not be used for anything else while the iterator is open.
+    """
+    if streaming_enabled():
+        queryset = queryset.using(STREAM_ALIAS)
+    return queryset.iterator(chunk_size=get_chunk_size(table_name))
+
+
+def stream_chunks(queryset, table_name):
+    """Like stream(), but yield lists of up to one chunk of rows for batch transforms"""
+    chunk_size = get_chunk_size(table_name)
+    chunk = []
+    for row in stream(queryset, table_name):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,80 @@
+import time
+
+from django.db import connections
+
+from sakilaorm.models import BridgeFilmActor, BridgeFilmCategory, FactPayment, FactRental
+
+
+# Tables whose Meta.indexes can be dropped during a bulk load. Unique
+# constraints (rental_id, payment_id, the bridge key pairs) are not in
+# Meta.indexes and stay in place.
+DEFERRED_INDEX_MODELS = [FactRental, FactPayment, BridgeFilmActor, BridgeFilmCategory]
+
+
+def generation_token():
+    """Suffix that keeps index names unique across table generations"""
+    return time.strftime('%Y%m%d%H%M%S')
+
+
+def table_indexes(cursor, table):
+    """Return (name, unique, origin, columns) for every index on a SQLite table"""
+    cursor.execute(f'PRAGMA index_list("{table}")')
+    index_list = cursor.fetchall()
+    indexes = []
+    for _, name, unique, origin, _ in index_list:
+        cursor.execute(f'PRAGMA index_info("{name}")')
+        columns = tuple(row[2] for row in cursor.fetchall())
+        indexes.append((name, bool(unique), origin, columns))
+    return indexes
+
+
+def declared_index_columns(model):
+    """Column tuples of the indexes in a model's Meta.indexes"""
+    return [
+        tuple(model._meta.get_field(field.lstrip('-')).column for field in index.fields)
+        for index in model._meta.indexes
+    ]
+
+
+def drop_secondary_indexes(models=None, using='default'):
+    """Drop the declared non-unique indexes of models and return how many were dropped"""
+    dropped = 0
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        for model in models or DEFERRED_INDEX_MODELS:
+            declared = set(declared_index_columns(model))
+            for name, unique, origin, columns in table_indexes(cursor, model._meta.db_table):
+                if not unique and origin == 'c' and columns in declared:
+                    cursor.execute(f"DROP INDEX {connection.ops.quote_name(name)}")
+                    dropped += 1
+    return dropped
+
+
+def rebuild_secondary_indexes(models=None, using='default'):
+    """
+    Create any declared index of models that is missing and return
+    (number built, seconds taken). Safe to run after an interrupted load.
+
+    Indexes are matched by their columns rather than by name, and new ones
+    get a generation suffix, because SQLite index names are global and a
+    swapped-out copy of the table may still hold the old names.
+    """
+    started = time.perf_counter()
+    built = 0
+    token = generation_token()
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for model in models or DEFERRED_INDEX_MODELS:
+            table = model._meta.db_table
+            present = {columns for _, unique, _, columns in table_indexes(cursor, table) if not unique}
+            for columns in declared_index_columns(model):
+                if columns in present:
+                    continue
+                name = f"{table}_{'_'.join(columns)}_{token}"
+                cursor.execute(
+                    f"CREATE INDEX {quote(name)} ON {quote(table)} ({', '.join(quote(c) for c in columns)})"
+                )
+                present.add(columns)
+                built += 1
+    return built, time.perf_counter() - started
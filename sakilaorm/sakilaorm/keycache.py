@@ -0,0 +1,109 @@
+from collections import OrderedDict
+
+from django.conf import settings
+
+from sakilaorm.keymap import KeyMap
+from sakilaorm.models import DimCustomer, DimFilm, DimStore
+
+
+class DimensionKeyCache:
+    """
+    Natural id -> surrogate key map for one analytics dimension.
+
+    By default the whole dimension is loaded into a compact KeyMap up
+    front, so a lookup never touches the database. With max_size set the
+    cache becomes a bounded LRU dict: misses are read from the dimension
+    one row at a time and the least recently used entries are evicted.
+    """
+
+    def __init__(self, model, id_field, key_field, max_size=None, using='default'):
+        self.model = model
+        self.id_field = id_field
+        self.key_field = key_field
+        self.max_size = max_size
+        self.using = using
+        self.keys = OrderedDict() if max_size is not None else KeyMap()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def bounded(self):
+        return self.max_size is not None
+
+    def queryset(self):
+        return self.model.objects.using(self.using).values_list(self.id_field, self.key_field)
+
+    def load(self):
+        """Read the natural id -> key map from the dimension"""
+        if self.bounded:
+            self.keys.clear()
+        else:
+            self.keys = KeyMap.from_pairs(self.queryset())
+        return self
+
+    def get(self, natural_id):
+        if natural_id is None:
+            return None
+        key = self.keys.get(natural_id)
+        if key is not None:
+            self.hits += 1
+            if self.bounded:
+                self.keys.move_to_end(natural_id)
+            return key
+
+        self.misses += 1
+        if not self.bounded:
+            return None
+        row = self.queryset().filter(**{self.id_field: natural_id}).first()
+        if row is None:
+            return None
+        self.set(natural_id, row[1])
+        return row[1]
+
+    def set(self, natural_id, key):
+        """Record a key written to the dimension during this run"""
+        if not self.bounded:
+            self.keys.set(natural_id, key)
+            return
+        self.keys[natural_id] = key
+        self.keys.move_to_end(natural_id)
+        while len(self.keys) > self.max_size:
+            self.keys.popitem(last=False)
+
+    def refresh(self, natural_ids):
+        """Re-read the keys for the given natural ids in one query"""
+        natural_ids = list(natural_ids)
+        if not natural_ids:
+            return
+        for natural_id, key in self.queryset().filter(**{f'{self.id_field}__in': natural_ids}):
+            self.set(natural_id, key)
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class DimensionKeys:
+    """Key caches for the dimensions referenced by the fact tables"""
+
+    def __init__(self, using='default'):
+        max_sizes = getattr(settings, 'ETL_KEY_CACHE_MAX_SIZES', {})
+        self.film = DimensionKeyCache(
+            DimFilm, 'film_id', 'film_key', max_sizes.get('dim_film'), using
+        )
+        self.store = DimensionKeyCache(
+            DimStore, 'store_id', 'store_key', max_sizes.get('dim_store'), using
+        )
+        self.customer = DimensionKeyCache(
+            DimCustomer, 'customer_id', 'customer_key', max_sizes.get('dim_customer'), using
+        )
+
+    def load(self):
+        for cache in (self.film, self.store, self.customer):
+            cache.load()
+        return self
+
+    def summary(self):
+        return ", ".join(
+            f"{name}: {len(cache)} keys, {cache.hits} hits, {cache.misses} misses"
+            for name, cache in (('film', self.film), ('store', self.store), ('customer', self.customer))
+        )
@@ -0,0 +1,168 @@
+"""
+Compact natural id -> surrogate key maps.
+
+Sakila ids are dense auto-increment integers, so a KeyMap normally keeps
+the keys in one machine-integer array indexed by natural id less the
+smallest id, with 0 (never a surrogate key) marking ids that have none.
+When the ids are too sparse for that, it keeps sorted parallel id and key
+arrays and binary-searches them. A mapped key costs 4 to 8 bytes dense and
+8 to 16 sparse, against around 100 for a dict entry and its boxed ints.
+
+The arrays are array.array rather than numpy arrays, because indexing one
+returns a plain int in a fraction of the time; numpy is only used to
+build them.
+"""
+from array import array
+from bisect import bisect_left
+
+import numpy as np
+from django.conf import settings
+
+
+DEFAULT_MIN_DENSITY = 0.5
+MISSING = 0
+INT32_MAX = 2 ** 31 - 1
+NUMPY_TYPES = {'i': np.int32, 'q': np.int64}
+
+
+def get_min_density():
+    """Fewest mapped ids per slot of the id span for the dense layout"""
+    return getattr(settings, 'ETL_KEY_MAP_MIN_DENSITY', DEFAULT_MIN_DENSITY)
+
+
+def typecode_for(largest):
+    return 'i' if largest <= INT32_MAX else 'q'
+
+
+class KeyMap:
+    """
+    Read like a dict of natural id -> surrogate key: get(), [], in, len()
+    and items(). set() adds or changes one entry.
+    """
+
+    def __init__(self):
+        self.dense = True
+        self.offset = 0
+        # Dense: keys[natural_id - offset]. Sparse: keys[i] for ids[i]
+        self.ids = array('q')
+        self.keys = array('i')
+        self.count = 0
+
+    @classmethod
+    def from_pairs(cls, pairs, min_density=None):
+        """Build from (natural id, key) pairs, such as a values_list() queryset"""
+        ids, keys = array('q'), array('q')
+        for natural_id, key in pairs:
+            ids.append(natural_id)
+            keys.append(key)
+        return cls.from_arrays(np.frombuffer(ids, dtype=np.int64), np.frombuffer(keys, dtype=np.int64), min_density)
+
+    @classmethod
+    def from_arrays(cls, ids, keys, min_density=None):
+        key_map = cls()
+        key_map.count = len(ids)
+        if not len(ids):
+            return key_map
+        if min_density is None:
+            min_density = get_min_density()
+        typecode = typecode_for(int(keys.max()))
+        low, high = int(ids.min()), int(ids.max())
+        span = high - low + 1
+        if len(ids) >= span * min_density:
+            values = np.zeros(span, dtype=NUMPY_TYPES[typecode])
+            values[ids - low] = keys
+            key_map.offset = low
+            key_map.keys = array(typecode, values.tobytes())
+        else:
+            order = np.argsort(ids, kind='stable')
+            key_map.dense = False
+            id_typecode = typecode_for(max(high, -low))
+            key_map.ids = array(id_typecode, ids[order].astype(NUMPY_TYPES[id_typecode]).tobytes())
+            key_map.keys = array(typecode, keys[order].astype(NUMPY_TYPES[typecode]).tobytes())
+        return key_map
+
+    def position(self, natural_id):
+        """Index of natural_id in keys, or -1"""
+        if self.dense:
+            index = natural_id - self.offset
+            return index if 0 <= index < len(self.keys) and self.keys[index] != MISSING else -1
+        index = bisect_left(self.ids, natural_id)
+        return index if index < len(self.ids) and self.ids[index] == natural_id else -1
+
+    def get(self, natural_id, default=None):
+        if natural_id is None:
+            return default
+        if self.dense:
+            index = natural_id - self.offset
+            if 0 <= index < len(self.keys):
+                key = self.keys[index]
+                if key != MISSING:
+                    return key
+            return default
+        index = self.position(natural_id)
+        return self.keys[index] if index >= 0 else default
+
+    def __getitem__(self, natural_id):
+        key = self.get(natural_id)
+        if key is None:
+            raise KeyError(natural_id)
+        return key
+
+    def __contains__(self, natural_id):
+        return natural_id is not None and self.position(natural_id) >= 0
+
+    def __len__(self):
+        return self.count
+
+    def items(self):
+        if self.dense:
+            return ((self.offset + index, key) for index, key in enumerate(self.keys) if key != MISSING)
+        return zip(self.ids, self.keys)
+
+    def set(self, natural_id, key):
+        index = self.position(natural_id)
+        if index >= 0:
+            self.widen(key)
+            self.keys[index] = key
+            return
+        if self.dense and self.fits_dense(natural_id):
+            self.widen(key)
+            if not self.keys:
+                self.offset = natural_id
+            elif natural_id < self.offset:
+                self.keys[:0] = array(self.keys.typecode, bytes(self.keys.itemsize * (self.offset - natural_id)))
+                self.offset = natural_id
+            index = natural_id - self.offset
+            if index >= len(self.keys):
+                self.keys.extend(array(self.keys.typecode, bytes(self.keys.itemsize * (index + 1 - len(self.keys)))))
+            self.keys[index] = key
+        elif self.dense:
+            # Too far from the other ids to keep them dense
+            rebuilt = KeyMap.from_pairs([*self.items(), (natural_id, key)])
+            self.__dict__.update(rebuilt.__dict__)
+            return
+        else:
+            self.widen(key)
+            if self.ids.typecode == 'i' and abs(natural_id) > INT32_MAX:
+                self.ids = array('q', self.ids)
+            # New ids are usually the largest yet, which appends
+            index = bisect_left(self.ids, natural_id)
+            self.ids.insert(index, natural_id)
+            self.keys.insert(index, key)
+        self.count += 1
+
+    def fits_dense(self, natural_id):
+        if not self.keys:
+            return True
+        low = min(self.offset, natural_id)
+        high = max(self.offset + len(self.keys) - 1, natural_id)
+        return self.count + 1 >= (high - low + 1) * get_min_density()
+
+    def widen(self, key):
+        """Switch to 64-bit keys if key doesn't fit the current array"""
+        if self.keys.typecode == 'i' and key > INT32_MAX:
+            self.keys = array('q', self.keys)
+
+    @property
+    def nbytes(self):
+        return self.ids.itemsize * len(self.ids) + self.keys.itemsize * len(self.keys)
@@ -0,0 +1,153 @@
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+from sakilaorm.rowhash import RowHasher, hashed
+
+
+DEFAULT_BATCH_SIZE = 2000
+
+
+def get_batch_size(table_name):
+    """Return the configured write batch size for an analytics table"""
+    batch_sizes = getattr(settings, 'ETL_BATCH_SIZES', {})
+    return batch_sizes.get(table_name, getattr(settings, 'ETL_BATCH_SIZE', DEFAULT_BATCH_SIZE))
+
+
+class BulkUpserter:
+    """
+    Collect rows for one analytics table and write them in chunks.
+
+    Each chunk is a single multi-row INSERT ... ON CONFLICT DO UPDATE keyed
+    on unique_fields. With no update_fields the conflicting rows are left
+    alone (INSERT ... ON CONFLICT DO NOTHING), which is what the bridges need.
+    With upsert=False the chunks are plain INSERTs, for tables known to
+    start empty.
+
+    With a checkpoint callback each chunk is committed on its own, and the
+    callback is called with the chunk's last row inside that transaction.
+
+    Dimension and fact rows get a row_hash of their mapped columns. Before
+    an upsert writes a chunk, the stored hashes of its natural ids are read
+    in one query and rows that would not change are dropped; inserted,
+    updated and unchanged rows are counted. A table that is empty when the
+    first chunk is written is not compared against at all.
+    """
+
+    def __init__(
+        self, model, unique_fields, update_fields=None, batch_size=None, using='default', upsert=True,
+        checkpoint=None,
+    ):
+        self.model = model
+        self.table_name = model._meta.db_table
+        self.unique_fields = list(unique_fields)
+        self.update_fields = list(update_fields or [])
+        self.batch_size = batch_size or get_batch_size(self.table_name)
+        self.using = using
+        self.upsert = upsert
+        self.checkpoint = checkpoint
+        self.row_hash = RowHasher(model) if hashed(model) else None
+        if self.row_hash is not None and self.update_fields:
+            self.update_fields.append('row_hash')
+        # Whether the table had rows to compare with, checked on the first write
+        self.compare = None
+        self.pending = []
+        self.row_count = 0
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.elapsed = 0.0
+
+    def add(self, **values):
+        """Queue one row, flushing when the chunk is full"""
+        if self.row_hash is not None:
+            values['row_hash'] = self.row_hash(values)
+        self.pending.append(self.model(**values))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def extend(self, rows):
+        """Queue many rows, given as dicts of field values"""
+        for values in rows:
+            self.add(**values)
+
+    def flush(self):
+        """Write all queued rows in one statement"""
+        if not self.pending:
+            return
+        started = time.perf_counter()
+        if self.checkpoint is None:
+            self.write()
+        else:
+            with transaction.atomic(using=self.using):
+                self.write()
+                self.checkpoint(self.pending[-1])
+        self.elapsed += time.perf_counter() - started
+        self.row_count += len(self.pending)
+        self.pending = []
+
+    def changed_rows(self):
+        """The queued rows that are new or differ from the stored row, counting each kind"""
+        if self.row_hash is None:
+            return self.pending
+        if self.compare is None:
+            self.compare = self.upsert and self.model.objects.using(self.using).exists()
+        if not self.compare:
+            self.inserted += len(self.pending)
+            return self.pending
+
+        id_field = self.unique_fields[0]
+        stored = dict(
+            self.model.objects.using(self.using)
+            .filter(**{f'{id_field}__in': [getattr(row, id_field) for row in self.pending]})
+            .values_list(id_field, 'row_hash')
+        )
+        changed = []
+        for row in self.pending:
+            natural_id = getattr(row, id_field)
+            if natural_id not in stored:
+                self.inserted += 1
+            elif stored[natural_id] != row.row_hash:
+                self.updated += 1
+            else:
+                self.unchanged += 1
+                continue
+            changed.append(row)
+        return changed
+
+    def write(self):
+        rows = self.changed_rows()
+        if not rows:
+            return
+        manager = self.model.objects.using(self.using)
+        if not self.upsert:
+            manager.bulk_create(rows, batch_size=self.batch_size)
+        elif self.update_fields:
+            manager.bulk_create(
+                rows,
+                batch_size=self.batch_size,
+                update_conflicts=True,
+                unique_fields=self.unique_fields,
+                update_fields=self.update_fields,
+            )
+        else:
+            manager.bulk_create(rows, batch_size=self.batch_size, ignore_conflicts=True)
+
+    @property
+    def rows_per_sec(self):
+        if not self.elapsed:
+            return 0.0
+        return self.row_count / self.elapsed
+
+    def close(self):
+        """Flush the remaining rows and return the number written"""
+        self.flush()
+        return self.row_count
+
+    def changes(self):
+        return f"{self.inserted} inserted, {self.updated} updated, {self.unchanged} unchanged"
+
+    def summary(self):
+        changes = f" ({self.changes()})" if self.row_hash is not None else ""
+        return f"{self.row_count} rows{changes} in {self.elapsed:.2f}s ({self.rows_per_sec:,.0f} rows/sec)"
@@ -224,6 +224,8 @@ class DimFilm(models.Model):
     language = models.CharField(max_length=20)
     release_year = models.IntegerField(null=True, blank=True)
     last_update = models.DateTimeField()
+    # Hash of the mapped columns, see sakilaorm.rowhash
+    row_hash = models.BigIntegerField(null=True, blank=True)
 
     class Meta:
         managed = True
@@ -239,6 +241,7 @@ class DimActor(models.Model):
     first_name = models.CharField(max_length=45)
     last_name = models.CharField(max_length=45)
     last_update = models.DateTimeField()
+    row_hash = models.BigIntegerField(null=True, blank=True)
 
     class Meta:
         managed = True
@@ -253,6 +256,7 @@ class DimCategory(models.Model):
     category_id = models.IntegerField(unique=True)
     name = models.CharField(max_length=25)
     last_update = models.DateTimeField()
+    row_hash = models.BigIntegerField(null=True, blank=True)
 
     class Meta:
         managed = True
@@ -268,6 +272,7 @@ class DimStore(models.Model):
     city = models.CharField(max_length=50)
     country = models.CharField(max_length=50)
     last_update = models.DateTimeField()
+    row_hash = models.BigIntegerField(null=True, blank=True)
 
     class Meta:
         managed = True
@@ -286,6 +291,7 @@ class DimCustomer(models.Model):
     city = models.CharField(max_length=50)
     country = models.CharField(max_length=50)
     last_update = models.DateTimeField()
+    row_hash = models.BigIntegerField(null=True, blank=True)
 
     class Meta:
         managed = True
@@ -337,6 +343,7 @@ class FactRental(models.Model):
     customer_key = models.IntegerField()
     staff_id = models.IntegerField()
     rental_duration_days = models.IntegerField(null=True, blank=True)
+    row_hash = models.BigIntegerField(null=True, blank=True)
 
     class Meta:
         managed = True
@@ -358,6 +365,7 @@ class FactPayment(models.Model):
     store_key = models.IntegerField()
     staff_id = models.IntegerField()
     amount = models.DecimalField(max_digits=5, decimal_places=2)
+    row_hash = models.BigIntegerField(null=True, blank=True)
 
     class Meta:
         managed = True
@@ -370,12 +378,65 @@ class FactPayment(models.Model):
         ]
 
 
+# Rollups
+
+class AggStoreDay(models.Model):
+    # Rentals by rental date, revenue by payment date
+    store_key = models.IntegerField()
+    date_key = models.IntegerField()
+    rentals = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        managed = True
+        db_table = 'agg_store_day'
+        unique_together = (('store_key', 'date_key'),)
+        indexes = [
+            models.Index(fields=['date_key']),
+        ]
+
+
+class AggCategoryMonth(models.Model):
+    # A film in several categories counts once in each
+    category_key = models.IntegerField()
+    month_key = models.IntegerField()  # YYYYMM format
+    rentals = models.IntegerField(default=0)
+
+    class Meta:
+        managed = True
+        db_table = 'agg_category_month'
+        unique_together = (('category_key', 'month_key'),)
+        indexes = [
+            models.Index(fields=['month_key']),
+        ]
+
+
 # Utility
 
 class SyncState(models.Model):
     table_name = models.CharField(max_length=100, primary_key=True)
     last_sync_timestamp = models.DateTimeField()
+    # (last_update, primary key) of the last source row synced
+    last_update = models.DateTimeField(null=True, blank=True)
+    last_pk = models.IntegerField(null=True, blank=True)
 
     class Meta:
         managed = True
         db_table = 'sync_state'
+
+
+class LoadCheckpoint(models.Model):
+    # One row per full-load stage, while a load is unfinished
+    stage = models.CharField(max_length=100, primary_key=True)
+    completed = models.BooleanField(default=False)
+    # Primary key of the last source row committed, for chunked stages
+    last_pk = models.IntegerField(null=True, blank=True)
+    # Source watermark taken when the load started, for stages that have one
+    source_last_update = models.DateTimeField(null=True, blank=True)
+    source_last_pk = models.IntegerField(null=True, blank=True)
+    shadow = models.BooleanField(default=False)
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        managed = True
+        db_table = 'load_checkpoint'
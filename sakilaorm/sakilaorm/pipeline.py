@@ -0,0 +1,191 @@
+"""
+Overlapped extract -> transform -> load.
+
+The extract and transform stages run on their own threads and hand work
+on through bounded queues, so the source query for the next chunk, the
+transform of the current one and the write of the previous one happen at
+the same time, and a slow stage makes the ones before it wait instead of
+buffering without limit. The load stage runs on the calling thread, so
+writes stay on the caller's connection and inside its transaction.
+
+Each stage records how long it spent working and how long it waited on
+its neighbours; the busiest stage is the bottleneck.
+"""
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+
+
+DEFAULT_QUEUE_SIZE = 4
+SOURCE_ALIASES = ('sakila', 'sakila_stream')
+
+# Marks the end of a stage's output
+DONE = object()
+
+
+def get_queue_size():
+    return getattr(settings, 'ETL_PIPELINE_QUEUE_SIZE', DEFAULT_QUEUE_SIZE)
+
+
+def pipelining_enabled():
+    """
+    Stage threads read the source on their own connections, which cannot
+    see rows the caller has written but not committed (as in a test case),
+    so a caller inside a source transaction runs the stages in turn.
+    """
+    if not getattr(settings, 'ETL_PIPELINE', True):
+        return False
+    return not any(
+        connections[alias].in_atomic_block for alias in SOURCE_ALIASES if alias in connections.settings
+    )
+
+
+class StageTimer:
+    def __init__(self, name):
+        self.name = name
+        self.busy = 0.0
+        self.idle = 0.0
+        self.items = 0
+
+    def summary(self):
+        return f"{self.name} busy {self.busy:.2f}s idle {self.idle:.2f}s"
+
+
+class Pipeline:
+    """
+    Run extract (an iterable of chunks), transform (chunk -> result) and
+    load (result -> None) as a three-stage pipeline.
+    """
+
+    def __init__(self, extract, transform, load, queue_size=None, threaded=None):
+        self.extract = extract
+        self.transform = transform
+        self.load = load
+        self.queue_size = queue_size or get_queue_size()
+        # None: decide by pipelining_enabled()
+        self.threaded = threaded
+        self.timers = [StageTimer('extract'), StageTimer('transform'), StageTimer('load')]
+        self.stopping = threading.Event()
+        self.errors = []
+
+    def run(self):
+        threaded = pipelining_enabled() if self.threaded is None else self.threaded and pipelining_enabled()
+        if threaded:
+            self.run_threaded()
+        else:
+            self.run_inline()
+        return self
+
+    def run_inline(self):
+        extract_timer, transform_timer, load_timer = self.timers
+        chunks = iter(self.extract)
+        while True:
+            started = time.perf_counter()
+            chunk = next(chunks, DONE)
+            extract_timer.busy += time.perf_counter() - started
+            if chunk is DONE:
+                break
+            result = self.timed(transform_timer, self.transform, chunk)
+            self.timed(load_timer, self.load, result)
+
+    def run_threaded(self):
+        extracted = queue.Queue(self.queue_size)
+        transformed = queue.Queue(self.queue_size)
+        threads = [
+            threading.Thread(target=self.extract_stage, args=(extracted,), name='etl-extract', daemon=True),
+            threading.Thread(
+                target=self.transform_stage, args=(extracted, transformed), name='etl-transform', daemon=True,
+            ),
+        ]
+        for thread in threads:
+            thread.start()
+
+        load_timer = self.timers[2]
+        try:
+            while True:
+                started = time.perf_counter()
+                result = transformed.get()
+                load_timer.idle += time.perf_counter() - started
+                if result is DONE:
+                    break
+                self.timed(load_timer, self.load, result)
+        finally:
+            # On a load error, let the other stages notice and exit
+            self.stopping.set()
+            for thread in threads:
+                thread.join()
+        if self.errors:
+            raise self.errors[0]
+
+    def timed(self, timer, function, item):
+        started = time.perf_counter()
+        result = function(item)
+        timer.busy += time.perf_counter() - started
+        timer.items += 1
+        return result
+
+    def put(self, timer, target, item):
+        """Block until target has room, unless the pipeline is stopping"""
+        started = time.perf_counter()
+        try:
+            while not self.stopping.is_set():
+                try:
+                    target.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+        finally:
+            timer.idle += time.perf_counter() - started
+
+    def extract_stage(self, extracted):
+        timer = self.timers[0]
+        try:
+            chunks = iter(self.extract)
+            while not self.stopping.is_set():
+                started = time.perf_counter()
+                chunk = next(chunks, DONE)
+                timer.busy += time.perf_counter() - started
+                if chunk is DONE:
+                    break
+                timer.items += 1
+                if not self.put(timer, extracted, chunk):
+                    break
+        except Exception as e:
+            self.errors.append(e)
+        finally:
+            self.put(timer, extracted, DONE)
+            # Connections are per thread; don't leave this one's open
+            connections.close_all()
+
+    def transform_stage(self, extracted, transformed):
+        timer = self.timers[1]
+        try:
+            while not self.stopping.is_set():
+                started = time.perf_counter()
+                try:
+                    chunk = extracted.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                finally:
+                    timer.idle += time.perf_counter() - started
+                if chunk is DONE:
+                    break
+                result = self.timed(timer, self.transform, chunk)
+                if not self.put(timer, transformed, result):
+                    break
+        except Exception as e:
+            self.errors.append(e)
+        finally:
+            self.put(timer, transformed, DONE)
+            connections.close_all()
+
+    def bottleneck(self):
+        return max(self.timers, key=lambda timer: timer.busy).name
+
+    def summary(self):
+        stages = ", ".join(timer.summary() for timer in self.timers)
+        return f"{stages} (bottleneck: {self.bottleneck()})"
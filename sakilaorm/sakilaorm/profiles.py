@@ -0,0 +1,33 @@
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+
+def apply_profile(name, using='default'):
+    """Run the PRAGMAs of a SQLITE_PROFILES entry on a connection"""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+    if connection.in_atomic_block:
+        # journal_mode and synchronous can't change inside a transaction
+        return False
+    with connection.cursor() as cursor:
+        for pragma, value in settings.SQLITE_PROFILES[name].items():
+            cursor.execute(f"PRAGMA {pragma}={value}")
+    return True
+
+
+@contextmanager
+def load_profile(using='default'):
+    """Write under ETL_LOAD_PROFILE, then restore the serving profile"""
+    load = getattr(settings, 'ETL_LOAD_PROFILE', None)
+    serving = getattr(settings, 'SQLITE_SERVING_PROFILE', 'serving')
+    switched = load and load != serving and apply_profile(load, using)
+    if switched:
+        print(f"Using SQLite profile '{load}'")
+    try:
+        yield
+    finally:
+        if switched:
+            apply_profile(serving, using)
@@ -0,0 +1,290 @@
+"""
+Per-stage profiles of ETL commands.
+
+A Profiler installs an execute wrapper on the analytics and source
+connections, in every thread that opens one while it runs, and splits a
+command into named stages. Each stage records its wall time, queries, time
+spent in the database, its slowest statements, rows fetched and rows
+changed, and the peak resident memory of the process while it ran.
+
+Commands run with --profile print a table of the stages and write the
+full profile as JSON. Without it they get a NullProfiler, which installs
+nothing. Worker processes started by full-load --workers are not profiled.
+"""
+import heapq
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+PROFILED_ALIASES = ('default', 'sakila', 'sakila_stream')
+DEFAULT_SLOWEST = 5
+MEMORY_SAMPLE_INTERVAL = 0.05
+STATEMENT_LENGTH = 200
+
+
+def get_profile_directory():
+    return Path(getattr(settings, 'ETL_PROFILE_DIR', settings.BASE_DIR / 'profiles'))
+
+
+def current_rss():
+    """Resident memory of this process in bytes"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        # No /proc: fall back to the process high-water mark
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class Stage:
+    def __init__(self, name, slowest):
+        self.name = name
+        self.started = time.perf_counter()
+        self.wall = 0.0
+        self.queries = 0
+        self.queries_by_alias = {}
+        self.db_time = 0.0
+        self.rows_read = 0
+        self.rows_written = 0
+        self.peak_rss = current_rss()
+        self.slowest = []  # min-heap of (seconds, alias, statement)
+        self.max_slowest = slowest
+
+    def record_query(self, alias, sql, elapsed, rows_written):
+        self.queries += 1
+        self.queries_by_alias[alias] = self.queries_by_alias.get(alias, 0) + 1
+        self.db_time += elapsed
+        self.rows_written += rows_written
+        entry = (elapsed, alias, sql[:STATEMENT_LENGTH])
+        if len(self.slowest) < self.max_slowest:
+            heapq.heappush(self.slowest, entry)
+        elif elapsed > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def as_dict(self):
+        return {
+            'name': self.name,
+            'wall': round(self.wall, 6),
+            'queries': self.queries,
+            'queries_by_alias': self.queries_by_alias,
+            'db_time': round(self.db_time, 6),
+            'rows_read': self.rows_read,
+            'rows_written': self.rows_written,
+            'peak_rss': self.peak_rss,
+            'slowest': [
+                {'seconds': round(elapsed, 6), 'alias': alias, 'sql': sql}
+                for elapsed, alias, sql in sorted(self.slowest, reverse=True)
+            ],
+        }
+
+
+class CountingCursor:
+    """
+    DB-API cursor proxy that counts the rows fetched through it: as rows
+    read, or as rows written when they come from INSERT ... RETURNING.
+    """
+
+    def __init__(self, cursor, profiler):
+        self.cursor = cursor
+        self.profiler = profiler
+        self.returning = False
+
+    def count(self, rows):
+        self.profiler.add_rows(rows, written=self.returning)
+
+    def fetchone(self):
+        row = self.cursor.fetchone()
+        if row is not None:
+            self.count(1)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self.cursor.fetchmany(*args, **kwargs)
+        self.count(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self.cursor.fetchall()
+        self.count(len(rows))
+        return rows
+
+    def __iter__(self):
+        for row in self.cursor:
+            self.count(1)
+            yield row
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+
+class Profiler:
+    def __init__(self, command, path=None, slowest=None):
+        self.command = command
+        self.path = path
+        self.slowest = slowest or getattr(settings, 'ETL_PROFILE_SLOWEST', DEFAULT_SLOWEST)
+        self.stages = []
+        self.current = None
+        self.lock = threading.Lock()
+        self.wrapped = []
+        self.sampling = threading.Event()
+        self.sampler = None
+        self.started_at = None
+        self.started = None
+        self.wall = 0.0
+
+    def start(self):
+        self.started_at = datetime.now(timezone.utc)
+        self.started = time.perf_counter()
+        self.stage('setup')
+        for alias in PROFILED_ALIASES:
+            if alias in connections.settings:
+                self.wrap(connections[alias])
+        # Pipeline stage threads open their own connections
+        connection_created.connect(self.connection_created)
+        self.sampler = threading.Thread(target=self.sample_memory, name='etl-profile-memory', daemon=True)
+        self.sampler.start()
+        return self
+
+    def wrap(self, connection):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+            self.wrapped.append(connection)
+
+    def connection_created(self, sender, connection, **kwargs):
+        if connection.alias in PROFILED_ALIASES:
+            self.wrap(connection)
+
+    def stage(self, name):
+        """End the current stage and start the next"""
+        now = time.perf_counter()
+        with self.lock:
+            if self.current is not None:
+                self.current.wall = now - self.current.started
+            self.current = Stage(name, self.slowest)
+            self.stages.append(self.current)
+
+    def __call__(self, execute, sql, params, many, context):
+        cursor = context['cursor']
+        if not isinstance(cursor.cursor, CountingCursor):
+            cursor.cursor = CountingCursor(cursor.cursor, self)
+        writing = sql.lstrip()[:6].upper() != 'SELECT'
+        cursor.cursor.returning = writing and ' RETURNING ' in sql
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            # Rows written by a RETURNING statement are counted as they
+            # are fetched; drivers report the rows a SELECT matched here too
+            rowcount = getattr(cursor.cursor, 'rowcount', -1)
+            written = rowcount if writing and not cursor.cursor.returning and rowcount > 0 else 0
+            with self.lock:
+                self.current.record_query(context['connection'].alias, sql, elapsed, written)
+
+    def add_rows(self, count, written=False):
+        with self.lock:
+            if written:
+                self.current.rows_written += count
+            else:
+                self.current.rows_read += count
+
+    def sample_memory(self):
+        while not self.sampling.wait(MEMORY_SAMPLE_INTERVAL):
+            self.record_memory()
+
+    def record_memory(self):
+        rss = current_rss()
+        with self.lock:
+            if rss > self.current.peak_rss:
+                self.current.peak_rss = rss
+
+    def stop(self):
+        self.record_memory()
+        self.sampling.set()
+        self.sampler.join()
+        connection_created.disconnect(self.connection_created)
+        for connection in self.wrapped:
+            if self in connection.execute_wrappers:
+                connection.execute_wrappers.remove(self)
+        self.wrapped = []
+        now = time.perf_counter()
+        self.current.wall = now - self.current.started
+        self.wall = now - self.started
+
+    def as_dict(self):
+        return {
+            'command': self.command,
+            'started': self.started_at.isoformat(),
+            'wall': round(self.wall, 6),
+            'peak_rss': max(stage.peak_rss for stage in self.stages),
+            'stages': [stage.as_dict() for stage in self.stages],
+        }
+
+    def table(self):
+        """A short human-readable summary of the stages"""
+        lines = [
+            f"{'Stage':<22} {'Wall s':>8} {'Queries':>8} {'DB s':>8} {'Read':>10} {'Written':>10} {'Peak MB':>8}"
+        ]
+        for stage in self.stages:
+            lines.append(
+                f"{stage.name:<22} {stage.wall:>8.2f} {stage.queries:>8} {stage.db_time:>8.2f} "
+                f"{stage.rows_read:>10} {stage.rows_written:>10} {stage.peak_rss / 2 ** 20:>8.1f}"
+            )
+        lines.append(f"{'total':<22} {self.wall:>8.2f}")
+        slowest = heapq.nlargest(
+            self.slowest, ((entry, stage.name) for stage in self.stages for entry in stage.slowest)
+        )
+        if slowest:
+            lines.append("Slowest statements:")
+            for (elapsed, alias, sql), stage_name in slowest:
+                lines.append(f"  {elapsed:.3f}s {stage_name} [{alias}] {' '.join(sql.split())[:100]}")
+        return "\n".join(lines)
+
+    def write(self):
+        """Write the profile as JSON and return its path"""
+        path = self.path
+        if path is None:
+            directory = get_profile_directory()
+            directory.mkdir(parents=True, exist_ok=True)
+            path = directory / f"{self.command}-{self.started_at:%Y%m%d-%H%M%S}.json"
+        with open(path, 'w') as f:
+            json.dump(self.as_dict(), f, indent=2)
+        return path
+
+    def report(self):
+        self.stop()
+        print()
+        print("Profile")
+        print(self.table())
+        print(f"Profile written to {self.write()}")
+
+
+class NullProfiler:
+    """Stands in for Profiler when profiling is off"""
+
+    def stage(self, name):
+        pass
+
+    def report(self):
+        pass
+
+
+def start_profile(command, profile):
+    """
+    A started Profiler if profile is set, else a NullProfiler. profile is
+    True, or the path to write the JSON profile to.
+    """
+    if not profile:
+        return NullProfiler()
+    return Profiler(command, path=None if profile is True else profile).start()
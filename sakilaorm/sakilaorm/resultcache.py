@@ -0,0 +1,149 @@
+import functools
+import hashlib
+import os
+import pickle
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+
+from django.conf import settings
+
+from sakilaorm.models import SyncState
+
+
+DEFAULT_CACHE_SIZE = 256
+
+
+def sync_generation(using='default'):
+    """
+    The SyncState watermarks as a hashable value. Every committed load or
+    sync page changes it, so it invalidates any result cached before.
+    """
+    return tuple(
+        SyncState.objects.using(using).order_by('table_name').values_list(
+            'table_name', 'last_sync_timestamp', 'last_update', 'last_pk',
+        )
+    )
+
+
+class ResultCache:
+    """
+    Size-bounded LRU of query results, with an optional directory of
+    pickled results behind it that other processes can share.
+
+    Keys include the sync generation, so a stale entry is never returned;
+    it just stops being asked for and ages out.
+    """
+
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE, directory=None):
+        self.max_size = max_size
+        self.directory = Path(directory) if directory else None
+        self.results = OrderedDict()
+        self.hits = 0
+        self.file_hits = 0
+        self.misses = 0
+        if self.directory:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    def file_path(self, key):
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return self.directory / f"{digest}.pickle"
+
+    def get(self, key):
+        """Return (True, result) for a cached key, else (False, None)"""
+        if key in self.results:
+            self.hits += 1
+            self.results.move_to_end(key)
+            return True, self.results[key]
+
+        if self.directory:
+            path = self.file_path(key)
+            try:
+                with open(path, 'rb') as f:
+                    stored_key, result = pickle.load(f)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                pass
+            else:
+                if stored_key == key:
+                    self.file_hits += 1
+                    self.remember(key, result)
+                    return True, result
+
+        self.misses += 1
+        return False, None
+
+    def remember(self, key, result):
+        self.results[key] = result
+        self.results.move_to_end(key)
+        while len(self.results) > self.max_size:
+            self.results.popitem(last=False)
+
+    def set(self, key, result):
+        self.remember(key, result)
+        if self.directory:
+            # Write beside the target and rename, so readers never see half a file
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump((key, result), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self.file_path(key))
+            self.prune_files()
+
+    def prune_files(self):
+        """Keep at most max_size result files, removing the oldest"""
+        files = sorted(self.directory.glob('*.pickle'), key=lambda path: path.stat().st_mtime)
+        for path in files[:max(len(files) - self.max_size, 0)]:
+            path.unlink(missing_ok=True)
+
+    def clear(self):
+        self.results.clear()
+        if self.directory:
+            for path in self.directory.glob('*.pickle'):
+                path.unlink(missing_ok=True)
+
+    def __len__(self):
+        return len(self.results)
+
+    def summary(self):
+        lookups = self.hits + self.file_hits + self.misses
+        rate = (self.hits + self.file_hits) / lookups if lookups else 0.0
+        return (
+            f"{len(self.results)} cached, {self.hits} hits, {self.file_hits} file hits, "
+            f"{self.misses} misses ({rate:.0%} hit rate)"
+        )
+
+
+_result_cache = None
+
+
+def get_result_cache():
+    """The process-wide cache, configured from ANALYTICS_CACHE_SIZE/DIR"""
+    global _result_cache
+    if _result_cache is None:
+        _result_cache = ResultCache(
+            getattr(settings, 'ANALYTICS_CACHE_SIZE', DEFAULT_CACHE_SIZE),
+            getattr(settings, 'ANALYTICS_CACHE_DIR', None),
+        )
+    return _result_cache
+
+
+def cached_query(function):
+    """
+    Cache a query function's result per (arguments, sync generation).
+    Pass cache=False to bypass it.
+    """
+    @functools.wraps(function)
+    def wrapper(*args, cache=True, using='default', **kwargs):
+        if not cache:
+            return function(*args, using=using, **kwargs)
+        key = (
+            function.__module__, function.__qualname__, using, args,
+            tuple(sorted(kwargs.items())), sync_generation(using),
+        )
+        result_cache = get_result_cache()
+        found, result = result_cache.get(key)
+        if not found:
+            result = function(*args, using=using, **kwargs)
+            result_cache.set(key, result)
+        return result
+
+    return wrapper
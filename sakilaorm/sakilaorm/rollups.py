@@ -0,0 +1,156 @@
+"""
+Aggregate rollups over the fact tables.
+
+full-load rebuilds agg_store_day and agg_category_month from the facts
+with one INSERT ... SELECT each. incremental keeps them current with
+deltas instead: every fact it writes adds its contribution, and the row
+it replaces (if any) has its old contribution subtracted.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connections
+
+from sakilaorm.models import (
+    AggCategoryMonth, AggStoreDay, BridgeFilmCategory, FactPayment, FactRental,
+)
+from sakilaorm.shadow import LoadTarget
+
+
+def month_key(date_key):
+    """YYYYMM for a YYYYMMDD date key"""
+    return date_key // 100
+
+
+def rebuild_rollups(using='default', target=None):
+    """
+    Recompute both rollups from the facts and return their row counts.
+    target is a shadow.LoadTarget to rebuild its tables instead of the
+    live ones.
+    """
+    target = target or LoadTarget()
+    store_day = target.AggStoreDay._meta.db_table
+    category_month = target.AggCategoryMonth._meta.db_table
+    rental = target.FactRental._meta.db_table
+    payment = target.FactPayment._meta.db_table
+    bridge = target.BridgeFilmCategory._meta.db_table
+
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"DELETE FROM {store_day}")
+        cursor.execute(
+            f"INSERT INTO {store_day} (store_key, date_key, rentals, revenue) "
+            f"SELECT store_key, date_key, SUM(rentals), ROUND(SUM(revenue), 2) FROM ("
+            f"  SELECT store_key, date_key_rented AS date_key, COUNT(*) AS rentals, 0 AS revenue "
+            f"  FROM {rental} GROUP BY store_key, date_key_rented"
+            f"  UNION ALL"
+            f"  SELECT store_key, date_key_paid, 0, SUM(amount) "
+            f"  FROM {payment} GROUP BY store_key, date_key_paid"
+            f") AS contributions GROUP BY store_key, date_key"
+        )
+        store_day_count = cursor.rowcount
+
+        cursor.execute(f"DELETE FROM {category_month}")
+        cursor.execute(
+            f"INSERT INTO {category_month} (category_key, month_key, rentals) "
+            f"SELECT b.category_key, r.date_key_rented / 100, COUNT(*) "
+            f"FROM {rental} AS r JOIN {bridge} AS b ON b.film_key = r.film_key "
+            f"GROUP BY b.category_key, r.date_key_rented / 100"
+        )
+        category_month_count = cursor.rowcount
+
+    return store_day_count, category_month_count
+
+
+class RollupDelta:
+    """
+    Accumulate rollup changes for a batch of fact writes and apply them
+    as increments, in the caller's transaction.
+    """
+
+    def __init__(self, using='default'):
+        self.using = using
+        self.store_day = defaultdict(lambda: [0, Decimal('0.00')])
+        self.category_month = defaultdict(int)
+        self.film_categories = None
+
+    def load_film_categories(self):
+        # Bridges only change on full-load, so one read per run is enough
+        self.film_categories = defaultdict(list)
+        pairs = BridgeFilmCategory.objects.using(self.using).values_list('film_key', 'category_key')
+        for film_key, category_key in pairs:
+            self.film_categories[film_key].append(category_key)
+
+    def previous_rentals(self, rental_ids):
+        """{rental_id: (store_key, date_key, film_key)} of the rentals already loaded"""
+        rows = FactRental.objects.using(self.using).filter(rental_id__in=rental_ids).values_list(
+            'rental_id', 'store_key', 'date_key_rented', 'film_key',
+        )
+        return {rental_id: rest for rental_id, *rest in rows}
+
+    def previous_payments(self, payment_ids):
+        """{payment_id: (store_key, date_key, amount)} of the payments already loaded"""
+        rows = FactPayment.objects.using(self.using).filter(payment_id__in=payment_ids).values_list(
+            'payment_id', 'store_key', 'date_key_paid', 'amount',
+        )
+        return {payment_id: rest for payment_id, *rest in rows}
+
+    def add_rental(self, store_key, date_key, film_key, sign=1):
+        """Count a rental in (sign=1) or out of (sign=-1) the rollups"""
+        if self.film_categories is None:
+            self.load_film_categories()
+        self.store_day[store_key, date_key][0] += sign
+        for category_key in self.film_categories.get(film_key, ()):
+            self.category_month[category_key, month_key(date_key)] += sign
+
+    def add_payment(self, store_key, date_key, amount, sign=1):
+        """Count a payment in (sign=1) or out of (sign=-1) the rollups"""
+        self.store_day[store_key, date_key][1] += sign * amount
+
+    def apply(self):
+        """Write the pending deltas and drop rollup rows that fell to zero"""
+        store_day = [
+            (store_key, date_key, rentals, str(revenue))
+            for (store_key, date_key), (rentals, revenue) in self.store_day.items()
+            if rentals or revenue
+        ]
+        category_month = [
+            (category_key, month, rentals)
+            for (category_key, month), rentals in self.category_month.items()
+            if rentals
+        ]
+        store_day_table = AggStoreDay._meta.db_table
+        category_month_table = AggCategoryMonth._meta.db_table
+
+        with connections[self.using].cursor() as cursor:
+            if store_day:
+                cursor.executemany(
+                    f"INSERT INTO {store_day_table} (store_key, date_key, rentals, revenue) "
+                    f"VALUES (%s, %s, %s, %s) "
+                    f"ON CONFLICT (store_key, date_key) DO UPDATE SET "
+                    f"rentals = rentals + excluded.rentals, "
+                    f"revenue = ROUND(revenue + excluded.revenue, 2)",
+                    store_day,
+                )
+                cursor.executemany(
+                    f"DELETE FROM {store_day_table} "
+                    f"WHERE store_key = %s AND date_key = %s AND rentals = 0 AND revenue = 0",
+                    [row[:2] for row in store_day],
+                )
+            if category_month:
+                cursor.executemany(
+                    f"INSERT INTO {category_month_table} (category_key, month_key, rentals) "
+                    f"VALUES (%s, %s, %s) "
+                    f"ON CONFLICT (category_key, month_key) DO UPDATE SET "
+                    f"rentals = rentals + excluded.rentals",
+                    category_month,
+                )
+                cursor.executemany(
+                    f"DELETE FROM {category_month_table} "
+                    f"WHERE category_key = %s AND month_key = %s AND rentals = 0",
+                    [row[:2] for row in category_month],
+                )
+
+        changed = len(store_day) + len(category_month)
+        self.store_day.clear()
+        self.category_month.clear()
+        return changed
@@ -14,6 +14,13 @@ from pathlib import Path
 import os
 from dotenv import load_dotenv
 
+try:
+    from MySQLdb.cursors import SSCursor
+except ImportError:
+    # mysqlclient is only needed by the MySQL aliases below; SQLite-only
+    # settings such as benchmarks.settings replace them
+    SSCursor = None
+
 load_dotenv()
 user = os.getenv("DB_USER")
 password = os.getenv("DB_PASSWORD")
@@ -79,13 +86,38 @@ WSGI_APPLICATION = 'sakilaorm.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# PRAGMA sets for the analytics db. Connections open with the serving
+# profile; full-load and incremental switch to ETL_LOAD_PROFILE while they
+# write and switch back when they finish.
+SQLITE_PROFILES = {
+    'serving': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -65536,  # 64 MiB
+        'temp_store': 'MEMORY',
+        'mmap_size': 1073741824,  # 1 GiB
+    },
+    'bulk-load': {
+        'journal_mode': 'WAL',
+        'synchronous': 'OFF',
+        'cache_size': -524288,  # 512 MiB
+        'temp_store': 'MEMORY',
+        'mmap_size': 1073741824,
+    },
+}
+SQLITE_SERVING_PROFILE = 'serving'
+ETL_LOAD_PROFILE = 'bulk-load'
+
 DATABASES = {
     'default':{
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
         'OPTIONS': {
-            'init_command': 'PRAGMA foreign_keys=OFF;',
+            'init_command': 'PRAGMA foreign_keys=OFF;' + ''.join(
+                f'PRAGMA {name}={value};' for name, value in SQLITE_PROFILES[SQLITE_SERVING_PROFILE].items()
+            ),
         },
+        'CONN_MAX_AGE': None,
     },
     'sakila': {
         'ENGINE': 'django.db.backends.mysql',
@@ -94,13 +126,108 @@ DATABASES = {
         'PASSWORD': password,
         'HOST': '127.0.0.1',
         'PORT': '3306',
-
-    }
+        # Kept open between sync-daemon cycles, checked before reuse and
+        # reopened after this many seconds
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+    },
+    # Same Sakila database over an unbuffered server-side cursor, used to
+    # stream large fact tables without holding the result set in memory
+    'sakila_stream': {
+        'ENGINE': 'django.db.backends.mysql',
+        'NAME': 'sakila',
+        'USER': user,
+        'PASSWORD': password,
+        'HOST': '127.0.0.1',
+        'PORT': '3306',
+        'OPTIONS': {
+            'cursorclass': SSCursor,
+        },
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {
+            'MIRROR': 'sakila',
+        },
+    },
 }
 
 DATABASE_ROUTERS = ['sakilaorm.router.DatabaseRouter']
 
 
+# ETL tuning
+
+# Rows per multi-row upsert when writing to the analytics db
+ETL_BATCH_SIZE = 2000
+
+# Per-table overrides, keyed by analytics table name
+ETL_BATCH_SIZES = {
+    'fact_rental': 5000,
+    'fact_payment': 5000,
+}
+
+# Stream source tables through the sakila_stream connection
+ETL_STREAM_EXTRACT = True
+
+# Extract facts in full-load with one SQL statement per fact table that
+# joins and computes date keys on the source (see sakilaorm/pushdown.py)
+ETL_PUSHDOWN_EXTRACT = True
+
+# Rows fetched per round-trip when streaming, keyed by source table name
+ETL_EXTRACT_CHUNK_SIZE = 2000
+ETL_EXTRACT_CHUNK_SIZES = {
+    'rental': 10000,
+    'payment': 10000,
+}
+
+# Source rows per keyset page (and commit) in an incremental sync
+ETL_SYNC_PAGE_SIZE = 5000
+ETL_SYNC_PAGE_SIZES = {}
+
+# Source primary key ids per range handed to a full-load --workers process
+ETL_PARALLEL_RANGE_SIZE = 50000
+
+# Overlap source reads, transforms and writes on separate threads, with
+# this many chunks (or pages) queued between stages
+ETL_PIPELINE = True
+ETL_PIPELINE_QUEUE_SIZE = 4
+
+# Bound a dimension key cache to this many entries (LRU) instead of
+# loading the whole dimension, keyed by analytics table name
+ETL_KEY_CACHE_MAX_SIZES = {
+    'dim_customer': None,
+}
+
+# Key maps index an array by natural id while at least this share of the
+# ids in their span are mapped, and binary-search sorted ids below it
+ETL_KEY_MAP_MIN_DENSITY = 0.5
+
+# Seconds between sync-daemon cycles, and the bounds --adaptive moves
+# between as cycles do or don't find changes
+ETL_DAEMON_INTERVAL = 60
+ETL_DAEMON_MIN_INTERVAL = 5
+ETL_DAEMON_MAX_INTERVAL = 600
+# Consecutive failed cycles after which the daemon gives up and exits
+ETL_DAEMON_MAX_FAILURES = 10
+
+# Where --profile writes its JSON reports, and how many of the slowest
+# statements each stage keeps
+ETL_PROFILE_DIR = BASE_DIR / 'profiles'
+ETL_PROFILE_SLOWEST = 5
+
+
+# Analytics queries
+
+# Results kept in memory (LRU) by the analytics query cache
+ANALYTICS_CACHE_SIZE = 256
+
+# Directory for a file-backed second cache layer shared between processes,
+# or None to cache in memory only
+ANALYTICS_CACHE_DIR = None
+
+# Where export-columnar writes the fact column files
+ANALYTICS_COLUMNAR_DIR = BASE_DIR / 'columnar'
+
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -0,0 +1,159 @@
+"""
+Shadow-table rebuilds of the analytics db.
+
+A rebuild loads into empty <table>_staging copies while readers keep
+using the live tables, then renames everything into place in one short
+transaction. The replaced tables are kept as <table>_previous, so the
+last load can be rolled back by renaming again.
+
+The load writes the staging tables through separate unmanaged model
+classes. The live models are never repointed: Django caches each field's
+table reference, so changing a live model's db_table mid-process breaks
+its queries.
+"""
+from django.db import connections, models, transaction
+
+from sakilaorm.indexes import generation_token, table_indexes
+from sakilaorm.models import (
+    AggCategoryMonth, AggStoreDay, BridgeFilmActor, BridgeFilmCategory, DimActor,
+    DimCategory, DimCustomer, DimDate, DimFilm, DimStore, FactPayment, FactRental,
+    SyncState,
+)
+
+
+STAGING_SUFFIX = '_staging'
+PREVIOUS_SUFFIX = '_previous'
+
+# sync_state is swapped with the data so its watermarks always describe
+# the generation that is live
+SHADOW_MODELS = [
+    DimDate, DimFilm, DimActor, DimCategory, DimStore, DimCustomer,
+    BridgeFilmActor, BridgeFilmCategory,
+    FactRental, FactPayment,
+    AggStoreDay, AggCategoryMonth,
+    SyncState,
+]
+
+
+def table_exists(cursor, table):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [table])
+    return cursor.fetchone() is not None
+
+
+def create_staging_tables(using='default'):
+    """
+    (Re)create an empty <table>_staging for every shadow model with the
+    live table's columns and unique constraints. Secondary indexes are
+    left out; build them after the load.
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    token = generation_token()
+    with connection.cursor() as cursor:
+        for model in SHADOW_MODELS:
+            live = model._meta.db_table
+            staging = live + STAGING_SUFFIX
+            cursor.execute(f"DROP TABLE IF EXISTS {quote(staging)}")
+
+            cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = %s", [live])
+            create_sql = cursor.fetchone()[0]
+            cursor.execute(create_sql.replace(quote(live), quote(staging), 1))
+
+            # Inline UNIQUE/PRIMARY KEY constraints came with the table;
+            # unique_together is a separate CREATE UNIQUE INDEX
+            for name, unique, origin, columns in table_indexes(cursor, live):
+                if unique and origin == 'c':
+                    index_name = f"{staging}_{'_'.join(columns)}_uniq_{token}"
+                    cursor.execute(
+                        f"CREATE UNIQUE INDEX {quote(index_name)} ON {quote(staging)} "
+                        f"({', '.join(quote(c) for c in columns)})"
+                    )
+
+
+# live model -> its staging model; Django registers every model class, so
+# each is built once per process
+STAGING_MODELS = {}
+
+
+def staging_model(model):
+    """An unmanaged model with model's fields over <table>_staging"""
+    if model not in STAGING_MODELS:
+        indexes = []
+        for index in model._meta.indexes:
+            # Named again after the staging table
+            index = index.clone()
+            index.name = ''
+            indexes.append(index)
+        meta = type('Meta', (), {
+            'app_label': model._meta.app_label,
+            'db_table': model._meta.db_table + STAGING_SUFFIX,
+            'managed': False,
+            'indexes': indexes,
+            'unique_together': model._meta.unique_together,
+        })
+        attrs = {'__module__': model.__module__, 'Meta': meta, 'live_model': model}
+        for field in model._meta.local_fields:
+            attrs[field.name] = field.clone()
+        STAGING_MODELS[model] = type(f'{model.__name__}Staging', (models.Model,), attrs)
+    return STAGING_MODELS[model]
+
+
+class LoadTarget:
+    """
+    The models a full-load writes through, as attributes named after the
+    live models: target.DimFilm is DimFilm, or for a shadow load the
+    model over dim_film_staging.
+    """
+
+    def __init__(self, staging=False):
+        self.staging = staging
+        self.models = [staging_model(model) if staging else model for model in SHADOW_MODELS]
+        for live, model in zip(SHADOW_MODELS, self.models):
+            setattr(self, live.__name__, model)
+
+
+def rename_generation(renames, using='default'):
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        for old, new in renames:
+            if new is None:
+                cursor.execute(f"DROP TABLE IF EXISTS {quote(old)}")
+            else:
+                cursor.execute(f"ALTER TABLE {quote(old)} RENAME TO {quote(new)}")
+
+
+def swap_in_staging_tables(using='default'):
+    """Make the staging tables live and keep the live ones as *_previous"""
+    renames = []
+    for model in SHADOW_MODELS:
+        live = model._meta.db_table
+        renames += [
+            (live + PREVIOUS_SUFFIX, None),
+            (live, live + PREVIOUS_SUFFIX),
+            (live + STAGING_SUFFIX, live),
+        ]
+    rename_generation(renames, using)
+
+
+def rollback_to_previous(using='default'):
+    """Swap the live tables with the *_previous generation"""
+    with connections[using].cursor() as cursor:
+        missing = [
+            model._meta.db_table for model in SHADOW_MODELS
+            if not table_exists(cursor, model._meta.db_table + PREVIOUS_SUFFIX)
+        ]
+    if missing:
+        raise RuntimeError(f"No previous generation for: {', '.join(missing)}")
+
+    renames = []
+    for model in SHADOW_MODELS:
+        live = model._meta.db_table
+        renames += [
+            # A leftover staging table would block the three-way rename
+            (live + STAGING_SUFFIX, None),
+            (live, live + STAGING_SUFFIX),
+            (live + PREVIOUS_SUFFIX, live),
+            (live + STAGING_SUFFIX, live + PREVIOUS_SUFFIX),
+        ]
+    rename_generation(renames, using)
@@ -0,0 +1,136 @@
+"""
+In-memory copies of the small source tables that facts and dimensions
+join to.
+
+Every rental and payment resolves its film and store through inventory,
+and every store and customer its city and country through address, city
+and country. These tables are small and rarely change, so SourceLookups
+reads each of them once and extraction selects only the narrow base
+tables, resolving the rest from dicts (a client-side hash join).
+
+A table's copy is reloaded when its row count or latest last_update
+changes on the source. Ids missing from a copy can also be read on demand,
+for rows that arrived after it was loaded.
+"""
+from django.db.models import Count, Max
+
+from sakilaorm.models import Address, City, Country, Inventory
+
+
+NO_PLACE = (None, None)
+
+
+class SourceTableCache:
+    """
+    id -> value map over one small source table, where value is the
+    remaining column or, for several, a tuple of them.
+    """
+
+    def __init__(self, model, columns, using='sakila'):
+        self.model = model
+        self.columns = columns
+        self.using = using
+        self.values = {}
+        self.version = None
+        self.loads = 0
+
+    def queryset(self):
+        return self.model.objects.using(self.using).values_list(*self.columns)
+
+    def current_version(self):
+        """(row count, latest last_update) of the source table"""
+        version = self.model.objects.using(self.using).aggregate(rows=Count('pk'), last_update=Max('last_update'))
+        return version['rows'], version['last_update']
+
+    def add(self, rows):
+        if len(self.columns) == 2:
+            self.values.update(rows)
+        else:
+            self.values.update((row[0], row[1:]) for row in rows)
+
+    def load(self):
+        # Read the version first: a change made while loading then shows
+        # up as a version change on the next refresh
+        self.version = self.current_version()
+        self.values = {}
+        self.add(self.queryset())
+        self.loads += 1
+        return self
+
+    def refresh(self):
+        """Reload if the source table changed since the last load; returns whether it did"""
+        if self.current_version() == self.version:
+            return False
+        self.load()
+        return True
+
+    def include(self, ids):
+        """Read any of ids not yet in the map in one query; returns how many were missing"""
+        missing = {id_ for id_ in ids if id_ is not None and id_ not in self.values}
+        if missing:
+            self.add(self.queryset().filter(pk__in=missing))
+        return len(missing)
+
+    def get(self, id_, default=None):
+        return self.values.get(id_, default)
+
+    def __len__(self):
+        return len(self.values)
+
+
+class SourceLookups:
+    """Cached inventory and address -> city -> country for one run, or across daemon cycles"""
+
+    def __init__(self, using='sakila'):
+        # inventory_id -> (film_id, store_id)
+        self.inventory = SourceTableCache(Inventory, ('inventory_id', 'film_id', 'store_id'), using)
+        self.address = SourceTableCache(Address, ('address_id', 'city_id'), using)
+        self.city = SourceTableCache(City, ('city_id', 'city', 'country_id'), using)
+        self.country = SourceTableCache(Country, ('country_id', 'country'), using)
+        # address_id -> (city, country), resolved from the three above
+        self.places = {}
+
+    @property
+    def caches(self):
+        return {
+            'inventory': self.inventory, 'address': self.address, 'city': self.city, 'country': self.country,
+        }
+
+    def load(self):
+        for cache in self.caches.values():
+            cache.load()
+        self.resolve_places()
+        return self
+
+    def refresh(self):
+        """Reload the tables that changed on the source; returns their names"""
+        changed = [name for name, cache in self.caches.items() if cache.refresh()]
+        if set(changed) - {'inventory'}:
+            self.resolve_places()
+        return changed
+
+    def resolve_places(self):
+        cities = {
+            city_id: (city, self.country.get(country_id))
+            for city_id, (city, country_id) in self.city.values.items()
+        }
+        # Addresses in one city share its tuple
+        self.places = {
+            address_id: cities.get(city_id, NO_PLACE) for address_id, city_id in self.address.values.items()
+        }
+
+    def place(self, address_id):
+        """(city, country) of an address"""
+        place = self.places.get(address_id)
+        if place is None:
+            # An address added since the load; read it and its city and country
+            self.address.include([address_id])
+            city_id = self.address.get(address_id)
+            self.city.include([city_id])
+            city, country_id = self.city.get(city_id, NO_PLACE)
+            self.country.include([country_id])
+            place = self.places[address_id] = (city, self.country.get(country_id))
+        return place
+
+    def summary(self):
+        return ", ".join(f"{name}: {len(cache)} rows" for name, cache in self.caches.items())
@@ -0,0 +1,119 @@
+from sakilaorm.vectorized import DateColumn, date_keys, duration_days, with_nulls
+
+
+# Source columns extracted for each fact, as flat values_list() tuples.
+# Only these are read; no model instances are built for fact rows. Film
+# and store come from the cached inventory (sourcecache.SourceLookups), so
+# rentals are read without joins and payments join only rental.
+RENTAL_COLUMNS = (
+    'rental_id', 'rental_date', 'return_date', 'inventory_id', 'customer_id', 'staff_id', 'last_update',
+)
+PAYMENT_COLUMNS = (
+    'payment_id', 'payment_date', 'customer_id', 'rental__inventory_id', 'staff_id', 'amount', 'last_update',
+)
+
+# Inventory value for an unknown or missing inventory_id
+NO_INVENTORY = (None, None)
+
+
+def rental_rows(rentals, film_keys, store_keys, customer_keys, inventory):
+    """
+    Map a chunk of source rental tuples to fact_rental values, dropping
+    rentals with a missing dimension. Date keys and durations are computed
+    for the whole chunk at once.
+    """
+    rented = DateColumn([rental[1] for rental in rentals])
+    returned = DateColumn([rental[2] for rental in rentals])
+    rented_keys = with_nulls(*date_keys(rented))
+    returned_keys = with_nulls(*date_keys(returned))
+    durations = with_nulls(*duration_days(rented, returned))
+
+    rows = []
+    for (rental_id, _, _, inventory_id, customer_id, staff_id, _), rented_key, returned_key, duration in zip(
+        rentals, rented_keys, returned_keys, durations,
+    ):
+        film_id, store_id = inventory.get(inventory_id, NO_INVENTORY)
+        film_key = film_keys.get(film_id)
+        store_key = store_keys.get(store_id)
+        customer_key = customer_keys.get(customer_id)
+        if not (film_key and store_key and customer_key):
+            continue
+        rows.append({
+            'rental_id': rental_id,
+            'date_key_rented': rented_key,
+            'date_key_returned': returned_key,
+            'film_key': film_key,
+            'store_key': store_key,
+            'customer_key': customer_key,
+            'staff_id': staff_id,
+            'rental_duration_days': duration,
+        })
+    return rows
+
+
+def payment_rows(payments, customer_keys, store_keys, inventory):
+    """Map a chunk of source payment tuples to fact_payment values, dropping payments with a missing dimension"""
+    paid_keys = with_nulls(*date_keys(DateColumn([payment[1] for payment in payments])))
+
+    rows = []
+    for (payment_id, _, customer_id, inventory_id, staff_id, amount, _), paid_key in zip(payments, paid_keys):
+        _, store_id = inventory.get(inventory_id, NO_INVENTORY)
+        customer_key = customer_keys.get(customer_id)
+        store_key = store_keys.get(store_id)
+        if not (customer_key and store_key):
+            continue
+        rows.append({
+            'payment_id': payment_id,
+            'date_key_paid': paid_key,
+            'customer_key': customer_key,
+            'store_key': store_key,
+            'staff_id': staff_id,
+            'amount': amount,
+        })
+    return rows
+
+
+def keyed_rental_rows(rentals, film_keys, store_keys, customer_keys, inventory):
+    """
+    Map a chunk of pushdown.KEYED_RENTAL_COLUMNS rows, whose date keys and
+    durations the source already computed, to fact_rental values
+    """
+    rows = []
+    for rental_id, rented_key, returned_key, inventory_id, customer_id, staff_id, duration in rentals:
+        film_id, store_id = inventory.get(inventory_id, NO_INVENTORY)
+        film_key = film_keys.get(film_id)
+        store_key = store_keys.get(store_id)
+        customer_key = customer_keys.get(customer_id)
+        if not (film_key and store_key and customer_key):
+            continue
+        rows.append({
+            'rental_id': rental_id,
+            'date_key_rented': rented_key,
+            'date_key_returned': returned_key,
+            'film_key': film_key,
+            'store_key': store_key,
+            'customer_key': customer_key,
+            'staff_id': staff_id,
+            'rental_duration_days': duration,
+        })
+    return rows
+
+
+def keyed_payment_rows(payments, customer_keys, store_keys, inventory):
+    """Map a chunk of pushdown.KEYED_PAYMENT_COLUMNS rows to fact_payment values"""
+    rows = []
+    for payment_id, paid_key, customer_id, inventory_id, staff_id, amount in payments:
+        _, store_id = inventory.get(inventory_id, NO_INVENTORY)
+        customer_key = customer_keys.get(customer_id)
+        store_key = store_keys.get(store_id)
+        if not (customer_key and store_key):
+            continue
+        rows.append({
+            'payment_id': payment_id,
+            'date_key_paid': paid_key,
+            'customer_key': customer_key,
+            'store_key': store_key,
+            'staff_id': staff_id,
+            'amount': amount,
+        })
+    return rows
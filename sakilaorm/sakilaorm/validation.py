@@ -0,0 +1,92 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections
+
+
+def duplicates(table, column):
+    return (
+        f"SELECT COUNT(*) FROM (SELECT {column} FROM {table} "
+        f"GROUP BY {column} HAVING COUNT(*) > 1) AS duplicated"
+    )
+
+
+# alias -> table group -> {result name: scalar subquery}
+VALIDATION_QUERIES = {
+    'sakila': {
+        'dimensions': {
+            'film': "SELECT COUNT(*) FROM film",
+            'actor': "SELECT COUNT(*) FROM actor",
+            'category': "SELECT COUNT(*) FROM category",
+            'store': "SELECT COUNT(*) FROM store",
+            'customer': "SELECT COUNT(*) FROM customer",
+        },
+        'facts': {
+            'rental': "SELECT COUNT(*) FROM rental",
+            'payment': "SELECT COUNT(*) FROM payment",
+            'payment_total': "SELECT COALESCE(SUM(amount), 0) FROM payment",
+        },
+    },
+    'default': {
+        'dimensions': {
+            'film': "SELECT COUNT(*) FROM dim_film",
+            'actor': "SELECT COUNT(*) FROM dim_actor",
+            'category': "SELECT COUNT(*) FROM dim_category",
+            'store': "SELECT COUNT(*) FROM dim_store",
+            'customer': "SELECT COUNT(*) FROM dim_customer",
+            'duplicate_films': duplicates('dim_film', 'film_id'),
+        },
+        'facts': {
+            'rental': "SELECT COUNT(*) FROM fact_rental",
+            'payment': "SELECT COUNT(*) FROM fact_payment",
+            'payment_total': "SELECT COALESCE(SUM(amount), 0) FROM fact_payment",
+            'duplicate_rentals': duplicates('fact_rental', 'rental_id'),
+            'duplicate_payments': duplicates('fact_payment', 'payment_id'),
+            'rollup_rentals': "SELECT COALESCE(SUM(rentals), 0) FROM agg_store_day",
+            'rollup_revenue': "SELECT COALESCE(SUM(revenue), 0) FROM agg_store_day",
+        },
+    },
+}
+
+
+def run_aggregate(alias, queries, close=False):
+    """Evaluate a group of scalar subqueries as one statement on one connection"""
+    names = list(queries)
+    sql = "SELECT " + ", ".join(f"({queries[name]})" for name in names)
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql)
+            return dict(zip(names, cursor.fetchone()))
+    finally:
+        if close:
+            # Connections are per thread; don't leave pool threads' open
+            connection.close()
+
+
+def collect_validation_totals():
+    """
+    Return {alias: {name: value}} for every validation check.
+
+    Each table group is a single statement. The groups run at the same
+    time on a thread pool, one connection per thread, so the whole set
+    takes about as long as the slowest statement. If the caller is inside
+    a transaction the groups run in order on its own connections instead,
+    since other connections would not see its uncommitted rows.
+    """
+    jobs = [
+        (alias, queries)
+        for alias, groups in VALIDATION_QUERIES.items()
+        for queries in groups.values()
+    ]
+    totals = {alias: {} for alias in VALIDATION_QUERIES}
+
+    if any(connections[alias].in_atomic_block for alias in VALIDATION_QUERIES):
+        for alias, queries in jobs:
+            totals[alias].update(run_aggregate(alias, queries))
+        return totals
+
+    with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+        futures = [(alias, pool.submit(run_aggregate, alias, queries, True)) for alias, queries in jobs]
+        for alias, future in futures:
+            totals[alias].update(future.result())
+    return totals
@@ -0,0 +1,109 @@
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+
+from sakilaorm.models import SyncState
+
+
+DEFAULT_PAGE_SIZE = 5000
+
+
+def get_page_size(table_name):
+    """Return the configured keyset page size for a source table"""
+    page_sizes = getattr(settings, 'ETL_SYNC_PAGE_SIZES', {})
+    return page_sizes.get(table_name, getattr(settings, 'ETL_SYNC_PAGE_SIZE', DEFAULT_PAGE_SIZE))
+
+
+def load_watermark(table_name, using='default'):
+    """
+    Return the (last_update, pk) of the last source row synced for a table,
+    or (None, None) if the table has never been synced.
+    """
+    state = SyncState.objects.using(using).filter(table_name=table_name).first()
+    if state is None:
+        return None, None
+    if state.last_update is None:
+        # Synced before watermarks were tracked
+        return state.last_sync_timestamp, 0
+    return state.last_update, state.last_pk
+
+
+def save_watermark(table_name, last_update, last_pk, using='default', model=SyncState):
+    model.objects.using(using).update_or_create(
+        table_name=table_name,
+        defaults={
+            'last_sync_timestamp': timezone.now(),
+            'last_update': last_update,
+            'last_pk': last_pk,
+        }
+    )
+
+
+def add_watermark_columns(using='default'):
+    """
+    Add last_update and last_pk to a sync_state created before watermarks
+    were tracked; returns the columns added. Its rows resume from their
+    last_sync_timestamp until they are next saved.
+    """
+    connection = connections[using]
+    table = SyncState._meta.db_table
+    quote = connection.ops.quote_name
+    added = []
+    with connection.cursor() as cursor:
+        if table not in connection.introspection.table_names(cursor):
+            return added
+        columns = {column.name for column in connection.introspection.get_table_description(cursor, table)}
+        # Both columns are nullable, so a plain ADD COLUMN will do; unlike
+        # SQLite's schema editor it also runs inside a transaction
+        editor = connection.schema_editor()
+        for name in ('last_update', 'last_pk'):
+            field = SyncState._meta.get_field(name)
+            if field.column in columns:
+                continue
+            definition, params = editor.column_sql(SyncState, field)
+            cursor.execute(f"ALTER TABLE {quote(table)} ADD COLUMN {quote(field.column)} {definition}", params)
+            added.append(field.column)
+    return added
+
+
+def source_watermark(model, using='sakila'):
+    """Return the highest (last_update, pk) currently in a source table"""
+    row = model.objects.using(using).order_by('-last_update', '-pk').values_list('last_update', 'pk').first()
+    return row or (None, None)
+
+
+def row_watermark(row, pk_field):
+    """(last_update, pk) of a row from keyset_pages()"""
+    if isinstance(row, tuple):
+        return row[-1], row[0]
+    return row.last_update, getattr(row, pk_field)
+
+
+def keyset_pages(queryset, pk_field, watermark, page_size):
+    """
+    Yield lists of source rows changed after watermark, in (last_update, pk)
+    order, page_size rows at a time. The rows are model instances, or
+    values_list() tuples that start with the pk and end with last_update.
+
+    Each page is a separate LIMIT query that starts after the last row of
+    the previous page, so it is a range scan on the last_update index no
+    matter how far into the table the sync is. The caller should commit
+    the page and its watermark before asking for the next one.
+    """
+    last_update, last_pk = watermark
+    queryset = queryset.order_by('last_update', pk_field)
+
+    while True:
+        page_query = queryset
+        if last_update is not None:
+            page_query = page_query.filter(last_update__gte=last_update).filter(
+                Q(last_update__gt=last_update) | Q(**{f'{pk_field}__gt': last_pk})
+            )
+        page = list(page_query[:page_size])
+        if not page:
+            return
+        yield page
+        last_update, last_pk = row_watermark(page[-1], pk_field)
+        if len(page) < page_size:
+            return
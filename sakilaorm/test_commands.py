@@ -8,7 +8,7 @@ from pathlib import Path
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sakilaorm.settings')
 django.setup()
 
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase, override_settings
 from django.db import connection, connections
 from sakilaorm.models import (
     Film, Actor, Customer, Rental, Payment,
@@ -19,7 +19,7 @@ from manage import init_command, full_load_command, incremental_command, validat
 
 class TestInitCommand(TestCase):
     """Test 1: Init command - Confirms database and tables are created successfully"""
-    databases = ['default', 'sakila']
+    databases = ['default', 'sakila', 'sakila_stream']
 
     def test_init_creates_tables(self):
         """Test that init command creates all analytics tables"""
@@ -54,7 +54,7 @@ class TestInitCommand(TestCase):
 
 class TestFullLoadCommand(TestCase):
     """Test 2: Full-load command - Verifies all data from Sakila is loaded into SQLite"""
-    databases = ['default', 'sakila']
+    databases = ['default', 'sakila', 'sakila_stream']
 
     def test_full_load_loads_all_data(self):
         """Test that full-load command loads all data from Sakila"""
@@ -103,7 +103,7 @@ class TestFullLoadCommand(TestCase):
 
 class TestIncrementalCommandNewData(TestCase):
     """Test 3: Incremental command (new data) - Checks that new records appear correctly"""
-    databases = ['default', 'sakila']
+    databases = ['default', 'sakila', 'sakila_stream']
 
     def test_incremental_loads_new_data(self):
         """Test that incremental command loads new rental data"""
@@ -145,7 +145,7 @@ class TestIncrementalCommandNewData(TestCase):
 
 class TestIncrementalCommandUpdates(TestCase):
     """Test 4: Incremental command (updates) - Ensures existing rows are updated"""
-    databases = ['default', 'sakila']
+    databases = ['default', 'sakila', 'sakila_stream']
 
     def test_incremental_updates_existing_data(self):
         """Test that incremental command updates modified records"""
@@ -190,7 +190,7 @@ class TestIncrementalCommandUpdates(TestCase):
 
 class TestValidateCommand(TestCase):
     """Test 5: Validate command - Confirms data consistency between MySQL and SQLite"""
-    databases = ['default', 'sakila']
+    databases = ['default', 'sakila', 'sakila_stream']
 
     def test_validate_confirms_consistency(self):
         """Test that validate command confirms data consistency"""
@@ -225,6 +225,785 @@ class TestValidateCommand(TestCase):
         print(f"  Validation status: {'PASSED' if validation_passed else 'FAILED'}")
 
 
+class TestDimensionKeyCache(TestCase):
+    """Test 6: Dimension key cache - Resolves fact keys without per-row queries"""
+    databases = ['default']
+
+    def test_key_cache_lookups(self):
+        """Test full and bounded LRU key caches"""
+        print("\n Test 6: Dimension Key Cache ")
+        from django.utils import timezone
+        from sakilaorm.keycache import DimensionKeyCache
+
+        DimFilm.objects.using('default').filter(film_id__gte=900000).delete()
+        films = [
+            DimFilm.objects.using('default').create(
+                film_id=900000 + i, title=f"CACHE TEST {i}", language="English",
+                last_update=timezone.now(),
+            )
+            for i in range(3)
+        ]
+
+        cache = DimensionKeyCache(DimFilm, 'film_id', 'film_key').load()
+        with self.assertNumQueries(0, using='default'):
+            for film in films:
+                self.assertEqual(cache.get(film.film_id), film.film_key)
+            self.assertIsNone(cache.get(999999999))
+
+        lru = DimensionKeyCache(DimFilm, 'film_id', 'film_key', max_size=2).load()
+        for film in films:
+            self.assertEqual(lru.get(film.film_id), film.film_key)
+        self.assertEqual(len(lru), 2)
+        self.assertNotIn(films[0].film_id, lru.keys)
+
+        print(f" Key cache resolved {cache.hits} keys, LRU kept {len(lru)} entries")
+
+
+class TestDeepValidate(TestCase):
+    """Test 7: Deep validate - Locates divergent rows by checksum bisection"""
+    databases = ['default', 'sakila', 'sakila_stream']
+
+    def test_deep_validate_finds_changed_row(self):
+        """Test that a corrupted fact row is reported by id"""
+        print("\n Test 7: Deep Validate ")
+        from sakilaorm.checksum import table_checks, find_divergent_rows
+
+        try:
+            init_command()
+            full_load_command()
+        except SystemExit:
+            pass
+
+        rental = FactRental.objects.using('default').order_by('rental_id')[10]
+        FactRental.objects.using('default').filter(rental_id=rental.rental_id).update(staff_id=rental.staff_id + 100)
+
+        checks = {check.name: check for check in table_checks()}
+        divergent, chunks = find_divergent_rows(checks['Rentals'])
+        self.assertEqual(divergent, [rental.rental_id])
+
+        divergent, chunks = find_divergent_rows(checks['Films'])
+        self.assertEqual(divergent, [])
+
+        # Durations floor like timedelta.days, also for returns before the rental
+        from sakilaorm.checksum import Dialect
+        dialect = Dialect('default')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT {dialect.days_between('rented', 'returned')} FROM "
+                "(SELECT %s AS rented, %s AS returned UNION ALL SELECT %s, %s)",
+                ['2005-05-25 12:00:00', '2005-05-25 11:00:00', '2005-05-25 12:00:00', '2005-05-27 11:00:00'],
+            )
+            self.assertEqual([row[0] for row in cursor.fetchall()], [-1, 1])
+
+        print(f" Divergent rental located: {rental.rental_id}")
+
+
+class TestRollups(TestCase):
+    """Test 8: Rollups - Delta maintenance matches a full rebuild"""
+    databases = ['default', 'sakila', 'sakila_stream']
+
+    def test_rollup_deltas_match_rebuild(self):
+        """Test that replacing a payment's contribution gives the rebuilt totals"""
+        print("\n Test 8: Rollups ")
+        from decimal import Decimal
+        from sakilaorm.models import AggStoreDay
+        from sakilaorm.rollups import RollupDelta, rebuild_rollups
+
+        try:
+            init_command()
+            full_load_command()
+        except SystemExit:
+            pass
+
+        payment = FactPayment.objects.using('default').order_by('payment_id')[5]
+        rollups = RollupDelta()
+        previous = rollups.previous_payments([payment.payment_id])
+        new_amount = payment.amount + Decimal('1.50')
+        FactPayment.objects.using('default').filter(pk=payment.pk).update(amount=new_amount)
+        rollups.add_payment(*previous[payment.payment_id], sign=-1)
+        rollups.add_payment(payment.store_key, payment.date_key_paid, new_amount)
+        rollups.apply()
+
+        def snapshot():
+            return {
+                (row.store_key, row.date_key): (row.rentals, row.revenue)
+                for row in AggStoreDay.objects.using('default').all()
+            }
+
+        maintained = snapshot()
+        rebuild_rollups()
+        self.assertEqual(maintained, snapshot())
+
+        print(f" {len(maintained)} store-day rows match the rebuild")
+
+
+class TestAnalyticsCache(TestCase):
+    """Test 9: Analytics queries - Cached until the next sync commits"""
+    databases = ['default']
+
+    def test_results_cached_per_watermark(self):
+        """Test cache hits between syncs and invalidation after a watermark moves"""
+        print("\n Test 9: Analytics Query Cache ")
+        from django.utils import timezone
+        from sakilaorm.analytics import top_films_by_rentals
+        from sakilaorm.resultcache import get_result_cache
+        from sakilaorm.watermark import save_watermark
+
+        film = DimFilm.objects.using('default').create(
+            film_id=910000, title="ANALYTICS TEST", language="English", last_update=timezone.now(),
+        )
+        FactRental.objects.using('default').create(
+            rental_id=910000, date_key_rented=20050524, film_key=film.film_key,
+            store_key=1, customer_key=1, staff_id=1,
+        )
+        cache = get_result_cache()
+        cache.clear()
+        hits, misses = cache.hits, cache.misses
+
+        first = top_films_by_rentals(limit=1000)
+        self.assertIn(film.film_id, [row.film_id for row in first])
+        with self.assertNumQueries(1, using='default'):
+            self.assertEqual(top_films_by_rentals(limit=1000), first)
+        self.assertEqual((cache.hits - hits, cache.misses - misses), (1, 1))
+
+        save_watermark('rental', timezone.now(), 910000)
+        top_films_by_rentals(limit=1000)
+        self.assertEqual(cache.misses - misses, 2)
+
+        print(f" Result cache: {cache.summary()}")
+
+
+class TestColumnarExport(TestCase):
+    """Test 10: Columnar export - Appends new fact rows to memory-mapped columns"""
+    databases = ['default']
+
+    def test_export_appends_new_rows(self):
+        """Test a full export, then an append of only the rows added since"""
+        print("\n Test 10: Columnar Export ")
+        import tempfile
+        from decimal import Decimal
+        from sakilaorm.columnar import export_table, open_columns
+
+        FactPayment.objects.using('default').all().delete()
+        for payment_id, amount in [(1, '2.99'), (2, '0.99')]:
+            FactPayment.objects.using('default').create(
+                payment_id=payment_id, date_key_paid=20050524, customer_key=1,
+                store_key=1, staff_id=1, amount=Decimal(amount),
+            )
+
+        with tempfile.TemporaryDirectory() as directory:
+            written, total, rebuilt = export_table(directory, 'fact_payment')
+            self.assertEqual((written, total, rebuilt), (2, 2, True))
+
+            FactPayment.objects.using('default').create(
+                payment_id=3, date_key_paid=20050525, customer_key=1,
+                store_key=1, staff_id=1, amount=Decimal('4.99'),
+            )
+            written, total, rebuilt = export_table(directory, 'fact_payment')
+            self.assertEqual((written, total, rebuilt), (1, 3, False))
+
+            columns = open_columns(directory, 'fact_payment')
+            self.assertEqual(columns['payment_id'].tolist(), [1, 2, 3])
+            self.assertEqual(int(columns['amount'].sum()), 299 + 99 + 499)
+            del columns
+
+            # A missing column file means starting over, not appending
+            os.remove(Path(directory) / 'fact_payment' / 'amount.bin')
+            written, total, rebuilt = export_table(directory, 'fact_payment')
+            self.assertEqual((written, total, rebuilt), (3, 3, True))
+
+            # So does the exported key range holding other payments
+            FactPayment.objects.using('default').filter(payment_id=2).update(payment_id=4)
+            written, total, rebuilt = export_table(directory, 'fact_payment')
+            self.assertEqual((written, total, rebuilt), (3, 3, True))
+            self.assertEqual(open_columns(directory, 'fact_payment')['payment_id'].tolist(), [1, 4, 3])
+
+        print(" Exported 2 payments, appended 1")
+
+
+class TestPipeline(TestCase):
+    """Test 11: Pipeline - Overlapped stages keep chunk order and surface errors"""
+    databases = ['default']
+
+    def test_pipeline_order_and_errors(self):
+        """Test that chunks arrive in order and a stage error is raised to the caller"""
+        print("\n Test 11: Extract/Transform/Load Pipeline ")
+        from sakilaorm.pipeline import Pipeline
+
+        loaded = []
+        pipeline = Pipeline(iter(range(50)), lambda chunk: chunk * 2, loaded.append, queue_size=2).run()
+        self.assertEqual(loaded, [chunk * 2 for chunk in range(50)])
+        self.assertEqual([timer.items for timer in pipeline.timers], [50, 50, 50])
+
+        def failing_transform(chunk):
+            if chunk == 10:
+                raise ValueError("bad chunk")
+            return chunk
+
+        with self.assertRaises(ValueError):
+            Pipeline(iter(range(50)), failing_transform, lambda chunk: None, queue_size=2).run()
+
+        print(f" Pipeline: {pipeline.summary()}")
+
+
+class TestSyncDaemon(TestCase):
+    """Test 12: SyncDaemon - Adaptive scheduling, failed cycles and warm key caches"""
+    databases = ['default']
+
+    def test_sync_daemon_cycles(self):
+        """Test that the daemon survives a failed cycle, reuses its key caches and stops cleanly"""
+        print("\n Test 12: Sync Daemon ")
+        from sakilaorm.daemon import SyncDaemon
+
+        results = [3, ValueError("source went away"), 0, 0]
+        seen_keys = []
+
+        def sync(dimension_keys):
+            seen_keys.append(dimension_keys)
+            result = results[len(seen_keys) - 1]
+            if len(seen_keys) == len(results):
+                daemon.stop()
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        # Closing connections would end the test's transaction, and the
+        # caches only need to be told apart
+        daemon = SyncDaemon(
+            sync, interval=0.01, adaptive=True, min_interval=0.01, max_interval=0.04,
+            recycle_connections=lambda: None, load_keys=object,
+        )
+        daemon.run()
+
+        self.assertEqual(daemon.cycles, 4)
+        self.assertEqual(daemon.failures, 1)
+        # Caches are kept across good cycles and reloaded after a failure
+        self.assertIsNot(seen_keys[1], seen_keys[2])
+        self.assertIs(seen_keys[2], seen_keys[3])
+
+        self.assertEqual(daemon.next_interval(0.04, 5), 0.01)
+        self.assertEqual(daemon.next_interval(0.01, 0), 0.02)
+        self.assertEqual(daemon.next_interval(0.04, 0), 0.04)
+        self.assertEqual(daemon.next_interval(0.01, None), 0.02)
+
+        # A daemon that can't even warm its key caches gives up
+        def unreachable():
+            raise RuntimeError("analytics db unreachable")
+
+        failing = SyncDaemon(
+            sync, interval=0.01, max_interval=0.01, max_failures=3,
+            recycle_connections=lambda: None, load_keys=unreachable,
+        )
+        failing.run()
+        self.assertTrue(failing.gave_up)
+        self.assertEqual((failing.cycles, failing.failures), (3, 3))
+        self.assertEqual(len(seen_keys), len(results))
+
+        print(f" Ran {daemon.cycles} cycles, {daemon.failures} failed")
+
+
+class TestProfiler(TestCase):
+    """Test 13: Profiler - Per-stage query counts and row totals"""
+    databases = ['default']
+
+    def test_profiler_stages(self):
+        """Test that queries and rows are attributed to the stage they ran in"""
+        print("\n Test 13: Profiler ")
+        import json
+        from django.utils import timezone
+        from sakilaorm.profiling import Profiler
+
+        actors = DimActor.objects.using('default').filter(actor_id__gte=930000)
+        actors.delete()
+        profiler = Profiler('test').start()
+        profiler.stage('write')
+        DimActor.objects.using('default').bulk_create([
+            DimActor(actor_id=actor_id, first_name='A', last_name='B', last_update=timezone.now())
+            for actor_id in range(930000, 930003)
+        ])
+        profiler.stage('read')
+        self.assertEqual(len(list(actors.values_list('actor_id'))), 3)
+        profiler.stop()
+
+        stages = {stage['name']: stage for stage in profiler.as_dict()['stages']}
+        self.assertEqual(stages['write']['rows_written'], 3)
+        self.assertEqual(stages['read']['queries'], 1)
+        self.assertEqual(stages['read']['rows_read'], 3)
+        self.assertEqual(stages['read']['queries_by_alias'], {'default': 1})
+        json.dumps(profiler.as_dict())
+        # Nothing is left installed once the profile stops
+        self.assertNotIn(profiler, connections['default'].execute_wrappers)
+
+        print(f" Profiled {len(stages)} stages")
+
+
+class TestSourceLookups(TestCase):
+    """Test 14: SourceLookups - Cached inventory and geography match the source joins"""
+    databases = ['default', 'sakila']
+
+    def test_source_lookups(self):
+        """Test lookups against select_related, on-demand reads and last_update refreshes"""
+        print("\n Test 14: Source Lookups ")
+        from django.utils import timezone
+        from sakilaorm.models import Inventory
+        from sakilaorm.sourcecache import SourceLookups
+
+        source = SourceLookups().load()
+        for customer in Customer.objects.using('sakila').select_related('address__city__country')[:20]:
+            self.assertEqual(
+                source.place(customer.address_id),
+                (customer.address.city.city, customer.address.city.country.country),
+            )
+        for item in Inventory.objects.using('sakila').all()[:20]:
+            self.assertEqual(source.inventory.get(item.inventory_id), (item.film_id, item.store_id))
+
+        # Rows missing from the copy are read on demand
+        item = Inventory.objects.using('sakila').first()
+        del source.inventory.values[item.inventory_id]
+        self.assertEqual(source.inventory.include([item.inventory_id, None]), 1)
+        self.assertEqual(source.inventory.get(item.inventory_id), (item.film_id, item.store_id))
+
+        # Only tables whose last_update moved are reloaded
+        self.assertEqual(source.refresh(), [])
+        Inventory.objects.using('sakila').filter(pk=item.pk).update(last_update=timezone.now())
+        self.assertEqual(source.refresh(), ['inventory'])
+        self.assertEqual(source.inventory.loads, 2)
+
+        print(f" Cached {source.summary()}")
+
+
+class TestKeyMap(TestCase):
+    """Test 15: KeyMap - Dense and sparse layouts read like a dict"""
+    databases = ['default']
+
+    def test_key_map_layouts(self):
+        """Test lookups, updates and the switch to the sparse layout"""
+        print("\n Test 15: Key Map ")
+        from sakilaorm.keymap import KeyMap
+
+        expected = {natural_id: natural_id * 3 for natural_id in range(1, 1001) if natural_id % 10}
+        key_map = KeyMap.from_pairs(expected.items())
+        self.assertTrue(key_map.dense)
+        self.assertEqual(len(key_map), len(expected))
+        for natural_id in range(-2, 1005):
+            self.assertEqual(key_map.get(natural_id), expected.get(natural_id))
+        self.assertIsNone(key_map.get(None))
+        self.assertNotIn(10, key_map)
+        with self.assertRaises(KeyError):
+            key_map[10]
+
+        # Ids written during a sync, then one far past the rest
+        for natural_id, key in ((10, 7), (1001, 8), (5, 9), (10 ** 7, 2 ** 40)):
+            key_map.set(natural_id, key)
+            expected[natural_id] = key
+        self.assertFalse(key_map.dense)
+        self.assertEqual(dict(key_map.items()), expected)
+        self.assertEqual(key_map.get(10 ** 7), 2 ** 40)
+        self.assertLess(key_map.nbytes, 16 * len(expected))
+
+        # The unbounded dimension key cache records new keys in its KeyMap
+        from sakilaorm.keycache import DimensionKeyCache
+        cache = DimensionKeyCache(DimFilm, 'film_id', 'film_key')
+        cache.set(42, 7)
+        self.assertEqual(cache.get(42), 7)
+
+        print(f" Mapped {len(key_map)} keys in {key_map.nbytes} bytes")
+
+
+class TestLoadCheckpoint(TestCase):
+    """Test 16: Load checkpoints - Resumed full loads pick up committed progress"""
+    databases = ['default']
+
+    def test_load_progress_resume(self):
+        """Test that completed stages, chunk positions and start watermarks survive to a resume"""
+        print("\n Test 16: Load Checkpoints ")
+        from django.utils import timezone
+        from sakilaorm.checkpoint import LoadProgress
+        from sakilaorm.models import LoadCheckpoint
+
+        started = timezone.now()
+        watermarks = {'film': (started, 1000), 'rental': (started, 16049), 'payment': (started, 16049)}
+        progress = LoadProgress()
+        self.assertFalse(progress.start(watermarks))
+        with progress.stage('dim_film'):
+            pass
+        progress.chunk_saver('fact_rental', 'rental_id')(FactRental(rental_id=4000))
+
+        resumed = LoadProgress()
+        self.assertTrue(resumed.start({'film': (timezone.now(), 1001)}, resume=True))
+        self.assertTrue(resumed.completed('dim_film'))
+        self.assertFalse(resumed.completed('fact_rental'))
+        resumed_after = resumed.last_pk('fact_rental')
+        self.assertEqual(resumed_after, 4000)
+        self.assertIsNone(resumed.last_pk('fact_payment'))
+        # The watermarks are the ones from when the load first started
+        self.assertEqual(resumed.source_watermarks()['film'], (started, 1000))
+
+        with self.assertRaises(RuntimeError):
+            LoadProgress(shadow=True).start(watermarks, resume=True)
+
+        resumed.finish()
+        self.assertFalse(LoadCheckpoint.objects.using('default').exists())
+        # With nothing to resume, a load starts over
+        self.assertFalse(LoadProgress().start(watermarks, resume=True))
+
+        print(f" Resumed fact_rental after rental_id {resumed_after}")
+
+
+class TestRowHash(TestCase):
+    """Test 17: Row hashes - Upserts write only new and changed rows"""
+    databases = ['default']
+
+    def test_unchanged_rows_skipped(self):
+        """Test that a rewrite counts inserted, updated and unchanged rows and skips the unchanged"""
+        print("\n Test 17: Row Hashes ")
+        from datetime import timedelta
+        from decimal import Decimal
+        from django.utils import timezone
+        from sakilaorm.loader import BulkUpserter
+        from sakilaorm.rowhash import RowHasher
+
+        DimActor.objects.using('default').filter(actor_id__gte=920000).delete()
+        loaded = timezone.now() - timedelta(days=1)
+        actors = {actor_id: ('A', 'B') for actor_id in range(920000, 920005)}
+
+        def write(actors, last_update):
+            writer = BulkUpserter(DimActor, ['actor_id'], ['first_name', 'last_name', 'last_update'])
+            for actor_id, (first_name, last_name) in actors.items():
+                writer.add(actor_id=actor_id, first_name=first_name, last_name=last_name, last_update=last_update)
+            writer.close()
+            return writer
+
+        write(actors, loaded)
+        # Every row moves its last_update, one its name, and one is new
+        actors[920001] = ('C', 'B')
+        actors[920005] = ('D', 'E')
+        writer = write(actors, timezone.now())
+        self.assertEqual((writer.inserted, writer.updated, writer.unchanged), (1, 1, 4))
+
+        stored = DimActor.objects.using('default').filter(actor_id__gte=920000)
+        self.assertEqual(stored.get(actor_id=920001).first_name, 'C')
+        # Unchanged rows were not written, last_update included
+        self.assertEqual(stored.get(actor_id=920002).last_update, loaded)
+        self.assertEqual(stored.filter(row_hash__isnull=True).count(), 0)
+
+        # Amounts hash the same as Decimals and as floats
+        row_hash = RowHasher(FactPayment)
+        values = {'date_key_paid': 20050524, 'customer_key': 1, 'store_key': 1, 'staff_id': 1}
+        self.assertEqual(row_hash({**values, 'amount': Decimal('2.99')}), row_hash({**values, 'amount': 2.99}))
+        self.assertNotEqual(row_hash({**values, 'amount': Decimal('2.99')}), row_hash({**values, 'amount': 3.99}))
+
+        print(f" Rewrote {writer.row_count} actors: {writer.changes()}")
+
+
+class TestShadowLoad(TestCase):
+    """Test 18: Shadow load - Swap and rollback leave the live models working"""
+    databases = ['default', 'sakila', 'sakila_stream']
+
+    def test_shadow_swap_and_rollback(self):
+        """Test that a shadow load swaps in a new generation, rolls back, and the ORM still reads both"""
+        print("\n Test 18: Shadow Load ")
+        from manage import rollback_command
+        from sakilaorm.shadow import STAGING_SUFFIX
+
+        # A loaded live generation for the shadow load to replace
+        try:
+            init_command()
+            full_load_command()
+        except SystemExit:
+            self.fail("init and full-load should succeed")
+
+        # Mark the live generation so the swaps can be told apart
+        DimActor.objects.using('default').filter(actor_id=1).update(first_name='PREVIOUS')
+        source_name = Actor.objects.using('sakila').get(actor_id=1).first_name
+
+        full_load_command(shadow=True)
+        self.assertEqual(DimActor.objects.using('default').get(actor_id=1).first_name, source_name)
+        self.assertEqual(DimFilm.objects.using('default').count(), Film.objects.using('sakila').count())
+        # The live models kept their tables
+        self.assertEqual(DimActor._meta.db_table, 'dim_actor')
+        with connection.cursor() as cursor:
+            self.assertNotIn('dim_actor' + STAGING_SUFFIX, connection.introspection.table_names(cursor))
+
+        try:
+            rollback_command()
+        except SystemExit:
+            pass
+        self.assertEqual(DimActor.objects.using('default').get(actor_id=1).first_name, 'PREVIOUS')
+
+        # Later syncs in the same process read and write the live tables
+        incremental_command(exit_on_error=False)
+        self.assertEqual(FactRental.objects.using('default').count(), Rental.objects.using('sakila').count())
+
+        print(f" Swapped in and rolled back {DimActor._meta.db_table}")
+
+
+class TestSyncStateUpgrade(TestCase):
+    """Test 19: Sync state upgrade - Init adds watermark columns and syncs resume by keyset"""
+    databases = ['default', 'sakila', 'sakila_stream']
+
+    def test_old_sync_state_resumes(self):
+        """Test that init upgrades an old sync_state and a saved watermark resumes after its (last_update, pk)"""
+        print("\n Test 19: Sync State Upgrade ")
+        from sakilaorm.watermark import keyset_pages, load_watermark, save_watermark
+
+        # sync_state as created before watermarks were tracked
+        with connection.cursor() as cursor:
+            cursor.execute("ALTER TABLE sync_state DROP COLUMN last_update")
+            cursor.execute("ALTER TABLE sync_state DROP COLUMN last_pk")
+            cursor.execute("DELETE FROM sync_state")
+            cursor.execute(
+                "INSERT INTO sync_state (table_name, last_sync_timestamp) VALUES ('actor', '2006-01-01 00:00:00')"
+            )
+
+        try:
+            init_command()
+        except SystemExit:
+            self.fail("init should upgrade the old sync_state")
+
+        with connection.cursor() as cursor:
+            columns = {column.name for column in connection.introspection.get_table_description(cursor, 'sync_state')}
+        self.assertTrue({'last_update', 'last_pk'} <= columns)
+        # Old rows resume from their last sync time
+        last_synced, last_pk = load_watermark('actor')
+        self.assertEqual((last_synced.year, last_pk), (2006, 0))
+
+        # Actors share a last_update, so the resume hinges on the pk
+        actors = Actor.objects.using('sakila').order_by('last_update', 'actor_id')
+        synced = actors[99]
+        save_watermark('actor', synced.last_update, synced.actor_id)
+        watermark = load_watermark('actor')
+        self.assertEqual(watermark, (synced.last_update, synced.actor_id))
+
+        pages = list(keyset_pages(Actor.objects.using('sakila'), 'actor_id', watermark, 50))
+        resumed = [actor.actor_id for page in pages for actor in page]
+        self.assertEqual(resumed, [actor.actor_id for actor in actors[100:]])
+
+        print(f" Resumed {len(resumed)} actors after actor_id {synced.actor_id}")
+
+
+class TestDeferredIndexes(TestCase):
+    """Test 20: Deferred indexes - Any full load rebuilds secondary indexes left dropped"""
+    databases = ['default', 'sakila', 'sakila_stream']
+
+    def test_dropped_indexes_rebuilt(self):
+        """Test that indexes dropped by a deferred load come back, even when the load is rerun without the flag"""
+        print("\n Test 20: Deferred Indexes ")
+        from sakilaorm.indexes import (
+            DEFERRED_INDEX_MODELS, declared_index_columns, drop_secondary_indexes, rebuild_secondary_indexes,
+            table_indexes,
+        )
+
+        def missing_indexes():
+            missing = []
+            with connection.cursor() as cursor:
+                for model in DEFERRED_INDEX_MODELS:
+                    present = {columns for _, unique, _, columns in table_indexes(cursor, model._meta.db_table) if not unique}
+                    missing += [columns for columns in declared_index_columns(model) if columns not in present]
+            return missing
+
+        self.assertEqual(missing_indexes(), [])
+        # A --defer-indexes load that stopped before its rebuild
+        dropped = drop_secondary_indexes()
+        self.assertGreater(dropped, 0)
+        self.assertEqual(len(missing_indexes()), dropped)
+
+        try:
+            full_load_command()
+        except SystemExit:
+            self.fail("full-load should succeed")
+        self.assertEqual(missing_indexes(), [])
+        # Nothing left to build
+        self.assertEqual(rebuild_secondary_indexes()[0], 0)
+
+        print(f" Rebuilt {dropped} dropped indexes")
+
+
+class TestBulkUpsert(TestCase):
+    """Test 21: Bulk upsert - Chunked writes insert new rows and update existing ones"""
+    databases = ['default']
+
+    def test_upsert_counts(self):
+        """Test that chunked upserts count inserts and updates, write one statement per chunk and skip known bridge pairs"""
+        print("\n Test 21: Bulk Upsert ")
+        from django.utils import timezone
+        from sakilaorm.loader import BulkUpserter
+        from sakilaorm.models import BridgeFilmActor, DimCategory
+
+        now = timezone.now()
+        categories = DimCategory.objects.using('default').filter(category_id__gte=940000)
+        for category_id in range(940000, 940003):
+            DimCategory.objects.using('default').create(category_id=category_id, name='Old', last_update=now)
+
+        writer = BulkUpserter(DimCategory, ['category_id'], ['name', 'last_update'], batch_size=2)
+        # One existence check, then a hash lookup and an insert per chunk
+        with self.assertNumQueries(1 + 2 * 3, using='default'):
+            for category_id in range(940000, 940005):
+                writer.add(category_id=category_id, name='New', last_update=now)
+            self.assertEqual(writer.close(), 5)
+        self.assertEqual((writer.inserted, writer.updated, writer.unchanged), (2, 3, 0))
+        self.assertEqual(categories.count(), 5)
+        self.assertEqual(categories.filter(name='New').count(), 5)
+
+        # Bridges keep existing pairs and add the new ones
+        BridgeFilmActor.objects.using('default').create(film_key=940000, actor_key=1)
+        bridge_writer = BulkUpserter(BridgeFilmActor, ['film_key', 'actor_key'])
+        bridge_writer.extend({'film_key': 940000, 'actor_key': actor_key} for actor_key in (1, 2))
+        bridge_writer.close()
+        self.assertEqual(BridgeFilmActor.objects.using('default').filter(film_key=940000).count(), 2)
+
+        print(f" Upserted {writer.row_count} categories: {writer.changes()}")
+
+
+class TestDimDateExtension(TestCase):
+    """Test 22: dim_date extension - New dates outside the seeded calendar are added"""
+    databases = ['default']
+
+    def test_extend_beyond_seeded_range(self):
+        """Test that dim_date grows at both ends, fills a gap once and adds nothing when already covered"""
+        print("\n Test 22: dim_date Extension ")
+        from datetime import date
+        from django.db.models import Max, Min
+        from sakilaorm.dates import extend_dim_date, get_date_key
+        from sakilaorm.models import DimDate
+
+        dates = DimDate.objects.using('default')
+        DimDate.objects.using('default').all().delete()
+        self.assertEqual(extend_dim_date(date(2005, 5, 24), date(2005, 5, 31)), 8)
+
+        # Rentals before and after the seeded calendar
+        added = extend_dim_date(date(2005, 5, 20), date(2005, 6, 3))
+        self.assertEqual(added, 4 + 3)
+        bounds = dates.aggregate(first=Min('date'), last=Max('date'))
+        self.assertEqual((bounds['first'], bounds['last']), (date(2005, 5, 20), date(2005, 6, 3)))
+        self.assertEqual(dates.count(), 15)
+
+        # Added days get the same attributes as seeded ones
+        saturday = dates.get(date_key=get_date_key(date(2005, 5, 21)))
+        self.assertEqual((saturday.month, saturday.day_of_week, saturday.is_weekend), (5, 5, 1))
+        self.assertEqual(dates.get(date_key=20050603).is_weekend, 0)
+        self.assertEqual(dates.filter(is_weekend=1).count(), 4)
+
+        # Already covered: nothing to add
+        self.assertEqual(extend_dim_date(date(2005, 5, 25), date(2005, 6, 1)), 0)
+
+        # A calendar with a gap is filled in
+        dates.filter(date_key=20050527).delete()
+        self.assertEqual(extend_dim_date(date(2005, 5, 27), date(2005, 5, 27)), 1)
+        self.assertEqual(dates.count(), 15)
+
+        print(f" Extended dim_date to {bounds['first']} .. {bounds['last']}")
+
+
+class TestConcurrentValidation(SimpleTestCase):
+    """Test 23: Concurrent validation - Thread pool totals match running the groups serially"""
+    # Read-only, so it runs outside a test transaction where the groups
+    # are actually spread over threads
+    databases = ['default', 'sakila']
+
+    def test_concurrent_matches_serial(self):
+        """Test that the concurrent totals equal the serial ones, and the in-transaction path"""
+        print("\n Test 23: Concurrent Validation ")
+        from django.db import transaction
+        from sakilaorm.validation import VALIDATION_QUERIES, collect_validation_totals, run_aggregate
+
+        self.assertFalse(connections['default'].in_atomic_block)
+        concurrent = collect_validation_totals()
+
+        serial = {alias: {} for alias in VALIDATION_QUERIES}
+        for alias, groups in VALIDATION_QUERIES.items():
+            for queries in groups.values():
+                serial[alias].update(run_aggregate(alias, queries))
+        self.assertEqual(concurrent, serial)
+
+        with transaction.atomic(using='default'):
+            self.assertEqual(collect_validation_totals(), serial)
+
+        checks = sum(len(totals) for totals in serial.values())
+        print(f" {checks} totals match across {len(VALIDATION_QUERIES)} databases")
+
+
+class TestSqliteProfiles(SimpleTestCase):
+    """Test 24: SQLite profiles - Loads switch the analytics PRAGMAs and restore them"""
+    # PRAGMAs like synchronous can't change inside a test transaction
+    databases = ['default']
+
+    def test_profile_switch_changes_pragmas(self):
+        """Test that load_profile applies the load PRAGMAs, then the serving ones, and leaves transactions alone"""
+        print("\n Test 24: SQLite Profiles ")
+        from django.conf import settings
+        from django.db import transaction
+        from sakilaorm.profiles import apply_profile, load_profile
+
+        synchronous_levels = {'OFF': 0, 'NORMAL': 1, 'FULL': 2, 'EXTRA': 3}
+
+        def pragmas():
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA synchronous")
+                synchronous = cursor.fetchone()[0]
+                cursor.execute("PRAGMA cache_size")
+                return synchronous, cursor.fetchone()[0]
+
+        def expected(name):
+            profile = settings.SQLITE_PROFILES[name]
+            return synchronous_levels[profile['synchronous'].upper()], profile['cache_size']
+
+        serving, load = expected(settings.SQLITE_SERVING_PROFILE), expected(settings.ETL_LOAD_PROFILE)
+        self.assertNotEqual(serving, load)
+
+        self.assertEqual(pragmas(), serving)
+        with load_profile():
+            self.assertEqual(pragmas(), load)
+        self.assertEqual(pragmas(), serving)
+
+        # Inside a transaction the profile is left as it is
+        with transaction.atomic(using='default'):
+            self.assertFalse(apply_profile(settings.ETL_LOAD_PROFILE))
+            self.assertEqual(pragmas(), serving)
+
+        print(f" synchronous, cache_size: serving {serving}, load {load}")
+
+
+class TestPushdownDurations(TestCase):
+    """Test 25: Pushdown durations - SQL extraction floors rental days like the Python path"""
+    databases = ['default', 'sakila', 'sakila_stream']
+
+    def test_returns_before_rental(self):
+        """Test that returns part of a day before the rental load as negative days and deep-validate clean"""
+        print("\n Test 25: Pushdown Durations ")
+        from datetime import timedelta
+        from django.db.models import F
+        from sakilaorm.checksum import find_divergent_rows, table_checks
+        from sakilaorm.pushdown import KEYED_RENTAL_COLUMNS, fact_chunks
+
+        offsets = {1: -1, 2: -25, 3: 23}
+        for rental_id, hours in offsets.items():
+            Rental.objects.using('sakila').filter(rental_id=rental_id).update(
+                return_date=F('rental_date') + timedelta(hours=hours),
+            )
+
+        duration = KEYED_RENTAL_COLUMNS.index('rental_duration_days')
+        rows = [row for chunk in fact_chunks('rental', bounds=(1, 4), using='sakila') for row in chunk]
+        durations = [row[duration] for row in rows]
+        self.assertEqual(durations, [hours // 24 for hours in offsets.values()])
+
+        # Read the source on this test's connection, which sees the edits
+        try:
+            init_command()
+            with override_settings(ETL_STREAM_EXTRACT=False):
+                full_load_command()
+        except SystemExit:
+            self.fail("full-load should succeed")
+        loaded = FactRental.objects.using('default').filter(rental_id__in=offsets).order_by('rental_id')
+        self.assertEqual(list(loaded.values_list('rental_duration_days', flat=True)), durations)
+
+        checks = {check.name: check for check in table_checks()}
+        divergent, _ = find_divergent_rows(checks['Rentals'])
+        self.assertEqual(divergent, [])
+
+        print(f" Durations for returns {list(offsets.values())} hours after rental: {durations}")
+
+
 def run_tests():
     """Run all tests"""
     import unittest
@@ -243,6 +1022,26 @@ def run_tests():
     suite.addTests(loader.loadTestsFromTestCase(TestIncrementalCommandNewData))
     suite.addTests(loader.loadTestsFromTestCase(TestIncrementalCommandUpdates))
     suite.addTests(loader.loadTestsFromTestCase(TestValidateCommand))
+    suite.addTests(loader.loadTestsFromTestCase(TestDimensionKeyCache))
+    suite.addTests(loader.loadTestsFromTestCase(TestDeepValidate))
+    suite.addTests(loader.loadTestsFromTestCase(TestRollups))
+    suite.addTests(loader.loadTestsFromTestCase(TestAnalyticsCache))
+    suite.addTests(loader.loadTestsFromTestCase(TestColumnarExport))
+    suite.addTests(loader.loadTestsFromTestCase(TestPipeline))
+    suite.addTests(loader.loadTestsFromTestCase(TestSyncDaemon))
+    suite.addTests(loader.loadTestsFromTestCase(TestProfiler))
+    suite.addTests(loader.loadTestsFromTestCase(TestSourceLookups))
+    suite.addTests(loader.loadTestsFromTestCase(TestKeyMap))
+    suite.addTests(loader.loadTestsFromTestCase(TestLoadCheckpoint))
+    suite.addTests(loader.loadTestsFromTestCase(TestRowHash))
+    suite.addTests(loader.loadTestsFromTestCase(TestShadowLoad))
+    suite.addTests(loader.loadTestsFromTestCase(TestSyncStateUpgrade))
+    suite.addTests(loader.loadTestsFromTestCase(TestDeferredIndexes))
+    suite.addTests(loader.loadTestsFromTestCase(TestBulkUpsert))
+    suite.addTests(loader.loadTestsFromTestCase(TestDimDateExtension))
+    suite.addTests(loader.loadTestsFromTestCase(TestConcurrentValidation))
+    suite.addTests(loader.loadTestsFromTestCase(TestSqliteProfiles))
+    suite.addTests(loader.loadTestsFromTestCase(TestPushdownDurations))
 
     # Run tests
     runner = unittest.TextTestRunner(verbosity=2)